@@ -4,61 +4,364 @@ Created on 2018.1.10
 @author: summer.xia
 @contact: summer_west2010@126.com
 '''
-from account.helper.FileHelper import generateFile
+from account.helper.FileHelper import streamToFile
 from account.analyzer.BusinessAnalyzer import BusinessAnalyzer
 from account.cleaner.CCBCreditCleaner import CCBCreditCleaner
 from account.cleaner.CCBDepositsCleaner import CCBDepositsCleaner
 from account.cleaner.AlipayAccountCleaner import AlipayAccountCleaner
 from account.db.SQLiteHelper import SQLiteHelper
+import codecs
 import os
-from account.Combiner import combineCCBAndAlipay
-from account.helper.MatrixHelper import addPointedColumn
-from account.helper.MatrixHelper import mergeMatrixsAandB
+from account.Combiner import AlipayReconciler
+from account.Combiner import bankDateIndex
+from account.Combiner import bankMoneyIndex
+from account.Combiner import alipayDateIndex
+from account.Combiner import getDate
+from account.Combiner import getDayNumber
+from account.Combiner import getAmountKey
+from account.Combiner import iterCombineCCBAndAlipay
+from account.helper.MatrixHelper import iterPointedColumn
+from account.helper.MatrixHelper import iterChunks
+from account.helper.FileHelper import getFiles
 from account.db.OracleHelper import OrderHelper
+from account.IngestionExecutor import IngestionExecutor
+from account.IngestionManifest import IngestionManifest
+from account.IngestionManifest import getDateRange
+from account.IngestionManifest import widenDateRange
 
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 
 class Account(object):
+    insertChunkSize = 1000
+    # alipay rows are paired with bank rows of the same amount up to this many days apart
+    alipayToleranceDays = int(os.environ.get('ALIPAY_TOLERANCE_DAYS', '0'))
+    # decimal places amounts are rounded to before pairing; unset compares them as they are
+    alipayAmountDigits = int(os.environ['ALIPAY_AMOUNT_DIGITS']) if os.environ.get('ALIPAY_AMOUNT_DIGITS') else None
 
-    def __init__(self, dataFilesPath=None, resultFilePath=None):
+    def __init__(self, dataFilesPath=None, resultFilePath=None, workers=None):
         self.dataFilesPath = dataFilesPath
         self.resultFilePath = resultFilePath
+        # parsing processes; None uses every CPU, 1 parses in this process
+        self.workers = workers
         
-    def generateDataFile(self):
+    def generateDataFile(self, full=False):
+        '''
+        Streams statement rows from the cleaners through combining and
+        analysis into the databases, one bank file at a time, and then
+        writes result.txt. Statement files are parsed in parallel by an
+        IngestionExecutor.
+
+        Files listed in the ingestion manifest with unchanged contents are
+        skipped: only new or changed files are parsed, and the rows of a
+        changed file replace the ones it produced before. A changed alipay
+        file also brings back the bank files of the same dates, and only the
+        alipay files covering the dates being ingested are read. The rows of
+        a file that no longer exists are deleted from both databases and the
+        file leaves the manifest. full=True (or an empty manifest) recreates
+        the database from every file.
+
+        The result rows of each bank file are kept in a part file named
+        after its record id, and result.txt is put together from the parts
+        of every ingested bank file, so an incremental run still writes all
+        rows. Alipay files enter the manifest once every bank file has been
+        ingested.
+
+        result.txt is the only file written to resultFilePath. The
+        intermediate credit.txt, deposits.txt, alipay.txt, conbine1.txt and
+        conbine2.txt are no longer written: an incremental run reads only
+        some of the files, so they would hold a part of the statements only.
+
+        Every alipay row is attached to one bank row at most, the bank files
+        taking them in directory order (see AlipayReconciler); the tolerance
+        comes from alipayToleranceDays and alipayAmountDigits.
+        '''
+        alipayCleaner = AlipayAccountCleaner(self.dataFilesPath + os.path.sep + "alipay")
         ccbCreditCleaner = CCBCreditCleaner(self.dataFilesPath + os.path.sep + "credit")
-        ccbCreditMatrix = ccbCreditCleaner.clean()
-        generateFile(ccbCreditMatrix, self.resultFilePath + os.path.sep + "credit.txt")
-        
         ccbDepositesCleaner = CCBDepositsCleaner(self.dataFilesPath + os.path.sep + "deposits")
-        ccbDepositesMatrix = ccbDepositesCleaner.clean()
-        generateFile(ccbDepositesMatrix, self.resultFilePath + os.path.sep + "deposits.txt")
+        cleaners = [alipayCleaner, ccbCreditCleaner, ccbDepositesCleaner]
         
-        alipayCleaner = AlipayAccountCleaner(dataFilesPath + os.path.sep + "alipay")
-        alipayMatrix = alipayCleaner.clean()   
-        generateFile(alipayMatrix, self.resultFilePath + os.path.sep + "alipay.txt")
-        
-        conbine1 = combineCCBAndAlipay(ccbCreditMatrix, alipayMatrix)
-        generateFile(conbine1, self.resultFilePath + os.path.sep + "conbine1.txt")
+        sqliteHelper = SQLiteHelper()
+        created = sqliteHelper.ensureDatabase()
+        manifest = IngestionManifest(sqliteHelper.databasePath).load()
+        executor = IngestionExecutor(self.workers)
+        partsPath = self.resultFilePath + os.path.sep + "result.parts"
+        missing = []
+        if full or manifest.isEmpty():
+            if not created:
+                sqliteHelper.initiateDatabase()
+                manifest = IngestionManifest(sqliteHelper.databasePath).load()
+            removeFiles(partsPath)
+            alipayFiles, ccbCreditFiles, ccbDepositesFiles = executor.fileStreams(cleaners)
+        else:
+            missing = manifest.getMissing()
+            alipayFiles, ccbCreditFiles, ccbDepositesFiles = self.selectFiles(executor, cleaners, manifest, sqliteHelper, missing)
+        if not os.path.isdir(partsPath):
+            os.makedirs(partsPath)
         
-        conbine2 = combineCCBAndAlipay(ccbDepositesMatrix, alipayMatrix)
-        generateFile(conbine2, self.resultFilePath + os.path.sep + "conbine2.txt")
+        alipayMatrix = []
+        alipayEntries = []
+        for fileName, rows in alipayFiles:
+            alipayMatrix.append((fileName, rows))
+            alipayEntries.append((os.path.join(alipayCleaner.dataFilesPath, fileName), len(rows) - 1, getDateRange(rows, alipayDateIndex)))
+        reconciler = AlipayReconciler(list(alipayCleaner.mergeFiles(alipayMatrix))[1:], self.alipayToleranceDays, self.alipayAmountDigits)
         
         analyzer = BusinessAnalyzer()
-        ccbCredit = addPointedColumn(analyzer.calculate(conbine1), 'credit')
-        ccbDeposites = addPointedColumn(analyzer.calculate(conbine2), 'deposites')
+        sqliteLoader = sqliteHelper.openLoader()
+        oracleHelper = OrderHelper()
+        count = 0
+        try:
+            self.dropMissingFiles(missing, manifest, sqliteLoader, oracleHelper)
+            for cleaner, files, pointedText in [(ccbCreditCleaner, ccbCreditFiles, 'credit'), (ccbDepositesCleaner, ccbDepositesFiles, 'deposites')]:
+                for path, rows in self.iterBankFiles(cleaner, files):
+                    count = count + self.ingestFile(path, rows, pointedText, reconciler, analyzer, manifest, sqliteLoader, oracleHelper, partsPath)
+        finally:
+            sqliteLoader.close()
+        for path, rows, dateRange in alipayEntries:
+            manifest.record(path, rows, dateRange)
+        manifest.save()
+        self.writeResultFile([ccbCreditCleaner, ccbDepositesCleaner], manifest, partsPath, self.resultFilePath + os.path.sep + "result.txt")
+        print('Ingested ' + str(count) + ' rows')
+        if executor.errors:
+            print('Skipped ' + str(len(executor.errors)) + ' unreadable files')
+    
+    def selectFiles(self, executor, cleaners, manifest, sqliteHelper, missing=()):
+        '''
+        Per cleaner (alipay first), the (fileName, rows) of the files to
+        ingest in directory order: the new and changed files, the unchanged
+        bank files sharing dates with a changed or missing alipay file or
+        competing for the same alipay rows with a bank file to ingest or a
+        missing one, and the unchanged alipay files sharing dates with a bank
+        file to ingest. Date ranges are widened by alipayToleranceDays.
+        '''
+        selected = set()
         
-        result = mergeMatrixsAandB(ccbCredit, ccbDeposites[1: len(ccbDeposites)])
-        generateFile(result, self.resultFilePath + os.path.sep + "result.txt")
+        def isChanged(cleaner, fileItem):
+            if manifest.isChanged(fileItem.absolutePath):
+                selected.add(fileItem.absolutePath)
+                return True
+            return False
         
-        sqliteHelper = SQLiteHelper()
-        sqliteHelper.initiateDatabase()
-        sqliteHelper.batchInsert(result[1: len(result)])
+        changed = [list(files) for files in executor.fileStreams(cleaners, isChanged)]
+        tolerance = self.alipayToleranceDays
+        alipayRanges = [getDateRange(rows, alipayDateIndex) for fileName, rows in changed[0]]
+        for fileName, rows in changed[0]:
+            entry = manifest.get(os.path.join(cleaners[0].dataFilesPath, fileName))
+            if entry is not None:
+                alipayRanges.append((entry.firstDate, entry.lastDate))
+        # only bank files are recorded with a record id
+        alipayRanges.extend((entry.firstDate, entry.lastDate) for entry in missing if not entry.recordID)
+        alipayRanges = [widenDateRange(dateRange, tolerance) for dateRange in alipayRanges]
+        unchanged = []
+        for cleaner in cleaners:
+            items = []
+            for fileItem in getFiles(cleaner.dataFilesPath) or []:
+                entry = manifest.get(fileItem.absolutePath)
+                if entry is not None and fileItem.absolutePath not in selected:
+                    items.append(entry)
+            unchanged.append(items)
+        extra = set()
+        for entries in unchanged[1:]:
+            for entry in entries:
+                if any(entry.overlaps(dateRange) for dateRange in alipayRanges):
+                    extra.add(entry.path)
+        self.addCompetingFiles(cleaners, changed, unchanged, extra, manifest, sqliteHelper, [entry.recordID for entry in missing if entry.recordID])
+        bankRanges = [getDateRange(rows, bankDateIndex) for files in changed[1:] for fileName, rows in files]
+        bankRanges.extend((entry.firstDate, entry.lastDate) for entries in unchanged[1:] for entry in entries if entry.path in extra)
+        bankRanges = [widenDateRange(dateRange, tolerance) for dateRange in bankRanges]
+        for entry in unchanged[0]:
+            if any(entry.overlaps(dateRange) for dateRange in bankRanges):
+                extra.add(entry.path)
+        if not extra:
+            return changed
+        more = executor.fileStreams(cleaners, lambda cleaner, fileItem: fileItem.absolutePath in extra)
+        files = []
+        for cleaner, changedFiles, moreFiles in zip(cleaners, changed, more):
+            order = dict((fileItem.fileName, index) for index, fileItem in enumerate(getFiles(cleaner.dataFilesPath) or []))
+            files.append(sorted(changedFiles + list(moreFiles), key=lambda item: order.get(item[0], len(order))))
+        return files
+    
+    def addCompetingFiles(self, cleaners, changed, unchanged, extra, manifest, sqliteHelper, missingIDs=()):
+        '''
+        Adds to extra the unchanged bank files with a row of the same amount
+        as, and at most twice alipayToleranceDays apart from, a row of a bank
+        file to ingest or a row a changed or missing (missingIDs) bank file
+        held before, until no more files are added. Such files may compete for the same alipay
+        rows, so they are paired again together, in directory order, as a
+        full run would pair them.
+        '''
+        waiting = [entry for entries in unchanged[1:] for entry in entries if entry.path not in extra]
+        if not waiting:
+            return
+        previous = list(missingIDs)
+        for cleaner, files in zip(cleaners[1:], changed[1:]):
+            for fileName, rows in files:
+                entry = manifest.get(os.path.join(cleaner.dataFilesPath, fileName))
+                if entry is not None:
+                    previous.append(entry.recordID)
+        keys = sqliteHelper.getRecordKeys(previous + [entry.recordID for entries in unchanged[1:] for entry in entries])
+        window = 2 * self.alipayToleranceDays
+        days = {}
+        amounts = {}
         
-        oracleHelper = OrderHelper()
-        oracleHelper.batchInsert(result[1: len(result)])
+        def iterDays(pairs):
+            for date, money in pairs:
+                day = getDayNumber(getDate(str(date)), days)
+                amount = getAmountKey(money, self.alipayAmountDigits)
+                if day is not None and amount is not None:
+                    yield amount, day
+        
+        def add(pairs):
+            for amount, day in iterDays(pairs):
+                amounts.setdefault(amount, set()).add(day)
+        
+        def isNear(pairs):
+            for amount, day in iterDays(pairs):
+                near = amounts.get(amount)
+                if near and any(other in near for other in range(day - window, day + window + 1)):
+                    return True
+            return False
         
+        for files in changed[1:]:
+            for fileName, rows in files:
+                add((row[bankDateIndex], row[bankMoneyIndex]) for row in rows[1:])
+        for recordID in previous:
+            add(keys.get(recordID, []))
+        for entries in unchanged[1:]:
+            for entry in entries:
+                if entry.path in extra:
+                    add(keys.get(entry.recordID, []))
+        while waiting:
+            added = [entry for entry in waiting if isNear(keys.get(entry.recordID, []))]
+            if not added:
+                break
+            for entry in added:
+                extra.add(entry.path)
+                add(keys.get(entry.recordID, []))
+            waiting = [entry for entry in waiting if entry.path not in extra]
+    
+    def iterBankFiles(self, cleaner, files):
+        '''(path, rows) of each bank file; files with a different header are skipped.'''
+        cleaner.schemaErrors = []
+        firstHeader = None
+        for fileName, rows in files:
+            if not rows:
+                continue
+            if firstHeader is None:
+                firstHeader = list(rows[0])
+            elif list(rows[0]) != list(firstHeader):
+                error = 'header mismatch: file_name=[' + str(fileName) + '], header=' + str(rows[0]) + ', expected=' + str(firstHeader)
+                print(error)
+                cleaner.schemaErrors.append(error)
+                continue
+            yield os.path.join(cleaner.dataFilesPath, fileName), rows
+    
+    def ingestFile(self, path, rows, pointedText, reconciler, analyzer, manifest, sqliteLoader, oracleHelper, partsPath):
+        '''
+        Inserts the result rows of one bank file under the record id of the
+        file contents, after removing the rows of that id and of the
+        previous contents of the file, and writes them (header first) to the
+        part file of the record id; returns the number of data rows.
+
+        The file is loaded in one transaction on each store, committed (in
+        Oracle first) only once every row went through, and rolled back on
+        both when anything fails. The file enters the manifest after both
+        commits, so a file that failed part way is loaded again, from
+        scratch, on the next run.
+        '''
+        recordID = manifest.getRecordID(path)
+        entry = manifest.get(path)
+        recordIDs = [recordID]
+        if entry is not None and entry.recordID not in (None, recordID):
+            recordIDs.append(entry.recordID)
+        dateRange = getDateRange(rows, bankDateIndex)
+        sqliteLoader.begin()
+        oracleHelper.begin()
+        try:
+            sqliteLoader.deleteRecords(recordIDs)
+            oracleHelper.deleteRecords(recordIDs)
+            results = iterPointedColumn(analyzer.iterCalculate(iterCombineCCBAndAlipay(rows, reconciler)), pointedText)
+            results = streamToFile(results, getPartPath(partsPath, recordID))
+            next(results)
+            count = 0
+            for dataRows in iterChunks(results, self.insertChunkSize):
+                sqliteLoader.load(dataRows, recordID)
+                oracleHelper.batchInsert(dataRows, recordID)
+                count = count + len(dataRows)
+            oracleHelper.commit()
+            sqliteLoader.commit()
+        except Exception:
+            oracleHelper.rollback()
+            sqliteLoader.rollback()
+            raise
+        manifest.record(path, count, dateRange, recordID)
+        manifest.save()
+        return count
+    
+    def dropMissingFiles(self, entries, manifest, sqliteLoader, oracleHelper):
+        '''
+        Deletes the rows of the files of the manifest entries, which no
+        longer exist, in one transaction on each store, and removes the
+        files from the manifest once both are committed.
+        '''
+        recordIDs = [entry.recordID for entry in entries if entry.recordID]
+        if recordIDs:
+            sqliteLoader.begin()
+            oracleHelper.begin()
+            try:
+                sqliteLoader.deleteRecords(recordIDs)
+                oracleHelper.deleteRecords(recordIDs)
+                oracleHelper.commit()
+                sqliteLoader.commit()
+            except Exception:
+                oracleHelper.rollback()
+                sqliteLoader.rollback()
+                raise
+        for entry in entries:
+            print('removed missing file: ' + entry.path)
+            manifest.remove(entry.path)
+        manifest.save()
+    
+    def writeResultFile(self, cleaners, manifest, partsPath, resultPath):
+        '''
+        Writes the part files of the ingested bank files, in directory order,
+        into result.txt with the header of the first one only, and removes
+        the part files no bank file refers to any more.
+        '''
+        partPaths = []
+        for cleaner in cleaners:
+            for fileItem in getFiles(cleaner.dataFilesPath) or []:
+                entry = manifest.get(fileItem.absolutePath)
+                if entry is not None and entry.recordID:
+                    partPath = getPartPath(partsPath, entry.recordID)
+                    if os.path.exists(partPath):
+                        partPaths.append(partPath)
+        for fileName in os.listdir(partsPath):
+            if os.path.join(partsPath, fileName) not in partPaths:
+                os.remove(os.path.join(partsPath, fileName))
+        if not partPaths:
+            print('No available data can be exported to file')
+            if os.path.exists(resultPath):
+                os.remove(resultPath)
+            return
+        with codecs.open(resultPath, 'w', 'utf-8') as result:
+            for index, partPath in enumerate(partPaths):
+                with codecs.open(partPath, 'r', 'utf-8') as part:
+                    for lineIndex, line in enumerate(part):
+                        if lineIndex > 0 or index == 0:
+                            result.write(line)
+
+
+def getPartPath(partsPath, recordID):
+    return os.path.join(partsPath, recordID + '.txt')
+
+
+def removeFiles(directoryPath):
+    if os.path.isdir(directoryPath):
+        for fileName in os.listdir(directoryPath):
+            os.remove(os.path.join(directoryPath, fileName))
+
 if __name__ == '__main__':
 #     dataFilesPath = '/Users/summer/Desktop/account'
     dataFilesPath = 'd:\\test'
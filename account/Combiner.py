@@ -4,39 +4,151 @@ Created on 2018.1.24
 @author: summer.xia
 @contact: summer_west2010@126.com
 '''
+import datetime
+from collections import deque
+
 dateSpliter = ' '
+dateFormat = '%Y-%m-%d'
+bankDateIndex = 0
+bankMoneyIndex = 3
+alipayDateIndex = 2
+alipayMoneyIndex = 9
+
+def getDate(value):
+    return value.split(dateSpliter)[0]
+
+def getDayNumber(date, cache):
+    if date in cache:
+        return cache[date]
+    try:
+        day = datetime.datetime.strptime(date, dateFormat).toordinal()
+    except (TypeError, ValueError):
+        day = None
+    cache[date] = day
+    return day
+
+def getAmountKey(money, amountDigits):
+    if amountDigits is None:
+        return money
+    try:
+        return round(float(money), amountDigits)
+    except (TypeError, ValueError):
+        return None
+
+class AlipayReconciler(object):
+    '''
+    One-to-one assignment of alipay rows to bank rows, kept across calls:
+    an alipay row paired once is not given to a later bank row.
+
+    Rows with the same date and amount are paired first, in matrix order.
+    With toleranceDays > 0 the remaining rows of each amount are then
+    paired by a sweep over both sides sorted by date: every bank row takes
+    the earliest unused alipay row within +/- toleranceDays. amountDigits
+    rounds amounts before comparing them.
+    '''
 
-def findRelatedAlipay(transData, blanceMoney, alipayMatrix):
-    for alipay in alipayMatrix:
-        date = alipay[2].split(dateSpliter)[0]
-        money = alipay[9]
-        if date == transData and money == blanceMoney:
-            return alipay
-    return None
-    
-def combineCCBAndAlipay(creditMatrix, alipayMatrix):
-    creditNone = False   
+    def __init__(self, alipayMatrix, toleranceDays=0, amountDigits=None):
+        self.alipayMatrix = alipayMatrix or []
+        self.toleranceDays = toleranceDays
+        self.amountDigits = amountDigits
+        self.used = set()
+        self.days = {}
+        self.exact = {}
+        self.alipayByAmount = {}
+        for j, alipay in enumerate(self.alipayMatrix):
+            date = getDate(alipay[alipayDateIndex])
+            amount = getAmountKey(alipay[alipayMoneyIndex], amountDigits)
+            if amount is None:
+                continue
+            self.exact.setdefault((date, amount), deque()).append(j)
+            if toleranceDays > 0:
+                day = getDayNumber(date, self.days)
+                if day is not None:
+                    self.alipayByAmount.setdefault(amount, []).append((day, j))
+        for alipays in self.alipayByAmount.values():
+            alipays.sort()
+
+    def takeExact(self, key):
+        candidates = self.exact.get(key)
+        while candidates and candidates[0] in self.used:
+            candidates.popleft()
+        if not candidates:
+            return None
+        j = candidates.popleft()
+        self.used.add(j)
+        return j
+
+    def pair(self, bankMatrix):
+        '''(bank row index, alipay row index) pairs of bankMatrix, in bank row order.'''
+        bankMatrix = bankMatrix or []
+        pairs = []
+        pending = []
+        for i, bank in enumerate(bankMatrix):
+            j = self.takeExact((getDate(bank[bankDateIndex]), getAmountKey(bank[bankMoneyIndex], self.amountDigits)))
+            if j is not None:
+                pairs.append((i, j))
+            else:
+                pending.append(i)
+        if self.toleranceDays > 0 and pending:
+            bankByAmount = {}
+            for i in pending:
+                bank = bankMatrix[i]
+                day = getDayNumber(getDate(bank[bankDateIndex]), self.days)
+                amount = getAmountKey(bank[bankMoneyIndex], self.amountDigits)
+                if day is not None and amount is not None and amount in self.alipayByAmount:
+                    bankByAmount.setdefault(amount, []).append((day, i))
+            for amount, banks in bankByAmount.items():
+                alipays = self.alipayByAmount[amount]
+                banks.sort()
+                start = 0
+                for day, i in banks:
+                    while start < len(alipays) and (alipays[start][1] in self.used or alipays[start][0] < day - self.toleranceDays):
+                        start = start + 1
+                    k = start
+                    while k < len(alipays) and alipays[k][0] <= day + self.toleranceDays:
+                        if alipays[k][1] not in self.used:
+                            self.used.add(alipays[k][1])
+                            pairs.append((i, alipays[k][1]))
+                            break
+                        k = k + 1
+            pairs.sort()
+        return pairs
+
+def reconcile(bankMatrix, alipayMatrix, toleranceDays=0, amountDigits=None):
+    '''One-to-one (bank row index, alipay row index) pairs; see AlipayReconciler.'''
+    return AlipayReconciler(alipayMatrix, toleranceDays, amountDigits).pair(bankMatrix)
+
+def mergeAlipayDescription(row, alipay):
+    row[6] = row[6] + "@@" + alipay[7] + "@@" + alipay[8]
+
+def combineCCBAndAlipay(creditMatrix, alipayMatrix, toleranceDays=0, amountDigits=None):
+    '''
+    Append the description of the related alipay row to each bank row,
+    every alipay row being attached to one bank row at most (see
+    AlipayReconciler).
+    '''
+    creditNone = False
     if creditMatrix is None or len(creditMatrix) <= 0:
-        creditNone = True 
-    alipayNone = False  
+        creditNone = True
+    alipayNone = False
     if alipayMatrix is None or len(alipayMatrix) <= 0:
-        alipayNone = True  
+        alipayNone = True
     if creditNone or alipayNone:
         print('can not combine credit and alipay')
-    
-    rows = []
-    for credit in creditMatrix:
-        row = credit
-        transDate = credit[0].split(dateSpliter)[0]
-        blanceMoney = credit[3]
-        alipay = findRelatedAlipay(transDate, blanceMoney, alipayMatrix)        
-        if alipay is not None:
-            row[6] = credit[6] + "@@" + alipay[7] + "@@" + alipay[8]        
-        rows.append(row)
-    return rows 
-        
-    
-    
-
-    
-    
\ No newline at end of file
+        return list(creditMatrix or [])
+    pairs = reconcile(creditMatrix, alipayMatrix, toleranceDays, amountDigits)
+    for i, j in pairs:
+        mergeAlipayDescription(creditMatrix[i], alipayMatrix[j])
+    print('combined ' + str(len(pairs)) + ' of ' + str(len(creditMatrix)) + ' rows one to one')
+    return list(creditMatrix)
+
+def iterCombineCCBAndAlipay(bankRows, reconciler):
+    '''
+    Bank rows of one file (header first) with the descriptions of the
+    alipay rows the shared reconciler pairs them with; files reconciled
+    earlier keep the alipay rows they were given.
+    '''
+    bankRows = list(bankRows)
+    for i, j in reconciler.pair(bankRows[1:]):
+        mergeAlipayDescription(bankRows[i + 1], reconciler.alipayMatrix[j])
+    return iter(bankRows)
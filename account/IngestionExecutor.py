@@ -0,0 +1,101 @@
+'''
+Parses statement files of several cleaners in a process pool.
+'''
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from account.helper.FileHelper import getFiles
+
+
+def parseFile(cleanerClass, dataFilesPath, fileItem):
+    '''Cleaned rows of one file as (fileName, rows, error); runs in a worker process.'''
+    try:
+        cleaner = cleanerClass(dataFilesPath)
+        return (fileItem.fileName, list(cleaner.iterFileRows(fileItem)), None)
+    except Exception as e:
+        return (fileItem.fileName, None, str(e))
+
+
+class IngestionExecutor(object):
+    '''
+    Runs the per-file parsing of every cleaner in one process pool, so files
+    of different sources are parsed concurrently, and hands the rows back
+    in directory order. A file that fails to parse is reported in errors
+    and left out; the other files are not affected.
+    '''
+
+    def __init__(self, workers=None):
+        self.workers = workers or os.cpu_count() or 1
+        # files submitted ahead of the one being consumed
+        self.window = self.workers * 2
+        self.errors = []
+
+    def iterResults(self, tasks):
+        if self.workers <= 1:
+            for index, cleaner, fileItem in tasks:
+                yield (index,) + parseFile(type(cleaner), cleaner.dataFilesPath, fileItem)
+            return
+        with ProcessPoolExecutor(self.workers) as pool:
+            tasks = iter(tasks)
+            inFlight = deque()
+
+            def submit(task):
+                index, cleaner, fileItem = task
+                inFlight.append((index, fileItem, pool.submit(parseFile, type(cleaner), cleaner.dataFilesPath, fileItem)))
+
+            for task in islice(tasks, self.window):
+                submit(task)
+            while inFlight:
+                index, fileItem, future = inFlight.popleft()
+                task = next(tasks, None)
+                if task is not None:
+                    submit(task)
+                try:
+                    yield (index,) + future.result()
+                except Exception as e:
+                    yield (index, fileItem.fileName, None, str(e))
+
+    def fileStreams(self, cleaners, select=None):
+        '''
+        Like streams, but one iterator of (fileName, rows) per cleaner so the
+        rows of each file stay apart; select(cleaner, fileItem) picks the
+        files to parse (all of them by default).
+        '''
+        tasks = []
+        pending = []
+        for index, cleaner in enumerate(cleaners):
+            fileItems = getFiles(cleaner.dataFilesPath) or []
+            if not fileItems:
+                print('No data files are available')
+            if select is not None:
+                fileItems = [fileItem for fileItem in fileItems if select(cleaner, fileItem)]
+            tasks.extend((index, cleaner, fileItem) for fileItem in fileItems)
+            pending.append(len(fileItems))
+        results = self.iterResults(tasks)
+        buffers = [deque() for _ in cleaners]
+
+        def fileRows(index):
+            while pending[index] > 0:
+                if not buffers[index]:
+                    result = next(results)
+                    buffers[result[0]].append(result[1:])
+                    continue
+                fileName, rows, error = buffers[index].popleft()
+                pending[index] = pending[index] - 1
+                if error is not None:
+                    message = 'file_name=[' + fileName + '], error=' + error
+                    print('Parsing file has error, ' + message)
+                    self.errors.append(message)
+                    continue
+                yield fileName, rows
+
+        return [fileRows(index) for index in range(len(cleaners))]
+
+    def streams(self, cleaners):
+        '''
+        One stream of merged rows per cleaner (like cleaner.stream()). The
+        streams share the pool and may be consumed in any order; rows parsed
+        for a stream that is not being read yet are buffered.
+        '''
+        return [cleaner.mergeFiles(fileRows) for cleaner, fileRows in zip(cleaners, self.fileStreams(cleaners))]
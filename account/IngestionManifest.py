@@ -0,0 +1,161 @@
+'''
+Fingerprints of the statement files already ingested, kept in the SQLite
+database next to the rows they produced.
+'''
+import datetime
+import hashlib
+import os
+import sqlite3
+from account.Combiner import getDate
+
+
+def getFileDigest(path, blockSize=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(blockSize), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def getDateRange(rows, dateIndex):
+    '''(first, last) yyyy-MM-dd date of the data rows (header excluded), or (None, None).'''
+    dates = [getDate(str(row[dateIndex])) for row in rows[1:] if len(row) > dateIndex]
+    if not dates:
+        return (None, None)
+    return (min(dates), max(dates))
+
+
+def widenDateRange(dateRange, days):
+    '''dateRange extended by days on both sides.'''
+    firstDate, lastDate = dateRange
+    if not days or firstDate is None:
+        return dateRange
+    delta = datetime.timedelta(days=days)
+    return ((datetime.datetime.strptime(firstDate, '%Y-%m-%d') - delta).strftime('%Y-%m-%d'),
+            (datetime.datetime.strptime(lastDate, '%Y-%m-%d') + delta).strftime('%Y-%m-%d'))
+
+
+class ManifestEntry(object):
+
+    def __init__(self, path, size, mtime, digest, rows=0, firstDate=None, lastDate=None, recordID=None):
+        self.path = path
+        self.size = size
+        self.mtime = mtime
+        self.digest = digest
+        self.rows = rows
+        self.firstDate = firstDate
+        self.lastDate = lastDate
+        self.recordID = recordID
+
+    def overlaps(self, dateRange):
+        firstDate, lastDate = dateRange
+        if self.firstDate is None or firstDate is None:
+            return False
+        return self.firstDate <= lastDate and firstDate <= self.lastDate
+
+
+class IngestionManifest(object):
+    '''
+    Path, size, mtime and content hash of every ingested file, with the
+    number of rows, the date range and the record id of the rows it
+    produced. A file whose size and mtime are unchanged is not read again;
+    otherwise its hash decides whether it changed.
+    '''
+    tableScript = '''CREATE TABLE IF NOT EXISTS INGESTION_MANIFEST(
+  path        TEXT     PRIMARY KEY,
+  size        INTEGER  NOT NULL,
+  mtime       REAL     NOT NULL,
+  digest      TEXT     NOT NULL,
+  rows        INTEGER  NOT NULL default 0,
+  first_date  TEXT,
+  last_date   TEXT,
+  recordid    TEXT,
+  ingesttime  DATETIME default (datetime('now', 'localtime'))
+)'''
+    columns = ['path', 'size', 'mtime', 'digest', 'rows', 'first_date', 'last_date', 'recordid']
+
+    def __init__(self, databasePath):
+        self.databasePath = databasePath
+        self.entries = {}
+        self.digests = {}
+        self.dirty = set()
+        self.removed = set()
+
+    def load(self):
+        conn = sqlite3.connect(self.databasePath)
+        try:
+            conn.execute(self.tableScript)
+            conn.commit()
+            for values in conn.execute('SELECT ' + ', '.join(self.columns) + ' FROM INGESTION_MANIFEST'):
+                self.entries[values[0]] = ManifestEntry(*values)
+        finally:
+            conn.close()
+        return self
+
+    def isEmpty(self):
+        return len(self.entries) <= 0
+
+    def get(self, path):
+        return self.entries.get(path)
+
+    def getMissing(self):
+        '''Entries of the files that no longer exist.'''
+        return [entry for path, entry in self.entries.items() if not os.path.exists(path)]
+
+    def remove(self, path):
+        self.entries.pop(path, None)
+        self.digests.pop(path, None)
+        self.dirty.discard(path)
+        self.removed.add(path)
+
+    def getStat(self, path):
+        stat = os.stat(path)
+        return (stat.st_size, stat.st_mtime)
+
+    def isChanged(self, path):
+        '''True for a new file or one whose contents differ from the ingested ones.'''
+        size, mtime = self.getStat(path)
+        entry = self.entries.get(path)
+        if entry is not None and entry.size == size and entry.mtime == mtime:
+            return False
+        digest = getFileDigest(path)
+        self.digests[path] = (size, mtime, digest)
+        if entry is not None and entry.digest == digest:
+            # touched only: remember the new stat so it is not hashed again
+            entry.size = size
+            entry.mtime = mtime
+            self.dirty.add(path)
+            return False
+        return True
+
+    def getRecordID(self, path):
+        '''Record id of the rows of the current contents of path.'''
+        if path not in self.digests:
+            size, mtime = self.getStat(path)
+            self.digests[path] = (size, mtime, getFileDigest(path))
+        return hashlib.sha1((path + '@@' + self.digests[path][2]).encode('utf-8')).hexdigest()
+
+    def record(self, path, rows, dateRange, recordID=None):
+        if path not in self.digests:
+            self.getRecordID(path)
+        size, mtime, digest = self.digests[path]
+        self.entries[path] = ManifestEntry(path, size, mtime, digest, rows, dateRange[0], dateRange[1], recordID)
+        self.dirty.add(path)
+
+    def save(self):
+        if not self.dirty and not self.removed:
+            return
+        values = []
+        for path in self.dirty:
+            entry = self.entries[path]
+            values.append((entry.path, entry.size, entry.mtime, entry.digest, entry.rows, entry.firstDate, entry.lastDate, entry.recordID))
+        conn = sqlite3.connect(self.databasePath)
+        try:
+            conn.execute(self.tableScript)
+            conn.executemany('DELETE FROM INGESTION_MANIFEST WHERE path = ?', [(path,) for path in self.removed])
+            conn.executemany('INSERT OR REPLACE INTO INGESTION_MANIFEST(' + ', '.join(self.columns) + ') values(?, ?, ?, ?, ?, ?, ?, ?)', values)
+            conn.commit()
+        finally:
+            conn.close()
+        self.dirty = set()
+        self.removed = set()
@@ -8,6 +8,8 @@ import os
 import json
 import codecs
 from account.analyzer.ConsumptionAnalyzer import ConsumptionAnalyzer
+from account.helper.KeywordHelper import KeywordAutomaton
+from account.helper.JSONHelper import freeze, getDictionary
 
 
 class BusinessAnalyzer(object):
@@ -29,9 +31,16 @@ class BusinessAnalyzer(object):
     
     def __init__(self, lines=[]):
         self.lines = lines
-        self.dcData = self.listOrdinaryType(self.dcPath)
-        self.touData = self.listOrdinaryType(self.touPath)
         self.consumptionAnalyzer = ConsumptionAnalyzer()     
+    
+    # shared read-only dictionaries, reloaded when their JSON files change
+    @property
+    def dcData(self):
+        return getDictionary(self.dcPath, self.listOrdinaryType)
+    
+    @property
+    def touData(self):
+        return getDictionary(self.touPath, self.listOrdinaryType)
         
     def readDictionaryData(self, path):
         with codecs.open(path, 'r', self.encoding) as json_file:
@@ -39,7 +48,7 @@ class BusinessAnalyzer(object):
         return data
     
     def listOrdinaryType(self, path):
-        data = self.readDictionaryData(path)
+        data = freeze(self.readDictionaryData(path))
         defaultRow = None
         for i, row in enumerate(data):
             if i == 0:
@@ -47,18 +56,34 @@ class BusinessAnalyzer(object):
             if row['default']:
                 defaultRow = row
                 break
-        return {'default':defaultRow, 'rows':data}
+        return freeze({'default':defaultRow, 'rows':data, 'matcher':self.compileNames(data)})
+    
+    def compileNames(self, rows):
+        matcher = KeywordAutomaton()
+        for i, row in enumerate(rows):
+            matcher.addKeyword(row['name'], i)
+        return matcher.build()
     
     def getOrdinaryType(self, text, data):
-        result = data['default']
-        for key in data['rows']:
-            if key["name"] in text:
-                result = key
-        return result
+        if data.get('matcher') is None:
+            data['matcher'] = self.compileNames(data['rows'])
+        # last matching row wins
+        hit = data['matcher'].findLast(text)
+        if hit is None:
+            return data['default']
+        return data['rows'][hit]
     
     def calculate(self, lines=[]):
         if len(lines) <= 0:
             return None
+        for line in self.iterCalculate(lines):
+            pass
+        return lines
+    
+    def iterCalculate(self, lines):
+        '''Streaming calculate: appends the analysis columns to each line and yields it (None lines are dropped).'''
+        dcData = self.dcData
+        touData = self.touData
         for index, line in enumerate(lines):
             if index == self.headerRowIndex:
                 line.append(self.disbursementNewColumn1)
@@ -68,14 +93,15 @@ class BusinessAnalyzer(object):
                 line.append(self.consumptionNewColumn1)
                 line.append(self.consumptionNewColumn2)
                 line.append(self.keywordNewColumn1)
+                yield line
                 continue
             if line is None:
                 continue 
             description = line[self.descriptionColumnIndex]
-            dc = self.getOrdinaryType(description, self.dcData)
+            dc = self.getOrdinaryType(description, dcData)
             line.append(dc['name'])
             line.append(dc['value'])
-            tou = self.getOrdinaryType(description, self.touData)
+            tou = self.getOrdinaryType(description, touData)
             line.append(tou['name'])
             line.append(tou['value'])
             money = line[self.transactionColumnIndex]
@@ -84,4 +110,4 @@ class BusinessAnalyzer(object):
                 line.append(ct['name'])
                 line.append(ct['value'])
                 line.append(ct['keyword'])
-        return lines
+            yield line
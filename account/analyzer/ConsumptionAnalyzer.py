@@ -8,14 +8,19 @@ import os
 import json
 import codecs
 from account.helper.StringHelper import textSeparator
+from account.helper.KeywordHelper import KeywordAutomaton
+from account.helper.JSONHelper import freeze, getDictionary
 
 class ConsumptionAnalyzer(object):
     encoding = 'utf-8'
     BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + os.path.sep + 'static' + os.path.sep
     ctPath = os.path.join(BASE_DIR, 'consumption-type.json')
+    pointedNames = ('转账', '房租', '心愿储蓄')
     
-    def __init__(self):
-        self.ctData = self.listConsumptionType(self.ctPath)
+    @property
+    def ctData(self):
+        # shared read-only taxonomy, reloaded when the JSON file changes
+        return getDictionary(self.ctPath, self.listConsumptionType)
         
     def readDictionaryData(self, path):
         with codecs.open(path, 'r', self.encoding) as json_file:
@@ -33,12 +38,36 @@ class ConsumptionAnalyzer(object):
                     if secondNode['default']:
                         rowData = secondNode
                         break
-        return {'default':rowData, 'rows':allData}
+        allData = freeze(allData)
+        rowData = freeze(rowData)
+        pointed = {}
+        for name in self.pointedNames:
+            pointed[name] = self.getPointedConsumption(name, allData)
+        return freeze({'default':rowData, 'rows':allData, 'matcher':self.compileKeyWords(allData), 'pointed':pointed})
+    
+    def compileKeyWords(self, rows):
+        # payload (row index, keyword index): the smallest hit is the first
+        # category in file order, then its first keyword in list order
+        matcher = KeywordAutomaton()
+        for i, row in enumerate(rows):
+            if row.get('keyWords') is None:
+                continue
+            for j, keyWord in enumerate(row['keyWords']):
+                matcher.addKeyword(keyWord, (i, j))
+        return matcher.build()
+    
+    def getResult(self, row, keyword):
+        '''Fresh result record for a taxonomy row; the shared rows are never modified.'''
+        if row is None:
+            return None
+        result = dict(row)
+        result['keyword'] = keyword
+        return result
     
     def getDefaultConsumption(self, data):
-        result = data['default']        
+        result = data['default']
         if result is not None:
-            result['keyword'] = result['name']
+            result = self.getResult(result, result['name'])
         return result
             
     def getPointedConsumption(self, keyWord, rows):
@@ -50,20 +79,13 @@ class ConsumptionAnalyzer(object):
         return result
     
     def getConsumptionByKeyWord(self, text, data):
-        result = None
-        for row in data['rows']:
-            if row.get('keyWords') is None:
-                continue
-            matchFlag = False
-            for keyWord in row['keyWords']:
-                if keyWord in text:
-                    result = row
-                    result['keyword'] = keyWord
-                    matchFlag = True
-                    break
-            if matchFlag:
-                break
-        return result
+        if data.get('matcher') is None:
+            data['matcher'] = self.compileKeyWords(data['rows'])
+        hit = data['matcher'].findFirst(text)
+        if hit is None:
+            return None
+        row = data['rows'][hit[0]]
+        return self.getResult(row, row['keyWords'][hit[1]])
     
     def getTransferType(self, text):
         if text:
@@ -90,32 +112,39 @@ class ConsumptionAnalyzer(object):
                 return True
         return False 
     
-    def getConsumptionType(self, text, money):
-        defaultConsumption = self.getDefaultConsumption(self.ctData)
-        transferConsumption = self.getPointedConsumption('转账', self.ctData['rows'])
-        rentConsumption = self.getPointedConsumption('房租', self.ctData['rows'])
-        wishConsumption = self.getPointedConsumption('心愿储蓄', self.ctData['rows'])
+    def getConsumptionType(self, text, money, data=None):
+        if data is None:
+            data = self.ctData
+        pointed = data['pointed']
         
-        result = None
         flag = self.getRentType(text, money)
         if flag is True:
-            result = rentConsumption
-            result['keyword'] = text
-            return result
+            return self.getResult(pointed['房租'], text)
         flag = self.getWishType(text, money)
         if flag is True:
-            result = wishConsumption
-            result['keyword'] = text
-            return result
+            return self.getResult(pointed['心愿储蓄'], text)
         flag = self.getTransferType(text)
         if flag is True:
-            result = transferConsumption
-            result['keyword'] = text
-            return result
+            return self.getResult(pointed['转账'], text)
         
-        result = self.getConsumptionByKeyWord(text, self.ctData)
+        result = self.getConsumptionByKeyWord(text, data)
         
         if result is None:
-            result = defaultConsumption
-            result['keyword'] = 'None'
-        return result
\ No newline at end of file
+            result = self.getResult(data['default'], 'None')
+        return result
+    
+    def classify_many(self, items):
+        '''getConsumptionType for each (text, money) pair against one taxonomy snapshot; repeated pairs are evaluated once.'''
+        data = self.ctData
+        memo = {}
+        results = []
+        for text, money in items:
+            key = (text, money)
+            if key in memo:
+                result = memo[key]
+                results.append(dict(result) if result is not None else None)
+                continue
+            result = self.getConsumptionType(text, money, data)
+            memo[key] = result
+            results.append(result)
+        return results
@@ -7,9 +7,11 @@ Created on 2018.1.23
 from account.helper.FileHelper import getFiles
 from account.helper.FileHelper import getAllLines
 from account.helper.FileHelper import generateFile
+from account.helper.FileHelper import iterLines
+from account.cleaner.Cleaner import Cleaner
 
 
-class AlipayAccountCleaner(object):
+class AlipayAccountCleaner(Cleaner):
     encoding = 'gbk'
     filterHeadKeyWord = '交易记录明细列表'
     filterTailKeyWord = '-----------------------------------------'
@@ -17,22 +19,24 @@ class AlipayAccountCleaner(object):
     moneyIndex = 9
     
     def __init__(self, dataFilesPath=None):
-        self.dataFilesPath = dataFilesPath
+        super().__init__(dataFilesPath)
         
     def getDataLines(self, lines):
         if len(lines) < 0:
             return None
+        return list(self.iterDataLines(lines))
+    
+    def iterDataLines(self, lines):
+        '''Lines between the head keyword line and the tail keyword line.'''
         headFlag = False
-        dataLines = []
         for line in lines:
             if self.filterHeadKeyWord in line:
                 headFlag = True
                 continue
             if self.filterTailKeyWord in line:
                 break
-            if headFlag:                
-                dataLines.append(line)
-        return dataLines
+            if headFlag:
+                yield line
     
     def getCleanHeader(self, array):
         cleanHeader = []
@@ -45,14 +49,16 @@ class AlipayAccountCleaner(object):
     def generateMatrix(self, lines):
         if len(lines) < 0:
             return None
-        matrix = []
+        return list(self.iterMatrix(lines))
+    
+    def iterMatrix(self, lines):
         headerLength = 0 
         for (index, line) in enumerate(lines):
             array = line.split(self.spliter)
             if index == 0:
                 cleanHeader = self.getCleanHeader(array)
                 headerLength = len(cleanHeader)
-                matrix.append(cleanHeader)
+                yield cleanHeader
                 continue
             if len(array) >= headerLength:
                 cleanArray1 = array[0: headerLength]
@@ -62,10 +68,12 @@ class AlipayAccountCleaner(object):
                         cleanArray2.append(float(item.strip()))
                     else:
                         cleanArray2.append(item.strip())                        
-                matrix.append(cleanArray2)
+                yield cleanArray2
             else:
                 print('error apliay row data, length:[ ' + str(len(array)) + ' ]: ' + str(line))
-        return matrix
+    
+    def iterFileRows(self, fileItem):
+        return self.iterMatrix(self.iterDataLines(iterLines(fileItem.absolutePath, self.encoding)))
         
     def getAllDataLines(self):
         fileItems = getFiles(self.dataFilesPath)
@@ -83,18 +91,7 @@ class AlipayAccountCleaner(object):
         return texts
     
     def clean(self):
-        originalMap = self.getAllDataLines()
-        if not originalMap:
-            print("Not map data is available")
-        result = []
-        counter = 0
-        for key in originalMap.keys():
-            finalRowDatas = originalMap[key]
-            if counter != 0 and len(finalRowDatas) > 1:
-                finalRowDatas = finalRowDatas[1: len(finalRowDatas)]
-            result = result + finalRowDatas
-            counter = counter + 1      
-        return result
+        return self.cleanHeader(self.getAllDataLines())
     
     def checkLength(self, dataRows):
         error = []
@@ -9,9 +9,11 @@ from account.helper.StringHelper import parseDate
 from account.helper.StringHelper import formatDateTime
 from account.helper.FileHelper import getFiles
 from account.helper.FileHelper import getAllLines
+from account.helper.FileHelper import iterLines
+from account.cleaner.Cleaner import Cleaner
 
 
-class CCBCreditCleaner(object):
+class CCBCreditCleaner(Cleaner):
     filterHeaderKeyWord = '交易明细'
     spliter = ' '
     filterDataKeyWords = ['CNY/']
@@ -24,27 +26,31 @@ class CCBCreditCleaner(object):
     moneyIndex2 = 5
    
     def __init__(self, dataFilesPath=None):
-        self.dataFilesPath = dataFilesPath
+        super().__init__(dataFilesPath)
     
     def getDataLines(self, lines):
         if len(lines) < 0:
             return None
+        return list(self.iterDataLines(lines))
+    
+    def iterDataLines(self, lines):
+        '''Lines after the header keyword line: the column header, then the data (skipping the line right after the header).'''
         startFlag = False
-        dataLines = []
         counter = 0
         for line in lines:
             if startFlag:
                 if counter == 0 or counter > 1:
-                    dataLines.append(line)
+                    yield line
                 counter = counter + 1
             if self.filterHeaderKeyWord in line:
                 startFlag = True
-        return dataLines
     
     def generateMatrix(self, lines):
         if len(lines) < 0:
             return None
-        matrix = []
+        return list(self.iterMatrix(lines))
+    
+    def iterMatrix(self, lines):
         for line in lines:
             array = line.split(self.spliter)
             cleanArray1 = filter(isNotEmpty, array)
@@ -57,8 +63,7 @@ class CCBCreditCleaner(object):
                     cleanArray2.append(currencyItems[1])
                 else:
                     cleanArray2.append(item.strip())
-            matrix.append(cleanArray2)
-        return matrix
+            yield cleanArray2
     
     def getAllDataLines(self):
         fileItems = getFiles(self.dataFilesPath)
@@ -117,37 +122,32 @@ class CCBCreditCleaner(object):
             print("Not map data is available")
         correctMap = {}
         for (k, v) in originalMap.items():
-            correctRows = []
-            for (index, row) in enumerate(v):
-                correctRow = row
-                if index == 0:                 
-                    lenHeader = len(correctRow)
-                    correctRows.append(correctRow)
-                    continue                
-                else:
-                    lenData = len(row)                    
-                    if lenData > lenHeader:
-                        ''' over long row data '''
-                        print('before:' + str(row))
-                        correctRow = self.correctOverLengthRow(row, lenHeader, lenData)
-                        print('after:' + str(correctRow))                       
-                    elif lenData < lenHeader:
-                        '''error row data'''
-                        print('error row data:file_name=[' + k + '], row_data=' + str(row) + ']')
-                correctRows.append(self.filterRowData(correctRow))
-            correctMap[k] = correctRows
+            correctMap[k] = list(self.iterCorrectRows(k, v))
         return correctMap
     
+    def iterCorrectRows(self, fileName, rows):
+        '''Header as is, then each row with over-long descriptions merged and typed.'''
+        for (index, row) in enumerate(rows):
+            correctRow = row
+            if index == 0:                 
+                lenHeader = len(correctRow)
+                yield correctRow
+                continue                
+            else:
+                lenData = len(row)                    
+                if lenData > lenHeader:
+                    ''' over long row data '''
+                    print('before:' + str(row))
+                    correctRow = self.correctOverLengthRow(row, lenHeader, lenData)
+                    print('after:' + str(correctRow))                       
+                elif lenData < lenHeader:
+                    '''error row data'''
+                    print('error row data:file_name=[' + fileName + '], row_data=' + str(row) + ']')
+            yield self.filterRowData(correctRow)
+    
+    def iterFileRows(self, fileItem):
+        lines = iterLines(fileItem.absolutePath, self.encoding)
+        return self.iterCorrectRows(fileItem.fileName, self.iterMatrix(self.iterDataLines(lines)))
+    
     def clean(self):
-        originalMap = self.correct()
-        if not originalMap:
-            print("Not map data is available")
-        result = []
-        counter = 0
-        for key in originalMap.keys():
-            finalRowDatas = originalMap[key]
-            if counter != 0 and len(finalRowDatas) > 1:
-                finalRowDatas = finalRowDatas[1: len(finalRowDatas)]
-            result = result + finalRowDatas
-            counter = counter + 1      
-        return result
+        return self.cleanHeader(self.correct())
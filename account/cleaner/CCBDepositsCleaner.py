@@ -7,6 +7,7 @@ Created on 2018.1.25
 from account.helper.FileHelper import generateFile
 from account.helper.FileHelper import getFiles
 from account.helper.FileHelper import getAllLines
+from account.helper.FileHelper import iterLines
 from account.cleaner.Cleaner import Cleaner
 from account.helper.StringHelper import parseDateTime
 from account.helper.StringHelper import formatDateTime
@@ -15,37 +16,42 @@ import numpy as np
 class CCBDepositsCleaner(Cleaner):
     filterHeaderKeyWord = '记账日'
     filterAccountKeyWord = '账　　号'
+    accountColumnName = '账号'
     accountNumber = ''
     spliter = ','
     
     def __init__(self, dataFilesPath=None):
-        self.dataFilesPath = dataFilesPath
+        super().__init__(dataFilesPath)
     
     def getDataLines(self, lines):
         if len(lines) < 0:
             return None
+        return list(self.iterDataLines(lines))
+    
+    def iterDataLines(self, lines):
+        '''Lines from the header keyword line on; the account line before it sets accountNumber.'''
         startFlag = False
-        dataLines = []
         for line in lines:
             if self.filterHeaderKeyWord in line:
                 startFlag = True
             elif self.filterAccountKeyWord in line:
                 self.accountNumber = line.split('：')[1].strip()        
             if startFlag:
-                dataLines.append(line)
-        return dataLines
+                yield line
     
     def generateMatrix(self, lines):
         if len(lines) < 0:
             return None
-        matrix = []
+        return list(self.iterMatrix(lines))
+    
+    def iterMatrix(self, lines):
         headerLength = 0
         for (index, line) in enumerate(lines):
             array = line.split(self.spliter)
             if index == 0:
                 header = super().getCleanHeader(array)
                 headerLength = len(header)
-                matrix.append(header)
+                yield header
                 continue
             
             if array is not None and len(array) >= headerLength:
@@ -53,10 +59,26 @@ class CCBDepositsCleaner(Cleaner):
                 cleanArray2 = []
                 for column in cleanArray1:
                     cleanArray2.append(column.strip())
-                matrix.append(cleanArray2)
+                yield cleanArray2
             else:
                 print('error CCB deposits row data, length:[ ' + str(len(array)) + ' ]: ' + str(line))
-        return matrix
+    
+    def iterFileRows(self, fileItem):
+        '''Typed rows of one file; accountNumber is the one of the file being read.'''
+        lines = iterLines(fileItem.absolutePath, self.encoding)
+        for (index, row) in enumerate(self.iterMatrix(self.iterDataLines(lines))):
+            if index == 0:
+                yield [row[0], row[1], self.accountColumnName, row[4], row[9], row[6], row[10]]
+                continue
+            yield [
+                self.formatDateCell(row[0], row[2]),
+                self.formatDateCell(row[1], row[2]),
+                self.accountNumber,
+                self.formatMoneyCell(row[4], row[5]),
+                row[9],
+                self.formatBlanceCell(row[6]),
+                self.formatDigestCell(row[3], row[7], row[8], row[10]),
+            ]
     
     def getAllDataLines(self):
         fileItems = getFiles(self.dataFilesPath)
@@ -73,69 +95,23 @@ class CCBDepositsCleaner(Cleaner):
             texts[fileItem.fileName] = dataLines
         return texts
     
-    def formatDate(self, dates, times):
-        for (index, date) in enumerate(dates):
-            if index == 0:
-                continue
-            dates[index] = formatDateTime(parseDateTime(date + times[index]))
-        return dates
+    def formatDateCell(self, date, time):
+        return formatDateTime(parseDateTime(date + time))
     
-    def fomatMoney(self, incomes, outcomes):
-        for (index, income) in enumerate(incomes):
-            if index == 0:
-                continue
-            if len(income) > 0:
-                incomes[index] = float(income)
-            else:
-                outcome = outcomes[index]
-                if len(outcome) > 0:
-                    incomes[index] = float(outcome)
-                else:
-                    incomes[index] = 0
-        return incomes
+    def formatMoneyCell(self, income, outcome):
+        if len(income) > 0:
+            return float(income)
+        if len(outcome) > 0:
+            return float(outcome)
+        return 0
     
-    def formatBlance(self, blances):
-        for (index, blance) in enumerate(blances):
-            if index == 0:
-                continue
-            if len(blance) > 0:
-                blances[index] = float(blance)
-            else:
-                blances[index] = 0
-        return blances
+    def formatBlanceCell(self, blance):
+        if len(blance) > 0:
+            return float(blance)
+        return 0
+    
+    def formatDigestCell(self, location, oppositeAccount, oppisiteName, digest):
+        return ''.join([str(location),"@@",str(oppositeAccount),"@@",str(oppisiteName),"@@", str(digest)])
     
-    def formatDigest(self, locations, oppositeAccounts, oppisiteNames, digests):
-        result = []
-        for (index, digest) in enumerate(digests): 
-            if index == 0:
-                result.append(digest)
-                continue
-            allStr = ''.join([str(locations[index]),"@@",str(oppositeAccounts[index]),"@@",str(oppisiteNames[index]),"@@", str(digest)])
-            result.append(allStr)
-        return result
-            
     def clean(self):
-        rowDatas = super().cleanHeader(self.getAllDataLines())
-        if rowDatas is None or len(rowDatas) <= 0:
-            return
-        array = np.array(rowDatas)       
-        c_a = self.formatDate(array[:, 0], array[:, 2])
-        c_b = self.formatDate(array[:, 1], array[:, 2])
-        c_c = np.full(len(rowDatas), self.accountNumber)
-        c_d = self.fomatMoney(array[:, 4], array[:, 5]) 
-        c_e = array[:, 9]
-        c_f = self.formatBlance(array[:, 6])
-        c_g = self.formatDigest(array[:, 3], array[:, 7], array[:, 8], array[:, 10])
-        result = []
-        for index in range(0,len(rowDatas)):
-            rowData = []
-            rowData.append(c_a[index])
-            rowData.append(c_b[index])
-            rowData.append(c_c[index])
-            rowData.append(c_d[index])
-            rowData.append(c_e[index])
-            rowData.append(c_f[index])
-            rowData.append(c_g[index])
-            result.append(rowData)
-        return result
-
+        return list(self.stream())
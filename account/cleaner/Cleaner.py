@@ -4,7 +4,18 @@ Created on 2018.1.25
 @author: summer.xia
 @contact: summer_west2010@126.com
 '''
-class Cleaner(object):    
+from abc import ABCMeta
+from abc import abstractmethod
+from account.helper.FileHelper import getFiles
+
+
+class Cleaner(object, metaclass=ABCMeta):
+    encoding = 'utf-8'
+
+    def __init__(self, dataFilesPath=None):
+        self.dataFilesPath = dataFilesPath
+        self.schemaErrors = []
+
     def getCleanHeader(self, array):
         cleanHeader = []
         for header in array:
@@ -12,17 +23,45 @@ class Cleaner(object):
             if header:
                 cleanHeader.append(header)
         return cleanHeader
-    
+
     def cleanHeader(self, originalMap):
         if not originalMap:
             print("Not map data is available")
-        result = []
-        counter = 0
-        for key in originalMap.keys():
-            finalRowDatas = originalMap[key]
-            if counter != 0 and len(finalRowDatas) > 1:
-                finalRowDatas = finalRowDatas[1: len(finalRowDatas)]
-            result = result + finalRowDatas
-            counter = counter + 1      
-        return result
-    
+            return []
+        return list(self.mergeFiles(originalMap.items()))
+
+    def mergeFiles(self, fileRows):
+        '''
+        Chains the rows of each (fileName, rows) source without copying,
+        keeping the header of the first file only. A file whose header does
+        not match the first one is skipped and reported in schemaErrors.
+        '''
+        self.schemaErrors = []
+        firstHeader = None
+        for fileName, rows in fileRows:
+            rows = iter(rows)
+            header = next(rows, None)
+            if header is None:
+                continue
+            if firstHeader is None:
+                firstHeader = header
+                yield header
+            elif list(header) != list(firstHeader):
+                error = 'header mismatch: file_name=[' + str(fileName) + '], header=' + str(header) + ', expected=' + str(firstHeader)
+                print(error)
+                self.schemaErrors.append(error)
+                continue
+            for row in rows:
+                yield row
+
+    @abstractmethod
+    def iterFileRows(self, fileItem):
+        '''Cleaned rows of one file, header first.'''
+
+    def stream(self):
+        '''Streaming clean(): typed rows of every file in directory order, read lazily.'''
+        fileItems = getFiles(self.dataFilesPath)
+        if not fileItems:
+            print('No data files are available')
+            return iter(())
+        return self.mergeFiles((fileItem.fileName, self.iterFileRows(fileItem)) for fileItem in fileItems)
@@ -4,24 +4,133 @@ Created on 2018.1.17
 @author: summer.xia
 @contact: summer_west2010@126.com
 '''
-import cx_Oracle as oracle
+import os
+import sqlite3
+import threading
+from itertools import islice
 from account.helper.StringHelper import getUUID
 
+try:
+    import cx_Oracle as oracle
+except ImportError:
+    oracle = None
 
-class OrderHelper(object):    
-        
-    def batchInsert(self, dataRows):
-        conn = oracle.connect('scott/summer@127.0.0.1:1521/ORCL')  
-        cursor = conn.cursor()
-        
-        recordID = str(getUUID())
-        for dataRow in dataRows:
-            uuid = str(getUUID())
-            params = {"v_id": uuid, "v_card_id": dataRow[3], "v_transaction_date":dataRow[1], "v_bookkeeping_date":dataRow[2], "v_transaction_desc" : dataRow[7], "v_balance_currency" : dataRow[5], "v_balance_money": dataRow[4], "v_card_type_id":1, "v_card_type_name":"中国建设银行购物卡", "v_consumption_type": dataRow[11], "v_consume_id": dataRow[13], "v_consume_name" : dataRow[12], "v_demoarea": dataRow[14], "v_recordid":recordID, "v_payment_type_id":dataRow[9]}
-            cursor.execute("insert into credit (id, card_id, transaction_date, bookkeeping_date, transaction_desc, balance_currency, balance_money, card_type_id, card_type_name, consumption_type, consume_id, consume_name, demoarea, recordid, payment_type_id) values(:v_id, :v_card_id, to_date(:v_transaction_date, 'yyyy-MM-dd HH24:mi:ss'), to_date(:v_bookkeeping_date, 'yyyy-MM-dd HH24:mi:ss'), :v_transaction_desc, :v_balance_currency, :v_balance_money, :v_card_type_id, :v_card_type_name, :v_consumption_type, :v_consume_id, :v_consume_name, :v_demoarea, :v_recordid, :v_payment_type_id)", params); 
-        
+
+class OrderHelper(object):
+    '''
+    Bulk writer for the Oracle credit table. Rows are sent with executemany
+    (array binds) batchSize rows per round-trip, over sessions of one pool
+    shared by the process. Settings come from the environment:
+    ORACLE_USER, ORACLE_PASSWORD, ORACLE_DSN, ORACLE_POOL_MIN,
+    ORACLE_POOL_MAX, ORACLE_BATCH_SIZE, and ORACLE_DRY_RUN, the path of a
+    SQLite file written through the same statements instead of Oracle.
+
+    Each call commits on its own, unless begin() was called: then the calls
+    up to commit() or rollback() share one session and one transaction.
+    '''
+    user = os.environ.get('ORACLE_USER', 'scott')
+    password = os.environ.get('ORACLE_PASSWORD', 'summer')
+    dsn = os.environ.get('ORACLE_DSN', '127.0.0.1:1521/ORCL')
+    poolMin = int(os.environ.get('ORACLE_POOL_MIN', '1'))
+    poolMax = int(os.environ.get('ORACLE_POOL_MAX', '4'))
+    batchSize = int(os.environ.get('ORACLE_BATCH_SIZE', '1000'))
+    dryRunPath = os.environ.get('ORACLE_DRY_RUN', '')
+
+    insertScript = "insert into credit (id, card_id, transaction_date, bookkeeping_date, transaction_desc, balance_currency, balance_money, card_type_id, card_type_name, consumption_type, consume_id, consume_name, demoarea, recordid, payment_type_id) values(:v_id, :v_card_id, to_date(:v_transaction_date, 'yyyy-MM-dd HH24:mi:ss'), to_date(:v_bookkeeping_date, 'yyyy-MM-dd HH24:mi:ss'), :v_transaction_desc, :v_balance_currency, :v_balance_money, :v_card_type_id, :v_card_type_name, :v_consumption_type, :v_consume_id, :v_consume_name, :v_demoarea, :v_recordid, :v_payment_type_id)"
+    deleteScript = "delete from credit where recordid = :v_recordid"
+    dryRunTableScript = "create table if not exists credit (id text primary key, card_id text, transaction_date text, bookkeeping_date text, transaction_desc text, balance_currency text, balance_money numeric, card_type_id integer, card_type_name text, consumption_type text, consume_id text, consume_name text, demoarea text, recordid text, payment_type_id text)"
+
+    pool = None
+    poolLock = threading.Lock()
+    conn = None
+
+    def __init__(self, dryRunPath=None, batchSize=None):
+        if dryRunPath is not None:
+            self.dryRunPath = dryRunPath
+        if batchSize is not None:
+            self.batchSize = batchSize
+
+    def getPool(self):
+        with OrderHelper.poolLock:
+            if OrderHelper.pool is None:
+                if oracle is None:
+                    raise ImportError('cx_Oracle is not installed; set ORACLE_DRY_RUN to write into SQLite instead')
+                OrderHelper.pool = oracle.SessionPool(self.user, self.password, self.dsn, min=self.poolMin,
+                                                      max=self.poolMax, increment=1, threaded=True, encoding='UTF-8')
+            return OrderHelper.pool
+
+    def acquire(self):
+        if self.dryRunPath:
+            conn = sqlite3.connect(self.dryRunPath)
+            conn.execute(self.dryRunTableScript)
+            return conn
+        return self.getPool().acquire()
+
+    def release(self, conn):
+        if self.dryRunPath:
+            conn.close()
+        else:
+            self.getPool().release(conn)
+
+    def begin(self):
+        self.conn = self.acquire()
+
+    def commit(self):
+        conn, self.conn = self.conn, None
+        if conn is not None:
+            try:
+                conn.commit()
+            finally:
+                self.release(conn)
+
+    def rollback(self):
+        conn, self.conn = self.conn, None
+        if conn is not None:
+            try:
+                conn.rollback()
+            finally:
+                self.release(conn)
+
+    def getScript(self, script):
+        if self.dryRunPath:
+            # SQLite keeps the yyyy-MM-dd HH:mm:ss text as it is
+            return script.replace("to_date(:v_transaction_date, 'yyyy-MM-dd HH24:mi:ss')", ':v_transaction_date') \
+                .replace("to_date(:v_bookkeeping_date, 'yyyy-MM-dd HH24:mi:ss')", ':v_bookkeeping_date')
+        return script
+
+    def getParameters(self, dataRow, recordID):
+        return {"v_id": str(getUUID()), "v_card_id": dataRow[3], "v_transaction_date": dataRow[1], "v_bookkeeping_date": dataRow[2], "v_transaction_desc": dataRow[7], "v_balance_currency": dataRow[5], "v_balance_money": dataRow[4], "v_card_type_id": 1, "v_card_type_name": "中国建设银行购物卡", "v_consumption_type": dataRow[11], "v_consume_id": dataRow[13], "v_consume_name": dataRow[12], "v_demoarea": dataRow[14], "v_recordid": recordID, "v_payment_type_id": dataRow[9]}
+
+    def executeMany(self, script, parameters):
+        '''Runs script for every parameter set, batchSize sets per round-trip, and commits (outside begin()); returns the batch count.'''
+        parameters = iter(parameters)
+        batches = 0
+        conn = self.conn or self.acquire()
+        try:
+            cursor = conn.cursor()
+            script = self.getScript(script)
+            while True:
+                batch = list(islice(parameters, self.batchSize))
+                if not batch:
+                    break
+                cursor.executemany(script, batch)
+                batches = batches + 1
+            cursor.close()
+            if conn is not self.conn:
+                conn.commit()
+        finally:
+            if conn is not self.conn:
+                self.release(conn)
+        return batches
+
+    def batchInsert(self, dataRows, recordID=None):
+        if recordID is None:
+            recordID = str(getUUID())
+        self.executeMany(self.insertScript, (self.getParameters(dataRow, recordID) for dataRow in dataRows))
         print("Finish inserting data to Oracle")
-        cursor.close();               
-        conn.commit();  
-        conn.close();  
-        
+
+    def deleteRecords(self, recordIDs):
+        recordIDs = [recordID for recordID in recordIDs if recordID]
+        if not recordIDs:
+            return
+        self.executeMany(self.deleteScript, ({"v_recordid": recordID} for recordID in recordIDs))
@@ -4,8 +4,10 @@ Created on 2018.1.17
 @author: summer.xia
 @contact: summer_west2010@126.com
 '''
+import hashlib
 import os
 import sqlite3
+from itertools import islice
 from account.helper.FileHelper import getText 
 
 
@@ -31,24 +33,184 @@ class SQLiteHelper(object):
             print('DB scripts is not available')
         conn.close()
     
-    def insertRow(self, conn, scripts, columns):
+    def ensureDatabase(self):
+        '''Creates the database only when it does not exist yet, keeping the ingested rows; True when created.'''
+        if os.path.exists(self.databasePath):
+            conn = sqlite3.connect(self.databasePath)
+            exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'CREDIT'").fetchone()
+            if exists:
+                columns = [row[1] for row in conn.execute('PRAGMA table_info(CREDIT)')]
+                if 'natural_key' not in columns:
+                    # tables created before the bulk loader
+                    conn.execute('ALTER TABLE CREDIT ADD COLUMN natural_key TEXT')
+                    conn.commit()
+            conn.close()
+            if exists:
+                return False
+        self.initiateDatabase()
+        return True
+    
+    def openLoader(self):
+        return SQLiteLoader(self.databasePath, getText(self.insertPath))
+    
+    def deleteRecords(self, recordIDs):
+        with self.openLoader() as loader:
+            loader.deleteRecords(recordIDs)
+    
+    def getRecordKeys(self, recordIDs):
+        '''recordID -> [(transaction date, money)] of the rows stored under each of recordIDs.'''
+        keys = dict((recordID, []) for recordID in recordIDs if recordID)
+        if not keys:
+            return keys
+        conn = sqlite3.connect(self.databasePath)
+        try:
+            for recordID in keys:
+                keys[recordID].extend(conn.execute('SELECT transaction_date, transaction_money FROM CREDIT WHERE recordid = ?', (recordID,)))
+        finally:
+            conn.close()
+        return keys
+    
+    def insertRow(self, conn, scripts, columns, recordID='no record id'):
         if columns is None or len(columns) <= 0:
             print('Columns are not available')
             return
-        insertScript = scripts % (columns[0], columns[1], columns[2], columns[3], columns[4], columns[5], columns[6], columns[7], columns[8], columns[9], columns[10], columns[11], columns[12], columns[13], columns[14], columns[14])
-        conn.execute(insertScript)
+        conn.execute(scripts, getParameters(columns, recordID, getNaturalKey(columns, 0, recordID)))
     
-    def batchInsert(self, dataRows):
+    def batchInsert(self, dataRows, recordID='no record id'):
         if not dataRows or len(dataRows) <= 0:
             print('Row data are not available')
             return
-        scripts = getText(self.insertPath)
-        if scripts:
-            conn = sqlite3.connect(self.databasePath)
-            for dataRow in dataRows:
-                self.insertRow(conn, scripts, dataRow)
-            conn.commit() 
-            conn.close()
-            print('DataRows create successfully')
+        with self.openLoader() as loader:
+            loader.load(dataRows, recordID)
+        print('DataRows create successfully')
+
+
+def getNaturalKey(columns, occurrence=0, recordID=''):
+    '''
+    Identity of a transaction within the file it was read from: the record
+    id of the file, source, dates, card, money, currency, balance and
+    description, plus how many identical rows came before it in the same
+    file, so genuine repeats are kept apart. A transaction listed in two
+    files gets a row per file, which each file's record id deletes alone.
+    '''
+    text = '\x1f'.join([str(recordID)] + [str(column) for column in columns[0:8]])
+    return hashlib.sha1(text.encode('utf-8')).hexdigest() + '#' + str(occurrence)
+
+
+def getParameters(columns, recordID, naturalKey):
+    return (columns[0], columns[1], columns[2], columns[3], columns[4], columns[5], columns[6], columns[7], columns[8], columns[9], columns[10], columns[11], columns[12], columns[13], columns[14], columns[14], recordID, naturalKey)
+
+
+class SQLiteLoader(object):
+    '''
+    Bulk loader for CREDIT: one connection for the whole load, rows bound as
+    parameters with executemany and committed chunkSize rows at a time,
+    with a WAL journal, synchronous=OFF and a larger cache while it runs.
+
+    load() and deleteRecords() commit as they go, unless begin() was
+    called: then everything up to commit() or rollback() is one
+    transaction.
+
+    Rows are upserted on their natural key, which includes the record id of
+    their file, so loading one file never takes over the rows of another.
+    When the table is empty at the start the indexes are left out during
+    the load; duplicate keys are then resolved (last row wins) and the
+    indexes built once at close().
+    '''
+    chunkSize = 10000
+    cacheSize = -65536
+    updateColumns = ['source', 'transaction_date', 'bookkeeping_date', 'card_id', 'transaction_money',
+                     'balance_currency', 'balance_money', 'transaction_desc', 'payment_type_id', 'payment_type_name',
+                     'consumption_name', 'consumption_id', 'consume_name', 'consume_id', 'keyword', 'demoarea', 'recordid']
+    indexScripts = ['CREATE UNIQUE INDEX IF NOT EXISTS credit_natural_key ON CREDIT(natural_key)',
+                    'CREATE INDEX IF NOT EXISTS credit_recordid ON CREDIT(recordid)',
+                    'CREATE INDEX IF NOT EXISTS credit_transaction_date ON CREDIT(transaction_date)']
+
+    def __init__(self, databasePath, scripts):
+        self.conn = sqlite3.connect(databasePath)
+        self.conn.execute('PRAGMA journal_mode = WAL')
+        self.conn.execute('PRAGMA synchronous = OFF')
+        self.conn.execute('PRAGMA cache_size = ' + str(self.cacheSize))
+        self.conn.execute('PRAGMA temp_store = MEMORY')
+        self.deferIndexes = self.conn.execute('SELECT 1 FROM CREDIT LIMIT 1').fetchone() is None
+        scripts = scripts.strip().rstrip(';')
+        if self.deferIndexes:
+            for (name,) in self.conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'CREDIT' AND sql IS NOT NULL").fetchall():
+                self.conn.execute('DROP INDEX ' + name)
+            self.scripts = scripts
         else:
-            print('Insert script is not available')
+            self.createIndexes()
+            self.scripts = scripts + ' ON CONFLICT(natural_key) DO UPDATE SET ' + ', '.join(column + ' = excluded.' + column for column in self.updateColumns)
+        self.recordID = None
+        self.occurrences = {}
+        self.loaded = set()
+        self.rows = 0
+        self.autocommit = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+    def begin(self):
+        self.autocommit = False
+
+    def commit(self):
+        self.conn.commit()
+        self.autocommit = True
+
+    def rollback(self):
+        self.conn.rollback()
+        self.autocommit = True
+
+    def createIndexes(self):
+        for script in self.indexScripts:
+            self.conn.execute(script)
+        self.conn.commit()
+
+    def iterParameters(self, dataRows, recordID):
+        if recordID != self.recordID:
+            self.recordID = recordID
+            self.occurrences = {}
+        for columns in dataRows:
+            key = getNaturalKey(columns, 0, recordID)
+            occurrence = self.occurrences.get(key, 0)
+            self.occurrences[key] = occurrence + 1
+            if occurrence:
+                key = getNaturalKey(columns, occurrence, recordID)
+            yield getParameters(columns, recordID, key)
+
+    def load(self, dataRows, recordID='no record id'):
+        self.loaded.add(recordID)
+        parameters = self.iterParameters(dataRows, recordID)
+        while True:
+            chunk = list(islice(parameters, self.chunkSize))
+            if not chunk:
+                break
+            self.conn.executemany(self.scripts, chunk)
+            if self.autocommit:
+                self.conn.commit()
+            self.rows = self.rows + len(chunk)
+
+    def deleteRecords(self, recordIDs):
+        recordIDs = [recordID for recordID in recordIDs if recordID]
+        if self.deferIndexes:
+            # the table started empty: only rows loaded by this loader can match
+            recordIDs = [recordID for recordID in recordIDs if recordID in self.loaded]
+        if not recordIDs:
+            return
+        self.conn.executemany('DELETE FROM CREDIT WHERE recordid = ?', [(recordID,) for recordID in recordIDs])
+        if self.autocommit:
+            self.conn.commit()
+
+    def close(self):
+        if self.conn is None:
+            return
+        if self.deferIndexes:
+            self.conn.execute('DELETE FROM CREDIT WHERE natural_key IS NOT NULL AND id NOT IN (SELECT MAX(id) FROM CREDIT GROUP BY natural_key)')
+            self.createIndexes()
+        self.conn.execute('PRAGMA synchronous = NORMAL')
+        self.conn.commit()
+        self.conn.close()
+        self.conn = None
@@ -67,6 +67,38 @@ def getAllLines(absolutePath, encoding='utf-8'):
     return lines
 
 
+def iterLines(absolutePath, encoding='utf-8'):
+    '''Lazy getAllLines: yields the stripped, non-empty lines one by one.'''
+    if not os.path.exists(absolutePath):
+        return
+    try:
+        with codecs.open(absolutePath, 'r', encoding) as file:
+            for text in file:
+                line = text.strip().replace('\r', '').replace('\n', '')
+                if len(line) > 0:
+                    yield line
+    except Exception as e:
+        print('Getting all texts has error, message = [' + str(e) + ']')
+
+
+def streamToFile(lines, path, encoding='utf-8'):
+    '''Like generateFile, but writes each line as it passes through and yields it on.'''
+    if os.path.exists(path):
+        os.remove(path)
+    file = None
+    try:
+        for line in lines:
+            if file is None:
+                file = codecs.open(path, 'w', encoding)
+            file.write(str(line) + '\n')
+            yield line
+    finally:
+        if file is not None:
+            file.close()
+        else:
+            print('No available data can be exported to file')
+
+
 def generateFile(lines, path, encoding='utf-8'):
     try:
         if lines is None or len(lines) <= 0:
@@ -7,11 +7,60 @@ Created on 2018.2.9
 import codecs
 import json
 import os
+import threading
+import time
+from types import MappingProxyType
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + os.path.sep + 'static' + os.path.sep
 ctPath = os.path.join(BASE_DIR, 'consumption-type.json')
 ctResultPath = os.path.join(BASE_DIR, 'consume-datasource.js')
 
+# seconds between two mtime checks of a cached dictionary
+reloadCheckInterval = 1.0
+
+_dictionaries = {}
+_dictionaryLock = threading.Lock()
+
+
+class CachedDictionary(object):
+
+    def __init__(self, path, mtime, data, checkedAt):
+        self.path = path
+        self.mtime = mtime
+        self.data = data
+        self.checkedAt = checkedAt
+
+
+def freeze(value):
+    '''Read-only deep copy: dicts become mapping proxies, lists become tuples.'''
+    if isinstance(value, (dict, MappingProxyType)):
+        return MappingProxyType({k: freeze(v) for k, v in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+def getDictionary(path, loader):
+    '''
+    Per-process dictionary built by loader(path), shared by every caller and
+    rebuilt when the file's mtime changes (checked at most once per
+    reloadCheckInterval). loader must return data nobody mutates.
+    '''
+    now = time.time()
+    entry = _dictionaries.get(path)
+    if entry is not None and now - entry.checkedAt < reloadCheckInterval:
+        return entry.data
+    mtime = os.path.getmtime(path)
+    if entry is not None and entry.mtime == mtime:
+        entry.checkedAt = now
+        return entry.data
+    with _dictionaryLock:
+        entry = _dictionaries.get(path)
+        if entry is None or entry.mtime != mtime:
+            entry = CachedDictionary(path, mtime, loader(path), now)
+            _dictionaries[path] = entry
+        return entry.data
+
 def generateConsumptionType(target, destination, encoding='utf-8'):
     with codecs.open(target, 'r', encoding) as t_file:
         data = json.load(t_file)
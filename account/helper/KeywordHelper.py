@@ -0,0 +1,27 @@
+'''
+Aho-Corasick keyword automaton: finds every dictionary keyword contained
+in a text with one pass over the text.
+'''
+from core.services.rule_index import Automaton
+
+
+class KeywordAutomaton(Automaton):
+    '''
+    The automaton of the rule engine with the naming of this package;
+    payloads are comparable so the first or last hit can be picked.
+    '''
+
+    def addKeyword(self, keyword, payload):
+        self.add(keyword, payload)
+
+    def findAll(self, text):
+        '''Set of payloads whose keyword occurs in text (empty keywords always occur).'''
+        return self.search(text or '', set(self.out[0]))
+
+    def findFirst(self, text):
+        hits = self.findAll(text)
+        return min(hits) if hits else None
+
+    def findLast(self, text):
+        hits = self.findAll(text)
+        return max(hits) if hits else None
@@ -17,3 +17,20 @@ def mergeMatrixsAandB(matrixA, matrixB):
     a = np.array(matrixA)
     b = np.array(matrixB)
     return np.concatenate((a,b),axis=0).tolist()
+
+
+def iterPointedColumn(rows, coloumnText):
+    '''Streaming addPointedColumn; the row values keep their types.'''
+    for row in rows:
+        yield [coloumnText] + list(row)
+
+
+def iterChunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
@@ -5,6 +5,7 @@ Created on 2018.1.12
 @contact: summer_west2010@126.com
 '''
 import datetime
+import functools
 import uuid
 
 textSeparator='@@'
@@ -12,14 +13,48 @@ textSeparator='@@'
 def isNotEmpty(charactor):   
     return charactor and len(charactor.strip()) > 0
 
-def parseDate(strDate, fmt='%Y%m%d'):
-    return datetime.datetime.strptime(strDate, fmt)
+dateFormat = '%Y%m%d'
+dateTimeFormat = '%Y%m%d%H:%M:%S'
+outputFormat = '%Y-%m-%d %H:%M:%S'
+# distinct date strings remembered by the parse/format functions
+dateCacheSize = 8192
+
+def sliceDate(strDate):
+    '''yyyyMMdd[HH:mm:ss] by slicing the digits; None for anything else.'''
+    if not strDate.isascii():
+        return None
+    if len(strDate) == 8 and strDate.isdigit():
+        return datetime.datetime(int(strDate[0:4]), int(strDate[4:6]), int(strDate[6:8]))
+    if len(strDate) == 16 and strDate[10] == ':' and strDate[13] == ':' \
+            and (strDate[0:10] + strDate[11:13] + strDate[14:16]).isdigit():
+        return datetime.datetime(int(strDate[0:4]), int(strDate[4:6]), int(strDate[6:8]),
+                                 int(strDate[8:10]), int(strDate[11:13]), int(strDate[14:16]))
+    return None
 
-def parseDateTime(strDate, fmt='%Y%m%d%H:%M:%S'):
+@functools.lru_cache(maxsize=dateCacheSize)
+def cachedParse(strDate, fmt):
+    if (fmt == dateFormat and len(strDate) == 8) or (fmt == dateTimeFormat and len(strDate) == 16):
+        date = sliceDate(strDate)
+        if date is not None:
+            return date
     return datetime.datetime.strptime(strDate, fmt)
 
-def formatDateTime(date, fmt='%Y-%m-%d %H:%M:%S'):
+@functools.lru_cache(maxsize=dateCacheSize)
+def cachedFormat(date, fmt):
+    if fmt == outputFormat and date.year >= 1000:
+        return '%04d-%02d-%02d %02d:%02d:%02d' % (date.year, date.month, date.day, date.hour, date.minute, date.second)
     return date.strftime(fmt)
 
+def parseDate(strDate, fmt=dateFormat):
+    return cachedParse(strDate, fmt)
+
+def parseDateTime(strDate, fmt=dateTimeFormat):
+    return cachedParse(strDate, fmt)
+
+def formatDateTime(date, fmt=outputFormat):
+    if type(date) is not datetime.datetime:
+        return date.strftime(fmt)
+    return cachedFormat(date, fmt)
+
 def getUUID():
     return uuid.uuid1()
\ No newline at end of file
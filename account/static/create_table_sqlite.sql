@@ -24,5 +24,6 @@ CREATE TABLE CREDIT(
   createuser       TEXT      default 'system',
   createtime       DATETIME  default (datetime('now', 'localtime')),
   updateuser       TEXT      default 'system',
-  updatetime       DATETIME  default (datetime('now', 'localtime'))
+  updatetime       DATETIME  default (datetime('now', 'localtime')),
+  natural_key      TEXT
 );
\ No newline at end of file
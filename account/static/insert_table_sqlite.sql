@@ -1,4 +1,4 @@
 INSERT INTO CREDIT(id, source, transaction_date, bookkeeping_date, card_id, transaction_money,
 balance_currency, balance_money, transaction_desc, payment_type_id, payment_type_name,
-consumption_name, consumption_id, consume_name, consume_id, keyword, demoarea) 
-values(null, '%s', datetime('%s'), datetime('%s'), '%s', '%s', '%s', '%s', '%s', '%s', '%s', '%s', '%s', '%s', '%s', '%s', '%s');
\ No newline at end of file
+consumption_name, consumption_id, consume_name, consume_id, keyword, demoarea, recordid, natural_key) 
+values(null, ?, datetime(?), datetime(?), ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
\ No newline at end of file
@@ -1,25 +1,54 @@
 from .base_agent import BaseAgent
 
 class AnalysisAgent(BaseAgent):
+    # Prepend context to frame the AI's persona
+    context = "You are FinMind, an intelligent financial assistant. Answer the user's question concisely and helpfully regarding their finances or general queries."
+
     def run(self, prompt: str) -> str:
         qwen = self.tools.get("qwen_api")
         if not qwen:
             return "Error: AI tool not available."
         
-        # Prepend context to frame the AI's persona
-        context = "You are FinMind, an intelligent financial assistant. Answer the user's question concisely and helpfully regarding their finances or general queries."
-        full_prompt = f"{context}\n\nUser Question: {prompt}\n\nAnswer:"
+        full_prompt = f"{self.context}\n\nUser Question: {prompt}\n\nAnswer:"
         
         try:
-            try:
-                print(f"[FinMind][Agent] query={str(prompt)[:200]}")
-            except Exception:
-                pass
+            self._log("query", prompt)
             ans = qwen.call(full_prompt)
-            try:
-                print(f"[FinMind][Agent] answer={str(ans)[:200]}")
-            except Exception:
-                pass
+            self._log("answer", ans)
+            return ans
+        except Exception as e:
+            return f"Error processing request: {str(e)}"
+
+    async def arun(self, prompt: str) -> str:
+        qwen = self.tools.get("qwen_api")
+        if not qwen:
+            return "Error: AI tool not available."
+        full_prompt = f"{self.context}\n\nUser Question: {prompt}\n\nAnswer:"
+        try:
+            self._log("query", prompt)
+            ans = await qwen.acall(full_prompt)
+            self._log("answer", ans)
             return ans
         except Exception as e:
             return f"Error processing request: {str(e)}"
+
+    def stream(self, prompt: str):
+        """Yields the answer piece by piece as the model generates it; errors propagate to the caller."""
+        qwen = self.tools.get("qwen_api")
+        if not qwen:
+            yield "Error: AI tool not available."
+            return
+        full_prompt = f"{self.context}\n\nUser Question: {prompt}\n\nAnswer:"
+        self._log("query", prompt)
+        pieces = []
+        for piece in qwen.stream(full_prompt):
+            pieces.append(piece)
+            yield piece
+        self._log("answer", "".join(pieces))
+
+    @staticmethod
+    def _log(label, text):
+        try:
+            print(f"[FinMind][Agent] {label}={str(text)[:200]}")
+        except Exception:
+            pass
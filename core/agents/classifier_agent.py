@@ -1,49 +1,122 @@
+from asgiref.sync import sync_to_async
+
 from .base_agent import BaseAgent
-from persist.models import ConsumeRule
-import re
-import unicodedata
-
-def _norm(s):
-    try:
-        s = unicodedata.normalize("NFKC", s or "")
-    except Exception:
-        s = s or ""
-    s = s.strip().lower()
-    s = re.sub(r"\s+", " ", s)
-    return s
-
-def _match(rule, text):
-    pt = rule.patternType or "contains"
-    pat = _norm(rule.pattern or "")
-    if not pat:
-        return False
-    t = _norm(text or "")
-    if pt == "contains":
-        return pat in t
-    if pt == "equals":
-        return pat == t
-    if pt == "startsWith":
-        return t.startswith(pat)
-    if pt == "endsWith":
-        return t.endswith(pat)
-    if pt == "regex":
-        try:
-            return re.search(rule.pattern or "", text or "") is not None
-        except Exception:
-            return False
-    return False
+from core.services.rule_cache import get_rule_index
+
+CLASSIFY_PROMPT = "分类以下交易：{}"
+
 
 class ClassifierAgent(BaseAgent):
     def run(self, transaction_desc):
         text = transaction_desc or ""
-        rules = list(ConsumeRule.objects.filter(active=1).order_by("-priority", "pattern"))
-        for r in rules:
-            if _match(r, text):
-                return r.categoryId
+        index = get_rule_index()
+        r = index.first_text_match(text)
+        if r is not None:
+            return r.categoryId
+        return self.fallback(text)
+
+    async def arun(self, transaction_desc):
+        text = transaction_desc or ""
+        r = await sync_to_async(lambda: get_rule_index().first_text_match(text))()
+        if r is not None:
+            return r.categoryId
+        return await self.afallback(text)
+
+    def _rule_matches(self, descriptions):
+        """Categories the rules give the texts (None where unresolved) and the distinct unresolved texts with their positions."""
+        texts = [d or "" for d in descriptions]
+        rules = get_rule_index().first_text_matches(texts)
+        out = [r.categoryId if r is not None else None for r in rules]
+        # only distinct texts the rules leave unresolved go to the LLM
+        pending = {}
+        for i, r in enumerate(rules):
+            if r is None:
+                pending.setdefault(texts[i], []).append(i)
+        return out, pending
+
+    @staticmethod
+    def _merge(out, pending, answers):
+        for text, positions in pending.items():
+            for i in positions:
+                out[i] = answers[text]
+        return out
+
+    def run_many(self, descriptions):
+        out, pending = self._rule_matches(descriptions)
+        return self._merge(out, pending, self.fallback_many(list(pending)))
+
+    async def arun_many(self, descriptions):
+        out, pending = await sync_to_async(self._rule_matches)(descriptions)
+        return self._merge(out, pending, await self.afallback_many(list(pending)))
+
+    def fallback(self, text):
         q = self.tools.get("qwen_api")
         if q:
             try:
-                return q.call(f"分类以下交易：{text}")
+                return q.call(CLASSIFY_PROMPT.format(text.strip()))
             except Exception:
                 pass
         return "OTHER"
+
+    async def afallback(self, text):
+        q = self.tools.get("qwen_api")
+        if q:
+            try:
+                return await q.acall(CLASSIFY_PROMPT.format(text.strip()))
+            except Exception:
+                pass
+        return "OTHER"
+
+    def _cached_answers(self, q, texts):
+        prompts = {text: CLASSIFY_PROMPT.format(text.strip()) for text in texts}
+        cached = q.cached_many(list(prompts.values())) if hasattr(q, "cached_many") else {}
+        out = {text: cached[p] for text, p in prompts.items() if p in cached}
+        return out, [text for text in texts if text not in out]
+
+    def _learn(self, q, todo, answers, out):
+        learned = []
+        for text in todo:
+            code = answers.get(text.strip())
+            if code is not None:
+                learned.append((CLASSIFY_PROMPT.format(text.strip()), code))
+            out[text] = code or "OTHER"
+        if learned and hasattr(q, "remember_many"):
+            q.remember_many(learned)
+        return out
+
+    def fallback_many(self, texts):
+        """
+        {text: category} for several texts: cached answers first, the rest
+        classified together in batched requests (see BatchClassifier), whose
+        answers are cached under the single-text prompt.
+        """
+        q = self.tools.get("qwen_api")
+        if not q:
+            return {text: "OTHER" for text in texts}
+        out, todo = self._cached_answers(q, texts)
+        if len(todo) < 2:
+            out.update((text, self.fallback(text)) for text in todo)
+            return out
+        from core.services.llm_batch import BatchClassifier
+        try:
+            answers = BatchClassifier(q).classify([t.strip() for t in todo])
+        except Exception:
+            answers = {}
+        return self._learn(q, todo, answers, out)
+
+    async def afallback_many(self, texts):
+        q = self.tools.get("qwen_api")
+        if not q:
+            return {text: "OTHER" for text in texts}
+        out, todo = await sync_to_async(self._cached_answers)(q, texts)
+        if len(todo) < 2:
+            for text in todo:
+                out[text] = await self.afallback(text)
+            return out
+        from core.services.llm_batch import BatchClassifier
+        try:
+            batcher = await sync_to_async(BatchClassifier)(q)
+            answers = await batcher.aclassify([t.strip() for t in todo])
+        except Exception:
+            answers = {}
+        return await sync_to_async(self._learn)(q, todo, answers, out)
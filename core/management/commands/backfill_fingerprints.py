@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+import time
+
+class Command(BaseCommand):
+    help = "Fingerprint transactions that have no transaction_fingerprint row yet and list the duplicate groups"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rebuild", action="store_true", help="recompute the fingerprints of every transaction")
+        parser.add_argument("--include-deleted", action="store_true", help="also count soft-deleted transactions in the duplicate groups")
+        parser.add_argument("--limit", type=int, default=20, help="duplicate groups to print")
+
+    def handle(self, *args, **options):
+        from core.services.fingerprint import backfill_fingerprints, duplicate_groups
+        t0 = time.time()
+        n = backfill_fingerprints(rebuild=options["rebuild"])
+        groups = duplicate_groups(include_deleted=options["include_deleted"])
+        extra = sum(count - 1 for _, count, _ in groups)
+        for chash, count, ids in groups[:options["limit"]]:
+            print(f"duplicate hash={chash} count={count} ids={','.join(ids)}")
+        print(f"rows={n} duplicate_groups={len(groups)} duplicate_rows={extra} elapsed={time.time() - t0:.2f}s")
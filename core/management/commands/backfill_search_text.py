@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+import time
+
+class Command(BaseCommand):
+    help = "Fill the stored search_text/desc_key of transactions that do not have them yet"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true", help="recompute every transaction, not only missing ones")
+
+    def handle(self, *args, **options):
+        from persist.models import Transaction
+        from core.services.rule_cache import get_rule_snapshot
+        from core.services.match_store import recompute_transactions
+        t0 = time.time()
+        qs = Transaction.objects.exclude(deleted=1)
+        if not options["all"]:
+            qs = qs.filter(Q(match__isnull=True) | Q(match__search_text__isnull=True))
+        ids = list(qs.values_list("id", flat=True))
+        n = recompute_transactions(ids, get_rule_snapshot())
+        print(f"rows={n} elapsed={time.time() - t0:.2f}s")
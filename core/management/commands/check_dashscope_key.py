@@ -1,32 +1,23 @@
 from django.core.management.base import BaseCommand
-import os
-import json
-import requests
-from dotenv import load_dotenv
+from core.tools.llm_client import extract_content, get_llm_client
 
 class Command(BaseCommand):
     help = "Check DashScope API key validity"
 
     def handle(self, *args, **options):
-        try:
-            load_dotenv()
-        except Exception:
-            pass
-        api_key = os.environ.get("DASHSCOPE_API_KEY", "") or os.environ.get("QWEN_API_KEY", "")
+        client = get_llm_client()
+        api_key = client.settings.api_key
         if not api_key:
             print("DASHSCOPE_API_KEY 未设置")
             return
-        url = "https://dashscope.aliyuncs.com/api/v1/services/aigc/text-generation/generation"
-        headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
-        data = {"model": os.environ.get("QWEN_MODEL", "qwen-max"), "input": {"messages": [{"role": "user", "content": "ping"}]}}
+        data = {"model": client.settings.model, "input": {"messages": [{"role": "user", "content": "ping"}]}}
         try:
-            r = requests.post(url, headers=headers, json=data, timeout=20)
+            r = client.post(data)
             sc = r.status_code
             print(f"HTTP {sc}")
             if sc == 200:
                 try:
-                    d = r.json()
-                    msg = d.get("output", {}).get("choices", [{}])[0].get("message", {}).get("content", "")
+                    msg = extract_content(r.json()) or ""
                     print("密钥有效")
                     print(str(msg)[:200])
                 except Exception:
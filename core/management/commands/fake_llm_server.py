@@ -0,0 +1,81 @@
+import json
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+
+DEFAULT_REPLY = "这是本地模拟服务返回的回答。This is a reply from the local fake LLM server."
+
+
+def make_handler(reply, piece_size, first_token_delay, token_delay):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _body(self, content, finish_reason):
+            return {
+                "output": {"choices": [{"message": {"role": "assistant", "content": content}, "finish_reason": finish_reason}]},
+                "request_id": self.request_id,
+            }
+
+        def _chunk(self, data):
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                self.send_error(400, "invalid json")
+                return
+            self.request_id = str(uuid.uuid4())
+            time.sleep(first_token_delay)
+            if self.headers.get("X-DashScope-SSE") == "enable" or "text/event-stream" in (self.headers.get("Accept") or ""):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                pieces = [reply[i:i + piece_size] for i in range(0, len(reply), piece_size)] or [""]
+                for n, piece in enumerate(pieces, 1):
+                    if n > 1:
+                        time.sleep(token_delay)
+                    finish = "stop" if n == len(pieces) else "null"
+                    event = "id:%d\nevent:result\n:HTTP_STATUS/200\ndata:%s\n\n" % (n, json.dumps(self._body(piece, finish), ensure_ascii=False))
+                    self._chunk(event.encode("utf-8"))
+                self.wfile.write(b"0\r\n\r\n")
+                return
+            out = json.dumps(self._body(reply, "stop"), ensure_ascii=False).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(out)))
+            self.end_headers()
+            self.wfile.write(out)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+class Command(BaseCommand):
+    help = "Run a local fake of the DashScope generation endpoint (plain and SSE streaming) for trying the LLM paths without a key; point QWEN_API_URL at it"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument("--reply", default=DEFAULT_REPLY, help="text every request is answered with")
+        parser.add_argument("--piece-size", type=int, default=4, help="characters per streamed event")
+        parser.add_argument("--first-token-delay", type=float, default=0.2, help="seconds before the first byte of an answer")
+        parser.add_argument("--token-delay", type=float, default=0.05, help="seconds between two streamed events")
+
+    def handle(self, *args, **options):
+        handler = make_handler(options["reply"], max(1, options["piece_size"]), options["first_token_delay"], options["token_delay"])
+        server = ThreadingHTTPServer((options["host"], options["port"]), handler)
+        print(f"listening url=http://{options['host']}:{server.server_port}/api/v1/services/aigc/text-generation/generation")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
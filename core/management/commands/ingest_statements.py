@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Clean the CCB statement exports under a data directory (credit/, deposits/) and add their rows to the transaction table"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="directory holding the credit/ and deposits/ statement folders")
+        parser.add_argument("--source", action="append", choices=["credit", "deposits"], help="only this source (repeatable)")
+        parser.add_argument("--chunk-size", type=int, default=1000, help="rows per bulk insert and database transaction")
+        parser.add_argument("--workers", type=int, default=None, help="parsing processes (default: all CPUs, 1 parses in-process)")
+        parser.add_argument("--dry-run", action="store_true", help="clean, map and deduplicate without writing")
+
+    def handle(self, *args, **options):
+        from core.services.statement_ingest import ingest_statements
+        sources = tuple(options["source"] or ("credit", "deposits"))
+        stats, errors = ingest_statements(
+            options["path"], sources=sources, chunk_size=options["chunk_size"],
+            workers=options["workers"], dry_run=options["dry_run"],
+        )
+        elapsed = stats["elapsed"] or 1e-9
+        print(
+            f"files={stats['files']} rows={stats['rows']} inserted={stats['inserted']} "
+            f"duplicates={stats['duplicates']} invalid={stats['invalid']} skipped_files={len(errors)} "
+            f"elapsed={elapsed:.2f}s rows_per_s={stats['rows'] / elapsed:.0f}"
+            + (" dry_run=1" if options["dry_run"] else "")
+        )
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Show the size and hit counts of the LLM response cache, prune expired/excess entries or clear it"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--prune", action="store_true", help="delete expired entries and the least recently used beyond LLM_CACHE_MAX_ENTRIES")
+        parser.add_argument("--clear", action="store_true", help="delete every cached answer (running processes drop their in-memory copies within LLM_CACHE_SYNC_SECONDS)")
+
+    def handle(self, *args, **options):
+        from datetime import timedelta
+        from django.db.models import Count, Sum
+        from django.utils import timezone
+        from core.services.llm_cache import get_llm_cache
+        from persist.models import LLMResponse
+        cache = get_llm_cache()
+        if options["clear"]:
+            print(f"cleared={cache.clear()}")
+        elif options["prune"]:
+            print(f"pruned={cache.prune()}")
+        totals = LLMResponse.objects.aggregate(entries=Count("key"), hits=Sum("hits"))
+        expired = LLMResponse.objects.filter(created_at__lte=timezone.now() - timedelta(seconds=cache.ttl)).count()
+        print(
+            f"entries={totals['entries']} hits={totals['hits'] or 0} expired={expired} "
+            f"max_entries={cache.max_entries} ttl={cache.ttl}s"
+        )
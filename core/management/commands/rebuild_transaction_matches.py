@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+import time
+
+class Command(BaseCommand):
+    help = "Recompute the stored rule match of every transaction"
+
+    def handle(self, *args, **options):
+        from core.services.rule_cache import get_rule_snapshot
+        from core.services.match_store import rebuild_matches
+        t0 = time.time()
+        snap = get_rule_snapshot()
+        n = rebuild_matches(snap)
+        print(f"rules_version={snap.version} rows={n} elapsed={time.time() - t0:.2f}s")
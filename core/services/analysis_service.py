@@ -4,3 +4,11 @@ from core.tools.qwen_api import QwenAPITool
 def analyze_query(query):
     agent = AnalysisAgent(tools={"qwen_api": QwenAPITool()})
     return agent.run(query or "")
+
+async def aanalyze_query(query):
+    agent = AnalysisAgent(tools={"qwen_api": QwenAPITool()})
+    return await agent.arun(query or "")
+
+def stream_query(query):
+    agent = AnalysisAgent(tools={"qwen_api": QwenAPITool()})
+    return agent.stream(query or "")
@@ -1,6 +1,25 @@
+import os
+
 from core.agents.classifier_agent import ClassifierAgent
+from core.services.llm_cache import get_llm_cache
 from core.tools.qwen_api import QwenAPITool
 
-def classify_text(description):
-    agent = ClassifierAgent(tools={"qwen_api": QwenAPITool()})
-    return agent.run(description or "")
+# LLM_CACHE_BYPASS=1 re-asks the LLM for every prompt (answers are still cached)
+CACHE_BYPASS = os.environ.get("LLM_CACHE_BYPASS", "") in ("1", "true", "yes")
+
+
+def _agent(refresh=False):
+    qwen = QwenAPITool(cache=get_llm_cache(), refresh=refresh or CACHE_BYPASS)
+    return ClassifierAgent(tools={"qwen_api": qwen})
+
+def classify_text(description, refresh=False):
+    return _agent(refresh).run(description or "")
+
+def classify_many(descriptions, refresh=False):
+    return _agent(refresh).run_many(list(descriptions))
+
+async def aclassify_text(description, refresh=False):
+    return await _agent(refresh).arun(description or "")
+
+async def aclassify_many(descriptions, refresh=False):
+    return await _agent(refresh).arun_many(list(descriptions))
@@ -0,0 +1,147 @@
+import hashlib
+import logging
+from contextlib import nullcontext
+from datetime import datetime
+from decimal import Decimal
+
+from django.db import transaction as db_transaction
+from django.db.models import Count, Max, Min
+from django.utils import timezone
+
+from core.services.match_store import BATCH_SIZE, _norm
+
+logger = logging.getLogger("finmind")
+
+
+def _timestamp(v, tz):
+    if v is None:
+        return ""
+    if isinstance(v, datetime):
+        if v.tzinfo is not None:
+            v = v.astimezone(tz)
+        return "%04d-%02d-%02d %02d:%02d:%02d" % (v.year, v.month, v.day, v.hour, v.minute, v.second)
+    return str(v).strip()[:19]
+
+
+def _money(v):
+    if v is None or v == "":
+        return ""
+    return "%.2f" % float(v if isinstance(v, (Decimal, float, int)) else str(v))
+
+
+def content_hash(card_id, transaction_date, amount, desc, tz=None):
+    """sha1 of card, local timestamp (to the second), amount and normalized description."""
+    tz = tz or timezone.get_current_timezone()
+    text = "\x1f".join([(card_id or "").strip(), _timestamp(transaction_date, tz), _money(amount), _norm(desc or "")])
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def transaction_hash(values, tz=None):
+    """content_hash of a Transaction or a dict of its fields."""
+    get = values.get if isinstance(values, dict) else lambda f: getattr(values, f, None)
+    return content_hash(get("card_id"), get("transaction_date"), get("income_money"), get("transaction_desc"), tz)
+
+
+def make_fingerprint(chash, occurrence=0):
+    return "%s#%s" % (chash, occurrence)
+
+
+def existing_fingerprints(fingerprints):
+    """The given fingerprints already stored (one indexed lookup)."""
+    from persist.models import TransactionFingerprint
+    return set(TransactionFingerprint.objects.filter(fingerprint__in=list(fingerprints)).values_list("fingerprint", flat=True))
+
+
+def backfill_fingerprints(rebuild=False):
+    """
+    Fingerprints the transactions that have none (every transaction with
+    rebuild=True, in one database transaction) statement by statement, in
+    the order they were written, and by date within each. Identical rows
+    are numbered within their statement (recordid), after the ones of it
+    already stored, as StatementIngestor numbers them within a file. A row
+    whose fingerprint an earlier statement already holds is a duplicate of
+    it and takes the next occurrence free across all statements. Returns
+    the number of rows written.
+    """
+    from persist.models import Transaction, TransactionFingerprint
+    tz = timezone.get_current_timezone()
+    with db_transaction.atomic() if rebuild else nullcontext():
+        if rebuild:
+            TransactionFingerprint.objects.all().delete()
+        written = _backfill(Transaction.objects.all() if rebuild else Transaction.objects.filter(fingerprint__isnull=True), tz)
+    logger.info("transaction_fingerprints_backfilled rows=%s rebuild=%s", written, rebuild)
+    return written
+
+
+def _backfill(qs, tz):
+    from persist.models import TransactionFingerprint
+    # statements in the order they were written, so a repeat of an earlier one is the duplicate
+    statements = sorted(qs.values_list("recordid").annotate(first=Min("createtime")).order_by(),
+                        key=lambda r: (r[1] is None, r[1] or 0, r[0] or ""))
+    rows = (row for rid, _ in statements
+            for row in (qs.filter(recordid__isnull=True) if rid is None else qs.filter(recordid=rid)).order_by(
+                "transaction_date", "id").values_list(
+                "id", "recordid", "card_id", "transaction_date", "income_money", "transaction_desc",
+            ).iterator(chunk_size=2000))
+    # next occurrence per (recordid, hash), and the highest one per hash over all statements
+    next_occurrence = {}
+    top = {}
+    claimed = set()
+    written = 0
+    chunk = []
+
+    def flush(chunk):
+        hashes = {h for _, _, h in chunk if h not in top}
+        if hashes:
+            stored = TransactionFingerprint.objects.filter(content_hash__in=hashes).values(
+                "transaction__recordid", "content_hash").annotate(last=Max("occurrence"))
+            for row in stored:
+                h = row["content_hash"]
+                top[h] = max(top.get(h, -1), row["last"])
+                next_occurrence[(row["transaction__recordid"], h)] = row["last"] + 1
+        planned = []
+        for tid, rid, h in chunk:
+            n = next_occurrence.get((rid, h), 0)
+            next_occurrence[(rid, h)] = n + 1
+            planned.append((tid, h, n))
+        taken = claimed | existing_fingerprints(make_fingerprint(h, n) for _, h, n in planned)
+        objs = []
+        for tid, h, n in planned:
+            if make_fingerprint(h, n) in taken:
+                n = max(top.get(h, -1), n) + 1
+            fp = make_fingerprint(h, n)
+            taken.add(fp)
+            claimed.add(fp)
+            top[h] = max(top.get(h, -1), n)
+            objs.append(TransactionFingerprint(transaction_id=tid, fingerprint=fp, content_hash=h, occurrence=n))
+        with db_transaction.atomic():
+            TransactionFingerprint.objects.bulk_create(objs, batch_size=BATCH_SIZE, ignore_conflicts=True)
+        return len(objs)
+
+    for tid, rid, card_id, tdate, amount, desc in rows:
+        chunk.append((tid, rid, content_hash(card_id, tdate, amount, desc, tz)))
+        if len(chunk) >= BATCH_SIZE:
+            written += flush(chunk)
+            chunk = []
+    if chunk:
+        written += flush(chunk)
+    return written
+
+
+def duplicate_groups(include_deleted=False):
+    """
+    (content_hash, count, transaction ids) of every hash shared by several
+    transactions, from a single grouped query over the hash index.
+    """
+    from persist.models import TransactionFingerprint
+    qs = TransactionFingerprint.objects.all()
+    if not include_deleted:
+        qs = qs.exclude(transaction__deleted=1)
+    groups = list(qs.values("content_hash").annotate(n=Count("transaction_id")).filter(n__gt=1).order_by("-n", "content_hash"))
+    ids = {}
+    if groups:
+        hashes = [g["content_hash"] for g in groups]
+        for i in range(0, len(hashes), BATCH_SIZE):
+            for h, tid in qs.filter(content_hash__in=hashes[i:i + BATCH_SIZE]).order_by("occurrence").values_list("content_hash", "transaction_id"):
+                ids.setdefault(h, []).append(tid)
+    return [(g["content_hash"], g["n"], ids.get(g["content_hash"], [])) for g in groups]
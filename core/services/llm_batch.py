@@ -0,0 +1,206 @@
+import json
+import logging
+import os
+import re
+from collections import Counter, deque
+
+from core.tools.llm_client import LLMError
+
+logger = logging.getLogger("finmind")
+
+# descriptions per request at most
+BATCH_SIZE = int(os.environ.get("LLM_BATCH_SIZE", "50"))
+# prompt length (characters) a batch may grow to
+MAX_PROMPT_CHARS = int(os.environ.get("LLM_BATCH_MAX_CHARS", "6000"))
+# answered requests an item may take part in before it is given up
+MAX_ATTEMPTS = 3
+# longest description sent in a batch
+MAX_DESC_CHARS = 200
+
+BATCH_PROMPT = (
+    "将以下交易逐条归类到给定的类别代码之一，无法判断的使用 OTHER。\n"
+    "类别（代码: 名称）：\n{categories}\n"
+    "交易（序号: 描述）：\n{items}\n"
+    "只输出 JSON 数组，每条交易一个元素，不要输出其他内容，格式："
+    '[{{"i": 序号, "code": "类别代码"}}]'
+)
+
+
+def is_input_too_long(e):
+    """Whether an LLMError rejects the prompt for its length (413, or a 400 about the input length)."""
+    if e.status == 413:
+        return True
+    return e.status == 400 and re.search(r"length|too long|too large|token", e.body or "", re.I) is not None
+
+
+def load_categories():
+    """(code, name) of the active categories, in display order."""
+    from persist.models import ConsumeCategory
+    rows = ConsumeCategory.objects.filter(deleted=0).exclude(code__isnull=True).exclude(code="")
+    return list(rows.order_by("sortNo", "code").values_list("code", "name"))
+
+
+def _category_lines(categories):
+    return "\n".join("%s: %s" % (code, name) for code, name in categories)
+
+
+def _item_line(pos, text):
+    return "%d: %s" % (pos + 1, " ".join((text or "").split())[:MAX_DESC_CHARS])
+
+
+def build_batch_prompt(texts, categories):
+    items = "\n".join(_item_line(i, t) for i, t in enumerate(texts))
+    return BATCH_PROMPT.format(categories=_category_lines(categories), items=items)
+
+
+def _json_block(text):
+    text = (text or "").strip()
+    m = re.search(r"```(?:json)?\s*(.*?)```", text, re.S)
+    if m:
+        text = m.group(1).strip()
+    start = min([p for p in (text.find("["), text.find("{")) if p >= 0] or [-1])
+    if start < 0:
+        raise ValueError("no json in response")
+    return json.JSONDecoder().raw_decode(text[start:])[0]
+
+
+def parse_batch_response(text, size, allowed):
+    """
+    {position: code} of the valid answers in a batch response (a JSON array
+    of {"i", "code"}, or an object of position -> code). Answers with an
+    unknown position or a code outside allowed are left out; raises
+    ValueError when the response holds no JSON at all.
+    """
+    data = _json_block(text)
+    if isinstance(data, dict):
+        data = [{"i": k, "code": v} for k, v in data.items()]
+    if not isinstance(data, list):
+        raise ValueError("unexpected json %s" % type(data).__name__)
+    out = {}
+    for item in data:
+        if not isinstance(item, dict):
+            continue
+        try:
+            pos = int(item.get("i", item.get("index"))) - 1
+        except (TypeError, ValueError):
+            continue
+        code = str(item.get("code") or "").strip()
+        if 0 <= pos < size and code in allowed and pos not in out:
+            out[pos] = code
+    return out
+
+
+class BatchClassifier(object):
+    """
+    Classifies many descriptions with a few LLM requests. Descriptions are
+    packed batch_size at a time (fewer when the prompt would exceed
+    max_chars) into one prompt listing the allowed category codes and
+    asking for a JSON array; answers are validated per item and only the
+    missing or invalid ones are sent again, up to MAX_ATTEMPTS times.
+    Requests go through the tool's generate/agenerate, which raise
+    LLMError: a request rejected for its input length halves the batch
+    size and caps it below the rejected size (it grows back a quarter
+    after every fully answered batch); any other error ends the run,
+    leaving the remaining texts unanswered.
+    """
+
+    def __init__(self, tool, categories=None, batch_size=BATCH_SIZE, max_chars=MAX_PROMPT_CHARS):
+        self.tool = tool
+        self.categories = load_categories() if categories is None else list(categories)
+        self.allowed = frozenset([code for code, _ in self.categories] + ["OTHER"])
+        self.max_batch = max(1, batch_size)
+        self.batch_size = self.max_batch
+        self.max_chars = max_chars
+        self.base_chars = len(build_batch_prompt([], self.categories))
+        self.stats = Counter()
+
+    def _next_batch(self, queue):
+        size = self.base_chars
+        batch = []
+        while queue and len(batch) < self.batch_size:
+            line = len(_item_line(len(batch), queue[0])) + 1
+            if batch and size + line > self.max_chars:
+                break
+            batch.append(queue.popleft())
+            size += line
+        return batch
+
+    def _rejected(self, batch, queue, e):
+        """Queue to go on with after a failed request; None when the run should stop."""
+        if not is_input_too_long(e):
+            logger.warning("llm_batch_stopped status=%s err=%s remaining=%s", e.status, e, len(batch) + len(queue))
+            return None
+        if len(batch) == 1:
+            logger.warning("llm_batch_input_too_long size=1 skipped=1")
+            return queue
+        logger.warning("llm_batch_input_too_long size=%s", len(batch))
+        # the limit lies below this size: stay under it from now on
+        self.max_batch = max(1, min(self.max_batch, len(batch) - 1))
+        self.batch_size = max(1, len(batch) // 2)
+        queue.extendleft(reversed(batch))
+        return queue
+
+    def _answer(self, batch, response, queue, attempts, out):
+        """Records the answers of one batch request; returns the queue with the items to resend first."""
+        try:
+            answers = parse_batch_response(response, len(batch), self.allowed)
+        except ValueError as e:
+            logger.warning("llm_batch_unparsable size=%s err=%s", len(batch), e)
+            answers = {}
+        failed = []
+        for pos, text in enumerate(batch):
+            code = answers.get(pos)
+            if code is not None:
+                out[text] = code
+                continue
+            attempts[text] += 1
+            if attempts[text] < MAX_ATTEMPTS:
+                failed.append(text)
+        if not failed:
+            self.batch_size = min(self.max_batch, self.batch_size + max(1, self.batch_size // 4))
+        self.stats["retried"] += len(failed)
+        queue.extendleft(reversed(failed))
+        return queue
+
+    def _done(self, texts, out):
+        logger.info("llm_batch_classified answered=%s unanswered=%s requests=%s retried=%s",
+                    len(out), len(texts) - len(out), self.stats["requests"], self.stats["retried"])
+        return out
+
+    def classify(self, texts):
+        """{text: code} of the distinct texts; texts left without a valid answer are missing."""
+        texts = list(dict.fromkeys(texts))
+        queue = deque(texts)
+        attempts = Counter()
+        out = {}
+        while queue:
+            batch = self._next_batch(queue)
+            self.stats["requests"] += 1
+            try:
+                response = self.tool.generate(build_batch_prompt(batch, self.categories))
+            except LLMError as e:
+                queue = self._rejected(batch, queue, e)
+                if queue is None:
+                    break
+                continue
+            queue = self._answer(batch, response, queue, attempts, out)
+        return self._done(texts, out)
+
+    async def aclassify(self, texts):
+        """classify() awaiting the tool's agenerate."""
+        texts = list(dict.fromkeys(texts))
+        queue = deque(texts)
+        attempts = Counter()
+        out = {}
+        while queue:
+            batch = self._next_batch(queue)
+            self.stats["requests"] += 1
+            try:
+                response = await self.tool.agenerate(build_batch_prompt(batch, self.categories))
+            except LLMError as e:
+                queue = self._rejected(batch, queue, e)
+                if queue is None:
+                    break
+                continue
+            queue = self._answer(batch, response, queue, attempts, out)
+        return self._done(texts, out)
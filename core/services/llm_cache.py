@@ -0,0 +1,216 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+from datetime import timedelta
+
+from django.db import transaction as db_transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core.services.match_store import _norm
+
+logger = logging.getLogger("finmind")
+
+# seconds an answer stays valid
+TTL = int(os.environ.get("LLM_CACHE_TTL", str(30 * 24 * 3600)))
+# rows kept in llm_response_cache; least recently used ones are evicted beyond it
+MAX_ENTRIES = int(os.environ.get("LLM_CACHE_MAX_ENTRIES", "50000"))
+# entries also held in process memory
+MEMORY_ENTRIES = int(os.environ.get("LLM_CACHE_MEMORY_ENTRIES", "4096"))
+# writes between two checks of the table size
+PRUNE_EVERY = 200
+# keys per lookup or delete query
+CHUNK = 500
+# seconds between two syncs of the memory with the table (touches of memory hits, clears by other processes)
+SYNC_EVERY = float(os.environ.get("LLM_CACHE_SYNC_SECONDS", "5"))
+# consume_rule_version row bumped by clear()
+GENERATION_KEY = "llm_response_cache"
+
+_lock = threading.Lock()
+_cache = None
+
+
+def cache_key(model, prompt):
+    return hashlib.sha1(("%s\x1f%s" % (model or "", _norm(prompt))).encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache(object):
+    """
+    Successful LLM answers keyed by (model, normalized prompt), kept in the
+    llm_response_cache table for ttl seconds and bounded to max_entries rows
+    by evicting the least recently used. A size-bounded LRU in process
+    memory answers repeats without a query; only its misses read (and
+    touch) the table. At most every SYNC_EVERY seconds a lookup writes the
+    hits and last use of the memory hits since the previous sync to the
+    table, so pruning sees the hot entries as used, and drops the memory
+    when the generation row shows that another process cleared the cache.
+    The stats counter records memory_hits, db_hits, misses, writes and
+    evictions of this process.
+    """
+
+    def __init__(self, ttl=TTL, max_entries=MAX_ENTRIES, memory_entries=MEMORY_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = Counter()
+        self.writes_since_prune = 0
+        self.touched = Counter()
+        self.synced_at = 0.0
+        self.generation = None
+
+    def _remember(self, key, response, expires):
+        with self.lock:
+            self.memory[key] = (response, expires)
+            self.memory.move_to_end(key)
+            while len(self.memory) > self.memory_entries:
+                self.memory.popitem(last=False)
+
+    def _touch(self, touched):
+        from persist.models import LLMResponse
+        now = timezone.now()
+        by_hits = {}
+        for key, hits in touched.items():
+            by_hits.setdefault(hits, []).append(key)
+        for hits, keys in by_hits.items():
+            for i in range(0, len(keys), CHUNK):
+                LLMResponse.objects.filter(key__in=keys[i:i + CHUNK]).update(hits=F("hits") + hits, last_used_at=now)
+
+    def sync(self, force=False):
+        """Writes the pending touches of memory hits and drops the memory after a clear elsewhere (at most every SYNC_EVERY seconds)."""
+        from persist.models import RuleVersion
+        now = time.time()
+        with self.lock:
+            if not force and now - self.synced_at < SYNC_EVERY:
+                return
+            self.synced_at = now
+            touched, self.touched = self.touched, Counter()
+        try:
+            if touched:
+                self._touch(touched)
+            generation = RuleVersion.objects.filter(id=GENERATION_KEY).values_list("version", flat=True).first() or 0
+        except Exception as e:
+            logger.warning("llm_cache_sync_failed err=%s", e)
+            return
+        with self.lock:
+            if generation != self.generation:
+                self.memory.clear()
+                self.generation = generation
+
+    def get(self, model, prompt):
+        """Cached answer, or None when missing or expired."""
+        return self.get_many(model, [prompt]).get(prompt)
+
+    def get_many(self, model, prompts):
+        """{prompt: answer} of the prompts with a live cached answer (one query per CHUNK misses)."""
+        self.sync()
+        now = time.time()
+        out = {}
+        missing = {}
+        with self.lock:
+            for prompt in prompts:
+                key = cache_key(model, prompt)
+                item = self.memory.get(key)
+                if item is not None and item[1] > now:
+                    self.memory.move_to_end(key)
+                    self.touched[key] += 1
+                    self.stats["memory_hits"] += 1
+                    out[prompt] = item[0]
+                else:
+                    self.memory.pop(key, None)
+                    missing.setdefault(key, []).append(prompt)
+        if not missing:
+            return out
+        from persist.models import LLMResponse
+        keys = list(missing)
+        found = []
+        try:
+            for i in range(0, len(keys), CHUNK):
+                rows = LLMResponse.objects.filter(key__in=keys[i:i + CHUNK]).values_list("key", "response", "created_at")
+                live = [(key, response, created.timestamp() + self.ttl) for key, response, created in rows if created.timestamp() + self.ttl > now]
+                if live:
+                    LLMResponse.objects.filter(key__in=[r[0] for r in live]).update(hits=F("hits") + 1, last_used_at=timezone.now())
+                found.extend(live)
+        except Exception as e:
+            logger.warning("llm_cache_unavailable err=%s", e)
+        for key, response, expires in found:
+            self._remember(key, response, expires)
+            for prompt in missing.pop(key):
+                out[prompt] = response
+            self.stats["db_hits"] += 1
+        self.stats["misses"] += len(missing)
+        return out
+
+    def set(self, model, prompt, response):
+        self.set_many(model, [(prompt, response)])
+
+    def set_many(self, model, answers):
+        """Stores (prompt, answer) pairs, replacing older answers to the same prompts."""
+        now = timezone.now()
+        rows = {}
+        for prompt, response in answers:
+            key = cache_key(model, prompt)
+            self._remember(key, response, now.timestamp() + self.ttl)
+            rows[key] = (prompt, response)
+        if not rows:
+            return
+        from persist.models import LLMResponse
+        keys = list(rows)
+        try:
+            with db_transaction.atomic():
+                for i in range(0, len(keys), CHUNK):
+                    LLMResponse.objects.filter(key__in=keys[i:i + CHUNK]).delete()
+                LLMResponse.objects.bulk_create([
+                    LLMResponse(key=key, model=model or "", prompt=prompt, response=response, created_at=now, last_used_at=now)
+                    for key, (prompt, response) in rows.items()
+                ], batch_size=CHUNK)
+        except Exception as e:
+            logger.warning("llm_cache_write_failed err=%s", e)
+            return
+        self.stats["writes"] += len(rows)
+        self.writes_since_prune += len(rows)
+        if self.writes_since_prune >= PRUNE_EVERY:
+            self.prune()
+
+    def prune(self):
+        """Deletes expired rows and the least recently used ones beyond max_entries; returns the count."""
+        from persist.models import LLMResponse
+        self.writes_since_prune = 0
+        self.sync(force=True)
+        deleted, _ = LLMResponse.objects.filter(created_at__lte=timezone.now() - timedelta(seconds=self.ttl)).delete()
+        excess = LLMResponse.objects.count() - self.max_entries
+        if excess > 0:
+            # rows written together share last_used_at: select the victims by key
+            keys = list(LLMResponse.objects.order_by("last_used_at", "key").values_list("key", flat=True)[:excess])
+            for i in range(0, len(keys), CHUNK):
+                n, _ = LLMResponse.objects.filter(key__in=keys[i:i + CHUNK]).delete()
+                deleted += n
+        if deleted:
+            self.stats["evictions"] += deleted
+            logger.info("llm_cache_pruned rows=%s", deleted)
+        return deleted
+
+    def clear(self):
+        """Deletes every cached answer; other processes drop their memory at their next sync."""
+        from persist.models import LLMResponse, RuleVersion
+        n = RuleVersion.objects.filter(id=GENERATION_KEY).update(version=F("version") + 1)
+        if not n:
+            RuleVersion.objects.create(id=GENERATION_KEY, version=1)
+        with self.lock:
+            self.memory.clear()
+            self.touched.clear()
+        deleted, _ = LLMResponse.objects.all().delete()
+        return deleted
+
+
+def get_llm_cache():
+    """Process-wide LLMResponseCache."""
+    global _cache
+    with _lock:
+        if _cache is None:
+            _cache = LLMResponseCache()
+        return _cache
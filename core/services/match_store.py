@@ -0,0 +1,393 @@
+import logging
+import re
+import threading
+import unicodedata
+
+from django.db import connection
+from django.db import transaction as db_transaction
+from django.db.models import Count, F, Max, Q
+
+from core.services.rule_cache import get_rule_snapshot
+from core.services.rule_index import RuleIndex, rule_score
+
+logger = logging.getLogger("finmind")
+
+_rebuild_lock = threading.Lock()
+# (matches version, transactions watermark) ensure_matches() last found up to date
+_checked = None
+
+MATCHES_VERSION_KEY = "transaction_match"
+BATCH_SIZE = 1000
+# desc_key column length; longer keys are stored truncated
+DESC_KEY_LEN = 255
+
+# Transaction fields read by the rule engine; loaded up front to avoid
+# one deferred-field query per row.
+TEXT_FIELDS = (
+    "transaction_desc", "opponent_name", "opponent_account", "consume_name", "consume_code",
+    "card_type_name", "bank_card_name", "income_money", "balance_money", "transaction_date", "updatetime",
+)
+
+
+def _norm(s):
+    try:
+        s = unicodedata.normalize("NFKC", s or "")
+    except Exception:
+        s = s or ""
+    s = s.strip().lower()
+    s = re.sub(r"\s+", " ", s)
+    return s
+
+
+def transaction_text(txn):
+    """Normalized (full text, description) pair the dashboard rules match against."""
+    desc = _norm(txn.transaction_desc or "")
+    opp = _norm(getattr(txn, "opponent_name", "") or "") + " " + _norm(getattr(txn, "opponent_account", "") or "")
+    extra = " ".join([
+        _norm(getattr(txn, "consume_name", "") or ""),
+        _norm(getattr(txn, "consume_code", "") or ""),
+        _norm(getattr(txn, "card_type_name", "") or ""),
+        _norm(getattr(txn, "bank_card_name", "") or "")
+    ]).strip()
+    text = " ".join([desc, opp, extra]).strip()
+    return text, desc
+
+
+def _amount(income_money, balance_money):
+    try:
+        vals = []
+        if income_money is not None:
+            vals.append(float(income_money))
+        if balance_money is not None:
+            vals.append(float(balance_money))
+        vals = [abs(v) for v in vals if not (v is None)]
+        if not vals:
+            return None
+        return max(vals)
+    except Exception:
+        return None
+
+
+def transaction_amount(txn):
+    return _amount(txn.income_money, txn.balance_money)
+
+
+def desc_key_of(desc):
+    """Stored form of a normalized description (truncated to the column length)."""
+    return desc[:DESC_KEY_LEN]
+
+
+def match_transaction(index, txn):
+    """First rule (by priority) of the index matching the transaction, or None."""
+    text, desc = transaction_text(txn)
+    tdate = txn.transaction_date
+    return index.first_transaction_match(text, desc, amount=transaction_amount(txn), day=tdate.date() if tdate else None)
+
+
+def _text_key(txn):
+    return (
+        txn.transaction_desc, txn.opponent_name, txn.opponent_account, txn.consume_name,
+        txn.consume_code, txn.card_type_name, txn.bank_card_name,
+    )
+
+
+def _plan(index, text, desc):
+    constrained = []
+    fixed = None
+    for pos in index.transaction_candidates(text, desc):
+        if not index.has_limits(pos):
+            fixed = index.rules[pos]
+            break
+        constrained.append(pos)
+    return constrained, fixed
+
+
+def _resolve(index, plan, amount, tdate):
+    constrained, fixed = plan
+    if constrained:
+        return index.first_admitted(constrained, amount, tdate.date() if tdate else None) or fixed
+    return fixed
+
+
+def _match_many(index, txns):
+    plans = {}
+    for t in txns:
+        key = _text_key(t)
+        entry = plans.get(key)
+        if entry is None:
+            text, desc = transaction_text(t)
+            entry = plans[key] = (text, desc, _plan(index, text, desc))
+        text, desc, plan = entry
+        r = plan[1]
+        if plan[0]:
+            r = _resolve(index, plan, transaction_amount(t), t.transaction_date)
+        yield t, r, text, desc
+
+
+def match_many(index, txns):
+    """
+    Yield (txn, rule) for each transaction, like match_transaction.
+
+    Transactions are dictionary-encoded by their raw text fields: the rule
+    engine runs once per distinct key, and only the rules with amount/date
+    constraints that rank ahead of the key's first unconstrained match are
+    checked per row.
+    """
+    for t, r, _, _ in _match_many(index, txns):
+        yield t, r
+
+
+# values_list() fields feeding match_stored from a Transaction queryset
+STORED_FIELDS = (
+    "match__search_text", "match__desc_key", "transaction_desc", "income_money", "balance_money", "transaction_date",
+)
+
+
+def match_stored(index, rows):
+    """
+    Like match_many, over values_list() rows whose last items are
+    STORED_FIELDS, so texts already stored in transaction_match are not
+    normalized again. Yields (row, rule) pairs.
+    """
+    plans = {}
+    for row in rows:
+        text, key, raw_desc, income_money, balance_money, tdate = row[-6:]
+        desc = key or ""
+        if len(desc) >= DESC_KEY_LEN:
+            desc = _norm(raw_desc or "")
+        pk = (text, desc)
+        plan = plans.get(pk)
+        if plan is None:
+            plan = plans[pk] = _plan(index, text or "", desc)
+        r = plan[1]
+        if plan[0]:
+            r = _resolve(index, plan, _amount(income_money, balance_money), tdate)
+        yield row, r
+
+
+def _prefilter(rules, tags_map):
+    """
+    SQL condition over search_text that every transaction matched by one of
+    the rules satisfies (a superset); None when some rule cannot be
+    narrowed down (regex, blank patterns).
+    """
+    cond = Q()
+    for rule in rules:
+        pat = _norm(rule.pattern or "")
+        pt = rule.patternType or "contains"
+        if not pat or pt not in ("contains", "equals", "startsWith", "endsWith"):
+            return None
+        # the description leads search_text, so anchored patterns are prefixes of it
+        if pt in ("equals", "startsWith"):
+            cond |= Q(match__search_text__startswith=pat)
+        else:
+            cond |= Q(match__search_text__contains=pat)
+        for tag in tags_map.get(rule.id, []) or []:
+            tt = _norm(str(tag or ""))
+            if tt:
+                cond |= Q(match__search_text__contains=tt)
+    return cond
+
+
+def _matches_version():
+    from persist.models import RuleVersion
+    return RuleVersion.objects.filter(id=MATCHES_VERSION_KEY).values_list("version", flat=True).first()
+
+
+def _set_matches_version(version):
+    from persist.models import RuleVersion
+    n = RuleVersion.objects.filter(id=MATCHES_VERSION_KEY).update(version=version)
+    if not n:
+        RuleVersion.objects.create(id=MATCHES_VERSION_KEY, version=version)
+
+
+def _changed_rule_ids(after, upto):
+    """
+    Ids of the rules changed by the rules versions after..upto (recorded by
+    bump_rules_version), or None when a version in between left no record.
+    """
+    from persist.models import RuleChange
+    rows = RuleChange.objects.filter(version__gt=after, version__lte=upto).values_list("version", "rule_id")
+    versions = set()
+    rule_ids = set()
+    for version, rule_id in rows:
+        versions.add(version)
+        rule_ids.add(rule_id)
+    if len(versions) != upto - after:
+        return None
+    return rule_ids
+
+
+def _forget_rule_changes(version):
+    from persist.models import RuleChange
+    RuleChange.objects.filter(version__lte=version).delete()
+
+
+def _match_row(txn, r, version, text, desc):
+    from persist.models import TransactionMatch
+    return TransactionMatch(
+        transaction_id=txn.id,
+        rule_id=r.id if r else None,
+        category_code=r.categoryId if r else None,
+        score=rule_score(r) if r else None,
+        rules_version=version,
+        txn_updatetime=txn.updatetime,
+        search_text=text,
+        desc_key=desc_key_of(desc),
+    )
+
+
+def recompute_transactions(txn_ids, snap=None):
+    """Recompute the stored match of the given transactions; returns the number of rows written."""
+    from persist.models import Transaction, TransactionMatch
+    snap = snap or get_rule_snapshot()
+    ids = list(txn_ids)
+    written = 0
+    for i in range(0, len(ids), BATCH_SIZE):
+        chunk = ids[i:i + BATCH_SIZE]
+        txns = Transaction.objects.filter(id__in=chunk).exclude(deleted=1).only(*TEXT_FIELDS)
+        rows = [_match_row(t, r, snap.version, text, desc) for t, r, text, desc in _match_many(snap.index, txns)]
+        with db_transaction.atomic():
+            TransactionMatch.objects.filter(transaction_id__in=chunk).delete()
+            TransactionMatch.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+        written += len(rows)
+    return written
+
+
+def rebuild_matches(snap=None):
+    """Recompute the whole transaction_match table against the current rules."""
+    from persist.models import Transaction, TransactionMatch
+    snap = snap or get_rule_snapshot()
+    written = 0
+    with db_transaction.atomic():
+        TransactionMatch.objects.all().delete()
+        rows = []
+        txns = Transaction.objects.exclude(deleted=1).only(*TEXT_FIELDS).iterator(chunk_size=2000)
+        for t, r, text, desc in _match_many(snap.index, txns):
+            rows.append(_match_row(t, r, snap.version, text, desc))
+            if len(rows) >= BATCH_SIZE:
+                TransactionMatch.objects.bulk_create(rows)
+                written += len(rows)
+                rows = []
+        if rows:
+            TransactionMatch.objects.bulk_create(rows)
+            written += len(rows)
+        _set_matches_version(snap.version)
+        _forget_rule_changes(snap.version)
+    logger.info("transaction_match_rebuilt version=%s rows=%s", snap.version, written)
+    return written
+
+
+def _rebuild_in_background(snap):
+    """Starts rebuild_matches(snap) on a daemon thread unless this process is rebuilding already."""
+    if not _rebuild_lock.acquire(blocking=False):
+        return
+
+    def run():
+        try:
+            rebuild_matches(snap)
+        except Exception as e:
+            logger.warning("transaction_match_rebuild_failed err=%s", e)
+        finally:
+            connection.close()
+            _rebuild_lock.release()
+
+    threading.Thread(target=run, name="transaction-match-rebuild", daemon=True).start()
+
+
+def _transactions_watermark():
+    """Row count and latest create/update times of the live transactions; changes when rows are added, edited or removed."""
+    from persist.models import Transaction
+    agg = Transaction.objects.exclude(deleted=1).aggregate(n=Count("id"), created=Max("createtime"), updated=Max("updatetime"))
+    return agg["n"], agg["created"], agg["updated"]
+
+
+def ensure_matches():
+    """
+    Bring transaction_match up to date with transactions added or edited
+    since they were last matched. Returns False when the table cannot be
+    used (e.g. not migrated) or is being rebuilt, and callers then match
+    live: a table behind the rules version is brought up to date by
+    sync_matches() when the changed rules of every version in between are
+    known, and otherwise rebuilt on a background thread, one per process at
+    a time, instead of inside the request (rebuild_transaction_matches does
+    it ahead of a deploy).
+
+    The stale-row join only runs when the matches version or the
+    transactions watermark moved since the last check in this process. A
+    transaction without updatetime counts as fresh once it has a match.
+    """
+    global _checked
+    from persist.models import Transaction
+    try:
+        snap = get_rule_snapshot()
+        if snap.version is None:
+            return False
+        if _matches_version() != snap.version and not sync_matches():
+            _rebuild_in_background(snap)
+            return False
+        mark = (snap.version, _transactions_watermark())
+        if mark == _checked:
+            return True
+        edited = Q(updatetime__isnull=False) & (Q(match__txn_updatetime__isnull=True) | ~Q(updatetime=F("match__txn_updatetime")))
+        stale = Transaction.objects.exclude(deleted=1).filter(
+            Q(match__isnull=True) | Q(match__search_text__isnull=True) | edited
+        ).values_list("id", flat=True)
+        n = recompute_transactions(list(stale), snap)
+        if n:
+            logger.info("transaction_match_refreshed rows=%s", n)
+        _checked = mark
+        return True
+    except Exception as e:
+        logger.warning("transaction_match_unavailable err=%s", e)
+        return False
+
+
+def sync_matches(rule_ids=(), txn_ids=()):
+    """
+    Incrementally refresh stored matches after rules or transactions changed.
+
+    Only transactions currently won by one of the changed rules,
+    transactions those rules now match, and the given transaction ids are
+    recomputed. The changed rules are the ones recorded for every rules
+    version the table is behind, however many; rule_ids are already applied
+    when the table is at the current version. When a version in between has
+    no record, nothing is done here and the next ensure_matches() rebuilds
+    the table instead.
+    """
+    from persist.models import Transaction, TransactionMatch
+    try:
+        snap = get_rule_snapshot()
+        if snap.version is None:
+            return False
+        current = _matches_version()
+        if current is None or current > snap.version:
+            return False
+        changed = set()
+        if current < snap.version:
+            changed = _changed_rule_ids(current, snap.version)
+            if changed is None:
+                return False
+            changed.update(rule_ids or ())
+        rule_ids = changed
+        affected = set(txn_ids or ())
+        if rule_ids:
+            affected.update(TransactionMatch.objects.filter(rule_id__in=rule_ids).values_list("transaction_id", flat=True))
+            probe = RuleIndex([r for r in snap.index.rules if r.id in rule_ids], snap.index.tags_map)
+            if len(probe):
+                qs = Transaction.objects.exclude(deleted=1)
+                cond = _prefilter(probe.rules, probe.tags_map)
+                if cond is not None:
+                    qs = qs.filter(cond)
+                rows = qs.values_list("id", *STORED_FIELDS).iterator(chunk_size=2000)
+                for row, r in match_stored(probe, rows):
+                    if r is not None:
+                        affected.add(row[0])
+        n = recompute_transactions(affected, snap)
+        _set_matches_version(snap.version)
+        _forget_rule_changes(snap.version)
+        logger.info("transaction_match_synced version=%s rules=%s rows=%s", snap.version, len(rule_ids), n)
+        return True
+    except Exception as e:
+        logger.warning("transaction_match_sync_failed err=%s", e)
+        return False
@@ -0,0 +1,236 @@
+import logging
+import re
+import threading
+from datetime import timedelta
+
+try:
+    import re._parser as _sre_parse
+    import re._constants as _sre
+except ImportError:  # Python < 3.11
+    import sre_parse as _sre_parse
+    import sre_constants as _sre
+
+from core.services.match_store import DESC_KEY_LEN, _matches_version, _norm
+
+logger = logging.getLogger("finmind")
+
+# Rows recomputed in transactions that committed after a refresh may carry
+# computed_at values older than the watermark; re-read this far back.
+REFRESH_OVERLAP = timedelta(seconds=60)
+
+_lock = threading.Lock()
+_index = None
+
+
+def _grams(text):
+    """Character bigrams and trigrams of a normalized text."""
+    out = set()
+    for n in (2, 3):
+        for i in range(len(text) - n + 1):
+            out.add(text[i:i + n])
+    return out
+
+
+def _query_grams(word):
+    """Grams every text containing word must contain (trigrams when possible)."""
+    n = 3 if len(word) >= 3 else 2
+    return {word[i:i + n] for i in range(len(word) - n + 1)}
+
+
+def regex_literals(pattern):
+    """
+    Literal substrings every match of the regex contains. Returns an empty
+    list when nothing can be required (alternations only, case-insensitive
+    patterns, ...), which means no narrowing.
+    """
+    try:
+        parsed = _sre_parse.parse(pattern)
+    except Exception:
+        return []
+    if parsed.state.flags & re.IGNORECASE:
+        return []
+    runs = []
+
+    def walk(seq):
+        cur = []
+        for op, av in seq:
+            if op is _sre.LITERAL:
+                cur.append(chr(av))
+                continue
+            if cur:
+                runs.append("".join(cur))
+                cur = []
+            if op is _sre.SUBPATTERN:
+                if av[1] & re.IGNORECASE:
+                    return False
+                if walk(av[-1]) is False:
+                    return False
+            elif op in (_sre.MAX_REPEAT, _sre.MIN_REPEAT, getattr(_sre, "POSSESSIVE_REPEAT", None)):
+                if av[0] >= 1 and walk(av[2]) is False:
+                    return False
+        if cur:
+            runs.append("".join(cur))
+        return True
+
+    if walk(parsed) is False:
+        return []
+    return [r for r in runs if len(r) >= 2]
+
+
+class NgramIndex(object):
+    """
+    Inverted index from character bigrams/trigrams to transactions, built
+    over the stored search_text (normalized description, opponent and card
+    fields) of transaction_match.
+
+    Rows are kept in dense positions; a refresh re-reads only the matches
+    recomputed since the last one (computed_at watermark) and patches the
+    postings of those positions. A changed matches version or a row count
+    that no longer adds up triggers a full rebuild.
+    """
+
+    def __init__(self):
+        self._reset()
+
+    def _reset(self):
+        self.version = None
+        self.watermark = None
+        self.ids = []
+        self.texts = []
+        self.descs = []
+        self.categories = []
+        self.rule_ids = []
+        self.positions = {}
+        self.postings = {}
+
+    def __len__(self):
+        return len(self.positions)
+
+    def _put(self, tid, text, desc, category, rule_id):
+        text = text or ""
+        pos = self.positions.get(tid)
+        if pos is None:
+            pos = self.positions[tid] = len(self.ids)
+            self.ids.append(tid)
+            self.texts.append(None)
+            self.descs.append(None)
+            self.categories.append(None)
+            self.rule_ids.append(None)
+            old = set()
+        else:
+            old = _grams(self.texts[pos])
+        new = _grams(text)
+        for g in old - new:
+            bucket = self.postings.get(g)
+            if bucket is not None:
+                bucket.discard(pos)
+                if not bucket:
+                    del self.postings[g]
+        for g in new - old:
+            self.postings.setdefault(g, set()).add(pos)
+        self.texts[pos] = text
+        self.descs[pos] = desc
+        self.categories[pos] = category
+        self.rule_ids[pos] = rule_id
+
+    def _load(self, qs):
+        seen = self.watermark
+        for tid, text, key, category, rule_id, raw_desc, computed_at in qs.values_list(
+            "transaction_id", "search_text", "desc_key", "category_code", "rule_id",
+            "transaction__transaction_desc", "computed_at",
+        ).iterator(chunk_size=2000):
+            desc = key or ""
+            if len(desc) >= DESC_KEY_LEN:
+                desc = _norm(raw_desc or "")
+            self._put(tid, text, desc, category, rule_id)
+            if computed_at and (seen is None or computed_at > seen):
+                seen = computed_at
+        self.watermark = seen
+
+    def refresh(self):
+        from persist.models import TransactionMatch
+        version = _matches_version()
+        live = TransactionMatch.objects.exclude(transaction__deleted=1)
+        if version != self.version or self.watermark is None:
+            self._reset()
+            self._load(live)
+            self.version = version
+            logger.info("ngram_index_built version=%s rows=%s grams=%s", version, len(self), len(self.postings))
+            return self
+        before = len(self)
+        self._load(live.filter(computed_at__gte=self.watermark - REFRESH_OVERLAP))
+        if live.count() != len(self):
+            # rows were deleted or soft-deleted underneath us
+            self.version = None
+            return self.refresh()
+        if len(self) != before:
+            logger.info("ngram_index_refreshed rows=%s", len(self))
+        return self
+
+    def _narrow(self, words):
+        """Positions whose text contains every gram of the words; None means all."""
+        grams = set()
+        for w in words:
+            if len(w) >= 2:
+                grams |= _query_grams(w)
+        if not grams:
+            return None
+        buckets = sorted((self.postings.get(g, ()) for g in grams), key=len)
+        if not buckets[0]:
+            return set()
+        out = set(buckets[0])
+        for b in buckets[1:]:
+            out &= b
+            if not out:
+                break
+        return out
+
+    def search(self, pattern, pattern_type="contains"):
+        """
+        Positions of stored transactions the pattern matches, with the
+        dashboard semantics of RuleIndex (contains/regex on the full text,
+        equals/startsWith/endsWith on the description). Raises re.error for
+        an invalid regex.
+        """
+        raw = pattern or ""
+        pt = pattern_type or "contains"
+        if pt == "regex":
+            compiled = re.compile(raw)
+            cands = self._narrow(regex_literals(raw))
+            check = lambda p: compiled.search(self.texts[p]) is not None
+        else:
+            pat = _norm(raw)
+            if not pat:
+                cands = None
+                if pt == "equals":
+                    check = lambda p: not self.descs[p]
+                else:
+                    check = lambda p: True
+            else:
+                cands = self._narrow([pat])
+                if pt == "equals":
+                    check = lambda p: self.descs[p] == pat
+                elif pt == "startsWith":
+                    check = lambda p: self.descs[p].startswith(pat)
+                elif pt == "endsWith":
+                    check = lambda p: self.descs[p].endswith(pat)
+                else:
+                    check = lambda p: pat in self.texts[p]
+        if cands is None:
+            cands = self.positions.values()
+        return sorted(p for p in cands if check(p))
+
+
+def search_ngram_index(pattern, pattern_type="contains"):
+    """
+    (transaction id, category, rule id) of the stored transactions the
+    pattern matches, from the process-wide n-gram index brought up to date
+    with transaction_match. Refresh and search both run under the index
+    lock, so a search never sees a refresh half way through.
+    """
+    global _index
+    with _lock:
+        if _index is None:
+            _index = NgramIndex()
+        ng = _index.refresh()
+        return [(ng.ids[p], ng.categories[p], ng.rule_ids[p]) for p in ng.search(pattern, pattern_type)]
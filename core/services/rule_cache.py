@@ -0,0 +1,106 @@
+import logging
+import threading
+
+from core.services.rule_index import load_rule_index
+
+logger = logging.getLogger("finmind")
+
+RULES_VERSION_KEY = "rules"
+
+_lock = threading.Lock()
+_snapshot = None
+
+
+class RuleSnapshot(object):
+    """Active rules compiled once per rules version, plus derived per-category indexes."""
+
+    def __init__(self, version, index):
+        self.version = version
+        self.index = index
+        self._by_category = {}
+
+    def index_for(self, category_id=None):
+        if not category_id:
+            return self.index
+        idx = self._by_category.get(category_id)
+        if idx is None:
+            idx = self.index.for_category(category_id)
+            self._by_category[category_id] = idx
+        return idx
+
+
+def current_rules_version():
+    """Rules version stored in the DB; None when it cannot be read."""
+    from persist.models import RuleVersion
+    try:
+        v = RuleVersion.objects.filter(id=RULES_VERSION_KEY).values_list("version", flat=True).first()
+        return v or 0
+    except Exception as e:
+        logger.warning("rules_version_unavailable err=%s", e)
+        return None
+
+
+def bump_rules_version(rule_ids=()):
+    """
+    Mark the rule set as changed so every worker rebuilds its cache on next
+    use; rule_ids, the rules the change touched, are recorded against the
+    new version for sync_matches.
+    """
+    from django.db import transaction
+    from django.db.models import F
+    from persist.models import RuleChange, RuleVersion
+    try:
+        with transaction.atomic():
+            n = RuleVersion.objects.filter(id=RULES_VERSION_KEY).update(version=F("version") + 1)
+            if not n:
+                RuleVersion.objects.create(id=RULES_VERSION_KEY, version=1)
+            version = RuleVersion.objects.filter(id=RULES_VERSION_KEY).values_list("version", flat=True).first()
+            RuleChange.objects.bulk_create([RuleChange(version=version, rule_id=rid) for rid in set(rule_ids or ()) if rid])
+    except Exception as e:
+        logger.warning("rules_version_bump_failed err=%s", e)
+    invalidate_rule_cache()
+    return current_rules_version()
+
+
+def invalidate_rule_cache():
+    global _snapshot
+    with _lock:
+        _snapshot = None
+
+
+def get_rule_snapshot():
+    """
+    Process-wide snapshot of the active rules and tags.
+    Rebuilt only when the DB rules version differs from the cached one; if
+    the version row cannot be read the snapshot is rebuilt on every call.
+    """
+    global _snapshot
+    version = current_rules_version()
+    snap = _snapshot
+    if snap is not None and version is not None and snap.version == version:
+        return snap
+    with _lock:
+        snap = _snapshot
+        if snap is not None and version is not None and snap.version == version:
+            return snap
+        snap = RuleSnapshot(version, load_rule_index())
+        if version is not None:
+            _snapshot = snap
+        logger.info("rule_cache_rebuilt version=%s rules=%s", version, len(snap.index))
+        return snap
+
+
+def get_rule_index(category_id=None):
+    return get_rule_snapshot().index_for(category_id)
+
+
+def other_category_codes():
+    """
+    Codes of the "other" categories (name containing 其他 or Other). Read on
+    every call: consume_category is edited outside this app without a
+    rules version bump, and the query is one scan of a small table.
+    """
+    from django.db.models import Q
+    from persist.models import ConsumeCategory
+    rows = ConsumeCategory.objects.filter(Q(name__icontains="其他") | Q(name__icontains="Other")).values_list("code", flat=True)
+    return frozenset(rows)
@@ -0,0 +1,357 @@
+import re
+import unicodedata
+from collections import deque
+
+
+# Max number of regex rules folded into one combined alternation.
+REGEX_CHUNK_SIZE = 64
+
+_BACKREF = re.compile(r"\\\d|\(\?P=|\(\?\(")
+
+
+def _norm(s):
+    try:
+        s = unicodedata.normalize("NFKC", s or "")
+    except Exception:
+        s = s or ""
+    s = s.strip().lower()
+    s = re.sub(r"\s+", " ", s)
+    return s
+
+
+def rule_score(rule):
+    """Score used when ranking categories: rule priority plus a pattern-type bonus."""
+    base = int(rule.priority or 100)
+    pt = (rule.patternType or "contains").lower()
+    if pt == "equals":
+        return base + 100
+    if pt == "regex":
+        return base + 90
+    if pt in ("startswith", "endswith"):
+        return base + 80
+    return base + 60
+
+
+class Automaton(object):
+    """Aho-Corasick automaton mapping every keyword occurrence to its payloads."""
+
+    def __init__(self):
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [()]
+        self._pending = [[]]
+
+    def add(self, word, payload):
+        node = 0
+        for ch in word:
+            nxt = self.goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[node][ch] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append(())
+                self._pending.append([])
+            node = nxt
+        self._pending[node].append(payload)
+
+    def build(self):
+        queue = deque()
+        for nxt in self.goto[0].values():
+            queue.append(nxt)
+        self.out[0] = tuple(self._pending[0])
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self.goto[node].items():
+                f = self.fail[node]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                queue.append(nxt)
+            self.out[node] = tuple(self._pending[node]) + self.out[self.fail[node]]
+        self._pending = None
+        return self
+
+    def search(self, text, hits):
+        goto = self.goto
+        fail = self.fail
+        out = self.out
+        node = 0
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                hits.update(out[node])
+        return hits
+
+
+class _Trie(object):
+    """Character trie answering "which keywords are prefixes of this text"."""
+
+    def __init__(self):
+        self.root = {}
+
+    def add(self, word, payload):
+        node = self.root
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node.setdefault(None, []).append(payload)
+
+    def search(self, text, hits):
+        node = self.root
+        for ch in text:
+            node = node.get(ch)
+            if node is None:
+                return hits
+            if None in node:
+                hits.update(node[None])
+        return hits
+
+
+class _RegexGroup(object):
+    """Regex rules with combined alternations used as a prefilter per chunk."""
+
+    def __init__(self):
+        self.single = []
+        self.chunks = []
+
+    def build(self, entries, chunk_size=REGEX_CHUNK_SIZE):
+        foldable = []
+        for pos, pattern in entries:
+            try:
+                compiled = re.compile(pattern)
+            except Exception:
+                continue
+            if _BACKREF.search(pattern) or pattern.lstrip().startswith("(?"):
+                self.single.append((pos, compiled))
+            else:
+                foldable.append((pos, pattern, compiled))
+        for i in range(0, len(foldable), chunk_size):
+            chunk = foldable[i:i + chunk_size]
+            try:
+                combined = re.compile("|".join("(?:%s)" % p for _, p, _ in chunk))
+            except Exception:
+                self.single.extend((pos, c) for pos, _, c in chunk)
+                continue
+            self.chunks.append((combined, [(pos, c) for pos, _, c in chunk]))
+        return self
+
+    def search(self, text, hits):
+        for pos, compiled in self.single:
+            if compiled.search(text) is not None:
+                hits.add(pos)
+        for combined, members in self.chunks:
+            if combined.search(text) is None:
+                continue
+            if len(members) == 1:
+                hits.add(members[0][0])
+                continue
+            for pos, compiled in members:
+                if compiled.search(text) is not None:
+                    hits.add(pos)
+        return hits
+
+
+class RuleIndex(object):
+    """
+    Compiled view over a list of ConsumeRule rows.
+
+    Rules keep the order they were given in (callers pass them ordered by
+    priority), so "first match" is the lowest matching position. Contains
+    patterns and tags go through an Aho-Corasick automaton, equals patterns
+    through a dict, startsWith/endsWith through tries and regex rules
+    through combined alternations.
+
+    Two matching flavours mirror the existing callers:
+    - transaction matching (dashboards): contains/regex/tags are tested
+      against the full normalized transaction text, equals/startsWith/
+      endsWith against the normalized description, and amount/date
+      constraints are checked per row.
+    - text matching (classifier, recommend, metrics): every pattern type is
+      tested against the normalized text, regex against the raw text, tags
+      and constraints are ignored.
+    """
+
+    def __init__(self, rules, tags_map=None, natural_order=None):
+        self.rules = list(rules)
+        self.tags_map = tags_map = tags_map or {}
+        # rank of each rule in unordered (table) order; category_scores
+        # accumulates in this order so ties rank as they always did
+        self.natural_order = natural_order
+        if natural_order:
+            rank = {rid: i for i, rid in enumerate(natural_order)}
+            self._natural = [rank.get(r.id, len(rank)) for r in self.rules]
+        else:
+            self._natural = None
+        self._contains = Automaton()
+        self._tags = Automaton()
+        self._equals = {}
+        self._prefix = _Trie()
+        self._suffix = _Trie()
+        self._blank = []
+        self._blank_equals = []
+        self._blank_regex = set()
+        regex_entries = []
+        self._limits = []
+        self.scores = []
+        for pos, rule in enumerate(self.rules):
+            raw = rule.pattern or ""
+            pat = _norm(raw)
+            pt = rule.patternType or "contains"
+            if pt == "regex":
+                if raw:
+                    regex_entries.append((pos, raw))
+                    if not pat:
+                        self._blank_regex.add(pos)
+            elif raw and not pat:
+                # whitespace-only pattern: matches anything in transaction mode
+                if pt == "equals":
+                    self._blank_equals.append(pos)
+                elif pt in ("contains", "startsWith", "endsWith"):
+                    self._blank.append(pos)
+            elif pat:
+                if pt == "contains":
+                    self._contains.add(pat, pos)
+                elif pt == "equals":
+                    self._equals.setdefault(pat, []).append(pos)
+                elif pt == "startsWith":
+                    self._prefix.add(pat, pos)
+                elif pt == "endsWith":
+                    self._suffix.add(pat[::-1], pos)
+            for tag in tags_map.get(rule.id, []) or []:
+                tt = _norm(str(tag or ""))
+                if tt:
+                    self._tags.add(tt, pos)
+            self._limits.append(self._limits_of(rule))
+            self.scores.append(rule_score(rule))
+        self._contains.build()
+        self._tags.build()
+        self._regex = _RegexGroup().build(regex_entries)
+
+    @staticmethod
+    def _limits_of(rule):
+        lo = float(rule.minAmount) if rule.minAmount is not None else None
+        hi = float(rule.maxAmount) if rule.maxAmount is not None else None
+        sd = rule.startDate or None
+        ed = rule.endDate or None
+        if lo is None and hi is None and sd is None and ed is None:
+            return None
+        return (lo, hi, sd, ed)
+
+    def __len__(self):
+        return len(self.rules)
+
+    def for_category(self, category_id):
+        """Index over the rules of one category, keeping their order."""
+        return RuleIndex([r for r in self.rules if r.categoryId == category_id], self.tags_map, self.natural_order)
+
+    def _anchored(self, anchor, hits):
+        hits.update(self._equals.get(anchor, ()))
+        self._prefix.search(anchor, hits)
+        self._suffix.search(anchor[::-1], hits)
+        return hits
+
+    def transaction_candidates(self, text, desc):
+        """Positions of rules whose pattern or tags match, in priority order (constraints not applied)."""
+        hits = set()
+        self._contains.search(text, hits)
+        self._tags.search(text, hits)
+        self._regex.search(text, hits)
+        self._anchored(desc, hits)
+        hits.update(self._blank)
+        if not desc:
+            hits.update(self._blank_equals)
+        return sorted(hits)
+
+    def has_limits(self, pos):
+        return self._limits[pos] is not None
+
+    def admits(self, pos, amount=None, day=None):
+        """Amount/date constraints of one rule; missing values never reject."""
+        limits = self._limits[pos]
+        if limits is None:
+            return True
+        lo, hi, sd, ed = limits
+        if amount is not None:
+            if lo is not None and amount < lo:
+                return False
+            if hi is not None and amount > hi:
+                return False
+        if day is not None:
+            if sd and day < sd:
+                return False
+            if ed and day > ed:
+                return False
+        return True
+
+    def first_admitted(self, candidates, amount=None, day=None):
+        for pos in candidates:
+            if self.admits(pos, amount, day):
+                return self.rules[pos]
+        return None
+
+    def first_transaction_match(self, text, desc, amount=None, day=None):
+        return self.first_admitted(self.transaction_candidates(text, desc), amount, day)
+
+    def text_candidates(self, text):
+        t = _norm(text or "")
+        hits = set()
+        self._contains.search(t, hits)
+        self._anchored(t, hits)
+        self._regex.search(text or "", hits)
+        if self._blank_regex:
+            hits.difference_update(self._blank_regex)
+        return sorted(hits)
+
+    def first_text_match(self, text):
+        hits = self.text_candidates(text)
+        return self.rules[hits[0]] if hits else None
+
+    def first_text_matches(self, texts):
+        """first_text_match for each text, evaluated once per distinct text."""
+        memo = {}
+        out = []
+        for text in texts:
+            key = text or ""
+            if key not in memo:
+                memo[key] = self.first_text_match(key)
+            out.append(memo[key])
+        return out
+
+    def text_matches(self, text):
+        """All rules matching the text as (rule, score) pairs in priority order."""
+        return [(self.rules[pos], self.scores[pos]) for pos in self.text_candidates(text)]
+
+    def category_scores(self, text):
+        """Summed rule scores and match counts per category for the text."""
+        score_map = {}
+        count_map = {}
+        hits = self.text_candidates(text)
+        if self._natural is not None:
+            hits.sort(key=self._natural.__getitem__)
+        for pos in hits:
+            k = self.rules[pos].categoryId or ""
+            if not k:
+                continue
+            score_map[k] = score_map.get(k, 0) + self.scores[pos]
+            count_map[k] = count_map.get(k, 0) + 1
+        return score_map, count_map
+
+
+def load_rule_index(category_id=None, with_tags=True):
+    """Build a RuleIndex from the active rules (optionally one category) ordered by priority."""
+    from persist.models import ConsumeRule, ConsumeRuleTag
+    qs = ConsumeRule.objects.filter(active=1)
+    if category_id:
+        qs = qs.filter(categoryId=category_id)
+    # priority order comes from the database, so equal priorities follow the column collation
+    rules = list(qs.order_by("-priority", "pattern"))
+    # ids only, in table order, for the natural order of category_scores
+    natural = list(qs.values_list("id", flat=True))
+    tags_map = {}
+    if with_tags and rules:
+        ids = [x.id for x in rules]
+        for t in ConsumeRuleTag.objects.filter(rule_id__in=ids).values("rule_id", "tag"):
+            tags_map.setdefault(t["rule_id"], []).append(t["tag"])
+    return RuleIndex(rules, tags_map, natural)
@@ -0,0 +1,76 @@
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+
+from core.services import fingerprint
+from core.services.fingerprint import backfill_fingerprints, content_hash, duplicate_groups
+from core.services.statement_ingest import StatementIngestor
+from persist.models import Transaction, TransactionFingerprint
+
+HEADER = ["交易日", "记账日", "卡号", "金额", "币种", "结算金额", "描述"]
+COFFEE = ["2024-01-02 08:30:00", "2024-01-03", "1234", "12.50", "CNY", "12.50", "星巴克 咖啡"]
+METRO = ["2024-01-04 18:00:00", "2024-01-04", "1234", "3.00", "CNY", "3.00", "地铁"]
+
+
+class FingerprintTests(TestCase):
+
+    def ingest(self, *files):
+        ingestor = StatementIngestor()
+        for name, rows in files:
+            ingestor.ingest_file("credit", name, [HEADER] + rows)
+        return ingestor.stats
+
+    def fingerprints(self):
+        return sorted(TransactionFingerprint.objects.values_list("fingerprint", flat=True))
+
+    def legacy(self, tid, recordid, desc="美团"):
+        return Transaction.objects.create(id=tid, createuser="u", updateuser="u", deleted=0, recordid=recordid, card_id="9",
+                                          transaction_desc=desc, income_money=5, transaction_date=timezone.now().replace(microsecond=0))
+
+    def test_content_hash_normalizes_description(self):
+        when = timezone.now()
+        self.assertEqual(content_hash("1", when, 12.5, "星巴克  咖啡"), content_hash(" 1", when, "12.50", "星巴克 咖啡 "))
+        self.assertNotEqual(content_hash("1", when, 12.5, "星巴克"), content_hash("1", when, 12.51, "星巴克"))
+
+    def test_reimporting_a_file_adds_nothing(self):
+        stats = self.ingest(("a.csv", [COFFEE, METRO]))
+        self.assertEqual(stats["inserted"], 2)
+        stats = self.ingest(("a.csv", [COFFEE, METRO]))
+        self.assertEqual((stats["inserted"], stats["duplicates"]), (0, 2))
+        self.assertEqual(Transaction.objects.count(), 2)
+
+    def test_repeats_within_a_file_are_kept(self):
+        stats = self.ingest(("a.csv", [COFFEE, COFFEE, METRO]))
+        self.assertEqual(stats["inserted"], 3)
+        # an overlapping export holding one more repeat adds only that one
+        stats = self.ingest(("b.csv", [COFFEE, COFFEE, COFFEE, METRO]))
+        self.assertEqual((stats["inserted"], stats["duplicates"]), (1, 3))
+        self.assertEqual(TransactionFingerprint.objects.filter(occurrence=2).count(), 1)
+        self.assertEqual(duplicate_groups()[0][1], 3)
+
+    def test_rebuild_numbers_as_ingest_does(self):
+        self.ingest(("a.csv", [COFFEE, COFFEE, METRO]), ("b.csv", [METRO, COFFEE, COFFEE, COFFEE]))
+        ingested = self.fingerprints()
+        self.assertEqual(backfill_fingerprints(rebuild=True), 4)
+        self.assertEqual(self.fingerprints(), ingested)
+
+    def test_backfill_numbers_repeats_per_statement(self):
+        self.legacy("x1", "s1")
+        self.legacy("x2", "s1")
+        self.legacy("x3", "s2")
+        self.legacy("x4", "s2", desc="滴滴")
+        self.assertEqual(backfill_fingerprints(), 4)
+        self.assertEqual(backfill_fingerprints(), 0)
+        occurrences = dict(TransactionFingerprint.objects.values_list("transaction_id", "occurrence"))
+        # x3 repeats a row of the earlier statement s1: numbered after its rows and reported
+        self.assertEqual(occurrences, {"x1": 0, "x2": 1, "x3": 2, "x4": 0})
+        self.assertEqual([(n, ids) for _, n, ids in duplicate_groups()], [(3, ["x1", "x2", "x3"])])
+
+    def test_failed_rebuild_keeps_the_fingerprints(self):
+        self.ingest(("a.csv", [COFFEE, METRO]))
+        ingested = self.fingerprints()
+        with mock.patch.object(fingerprint, "content_hash", side_effect=RuntimeError("boom")):
+            with self.assertRaises(RuntimeError):
+                backfill_fingerprints(rebuild=True)
+        self.assertEqual(self.fingerprints(), ingested)
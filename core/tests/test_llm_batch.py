@@ -0,0 +1,107 @@
+import asyncio
+import json
+import re
+
+from django.test import SimpleTestCase
+
+from core.services.llm_batch import BatchClassifier, build_batch_prompt, parse_batch_response
+from core.tools.llm_client import LLMError
+
+ALLOWED = frozenset(["A", "B", "OTHER"])
+CATEGORIES = [("A", "餐饮"), ("B", "交通")]
+
+
+class ParseBatchResponseTests(SimpleTestCase):
+
+    def test_array(self):
+        text = '[{"i": 1, "code": "A"}, {"i": 2, "code": "B"}]'
+        self.assertEqual(parse_batch_response(text, 2, ALLOWED), {0: "A", 1: "B"})
+
+    def test_fenced_block_with_prose(self):
+        text = '结果如下：\n```json\n[{"i": 2, "code": "OTHER"}, {"index": "1", "code": " A "}]\n```\n以上。'
+        self.assertEqual(parse_batch_response(text, 2, ALLOWED), {1: "OTHER", 0: "A"})
+
+    def test_object_of_positions(self):
+        self.assertEqual(parse_batch_response('{"1": "B", "2": "A"}', 2, ALLOWED), {0: "B", 1: "A"})
+
+    def test_invalid_answers_are_left_out(self):
+        text = json.dumps([
+            {"i": 1, "code": "Z"},            # unknown code
+            {"i": 3, "code": "A"},            # outside the batch
+            {"i": 0, "code": "A"},            # positions start at 1
+            {"i": "x", "code": "A"},
+            "B",
+            {"i": 2, "code": "B"},
+            {"i": 2, "code": "A"},            # first answer wins
+        ])
+        self.assertEqual(parse_batch_response(text, 2, ALLOWED), {1: "B"})
+
+    def test_no_json(self):
+        with self.assertRaises(ValueError):
+            parse_batch_response("无法判断", 2, ALLOWED)
+        with self.assertRaises(ValueError):
+            parse_batch_response('"A"', 2, ALLOWED)
+
+
+class FakeTool(object):
+    """Answers every item with a code from answer(text); rejects prompts over max_items items."""
+
+    def __init__(self, answer, max_items=None, skip=()):
+        self.answer = answer
+        self.max_items = max_items
+        self.skip = set(skip)
+        self.prompts = []
+
+    def generate(self, prompt):
+        self.prompts.append(prompt)
+        items = re.findall(r"^(\d+): (.*)$", prompt.split("交易（序号: 描述）：\n", 1)[1], re.M)
+        if self.max_items is not None and len(items) > self.max_items:
+            raise LLMError("too long", status=400, body="Range of input length should be [1, 6000]")
+        answers = [{"i": int(i), "code": self.answer(text)} for i, text in items if text not in self.skip]
+        return "```json\n%s\n```" % json.dumps(answers, ensure_ascii=False)
+
+    async def agenerate(self, prompt):
+        return self.generate(prompt)
+
+
+class BatchClassifierTests(SimpleTestCase):
+
+    def answer(self, text):
+        return "B" if "地铁" in text else "A"
+
+    def test_classifies_in_batches(self):
+        texts = ["地铁 %d" % i for i in range(25)] + ["美团 %d" % i for i in range(25)] + ["地铁 0"]
+        tool = FakeTool(self.answer)
+        out = BatchClassifier(tool, CATEGORIES, batch_size=10).classify(texts)
+        self.assertEqual(out, {t: self.answer(t) for t in texts})
+        self.assertEqual(len(tool.prompts), 5)
+
+    def test_missing_answers_are_retried_then_given_up(self):
+        texts = ["地铁", "美团", "滴滴"]
+        tool = FakeTool(self.answer, skip=["美团"])
+        classifier = BatchClassifier(tool, CATEGORIES, batch_size=10)
+        self.assertEqual(classifier.classify(texts), {"地铁": "B", "滴滴": "A"})
+        self.assertEqual(classifier.stats["retried"], 2)
+
+    def test_input_too_long_shrinks_the_batch(self):
+        texts = ["美团 %d" % i for i in range(40)]
+        tool = FakeTool(self.answer, max_items=7)
+        classifier = BatchClassifier(tool, CATEGORIES, batch_size=20)
+        self.assertEqual(len(classifier.classify(texts)), 40)
+        self.assertLessEqual(classifier.max_batch, 7)
+
+    def test_other_errors_stop_the_run(self):
+        class Failing(FakeTool):
+            def generate(self, prompt):
+                raise LLMError("server error", status=500)
+        self.assertEqual(BatchClassifier(Failing(self.answer), CATEGORIES).classify(["地铁"]), {})
+
+    def test_aclassify(self):
+        texts = ["地铁", "美团"]
+        out = asyncio.run(BatchClassifier(FakeTool(self.answer), CATEGORIES).aclassify(texts))
+        self.assertEqual(out, {"地铁": "B", "美团": "A"})
+
+    def test_prompt_lists_codes_and_items(self):
+        prompt = build_batch_prompt(["a\n b", "c"], CATEGORIES)
+        self.assertIn("A: 餐饮", prompt)
+        self.assertIn("1: a b\n2: c", prompt)
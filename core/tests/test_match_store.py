@@ -0,0 +1,94 @@
+import datetime
+import random
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+
+from core.services import match_store
+from core.services.rule_cache import bump_rules_version, invalidate_rule_cache
+from persist.models import ConsumeCategory, ConsumeRule, RuleChange, Transaction, TransactionMatch
+
+WORDS = ["美团", "地铁", "滴滴", "超市", "饭堂", "支付宝", "京东", "星巴克", "便利店"]
+
+
+class MatchStoreSyncTests(TestCase):
+
+    def setUp(self):
+        invalidate_rule_cache()
+        match_store._checked = None
+        rnd = random.Random(0)
+        for code, name in [("A", "餐饮"), ("B", "交通"), ("C", "购物"), ("O", "其他")]:
+            ConsumeCategory.objects.create(id=code, code=code, name=name)
+        for i in range(30):
+            pt = rnd.choice(["contains", "contains", "equals", "startsWith", "endsWith", "regex"])
+            word = rnd.choice(WORDS)
+            if pt == "regex":
+                word = word + ".*" + rnd.choice(WORDS)
+            ConsumeRule.objects.create(id="r%d" % i, categoryId=rnd.choice("ABCO"), pattern=word, patternType=pt,
+                                       priority=rnd.choice([50, 100, 150]), minAmount=rnd.choice([None, None, 20]))
+        now = timezone.now()
+        for i in range(300):
+            Transaction.objects.create(
+                id="t%d" % i, createuser="u", updateuser="u", deleted=0,
+                transaction_desc=rnd.choice(WORDS) + rnd.choice(["", " ", "-"]) + rnd.choice(WORDS + [""]),
+                opponent_name=rnd.choice(WORDS + [""]), income_money=rnd.choice([5, 30, 100]),
+                transaction_date=now - datetime.timedelta(days=rnd.randint(0, 400)),
+            )
+        bump_rules_version()
+        match_store.rebuild_matches()
+
+    def table(self):
+        return sorted(TransactionMatch.objects.values_list("transaction_id", "rule_id", "category_code", "score"))
+
+    def rebuilt(self):
+        match_store.rebuild_matches()
+        return self.table()
+
+    def edit_rule(self, rule_id, **fields):
+        ConsumeRule.objects.filter(id=rule_id).update(**fields)
+        return bump_rules_version([rule_id])
+
+    def test_sync_across_several_versions_equals_rebuild(self):
+        before = self.table()
+        self.edit_rule("r3", pattern="地铁", patternType="contains", priority=500, minAmount=None)
+        self.edit_rule("r5", priority=1)
+        ConsumeRule.objects.create(id="rx", categoryId="C", pattern="京东", patternType="startsWith", priority=400)
+        version = bump_rules_version(["rx"])
+        self.assertTrue(match_store.sync_matches())
+        self.assertEqual(match_store._matches_version(), version)
+        self.assertFalse(RuleChange.objects.exists())
+        synced = self.table()
+        self.assertNotEqual(synced, before)
+        self.assertEqual(synced, self.rebuilt())
+
+    def test_deactivated_rule_is_synced(self):
+        won = TransactionMatch.objects.values_list("rule_id", flat=True).exclude(rule_id=None).first()
+        self.edit_rule(won, active=0)
+        self.assertTrue(match_store.sync_matches())
+        self.assertFalse(TransactionMatch.objects.filter(rule_id=won).exists())
+        self.assertEqual(self.table(), self.rebuilt())
+
+    def test_version_without_record_is_left_to_rebuild(self):
+        bump_rules_version()
+        version = self.edit_rule("r7", priority=999)
+        self.assertFalse(match_store.sync_matches(rule_ids=["r7"]))
+        self.assertNotEqual(match_store._matches_version(), version)
+        with mock.patch.object(match_store, "_rebuild_in_background") as rebuild:
+            self.assertFalse(match_store.ensure_matches())
+        rebuild.assert_called_once()
+
+    def test_ensure_matches_syncs_instead_of_rebuilding(self):
+        version = self.edit_rule("r9", pattern="超市", patternType="contains", priority=997)
+        with mock.patch.object(match_store, "_rebuild_in_background") as rebuild:
+            self.assertTrue(match_store.ensure_matches())
+        rebuild.assert_not_called()
+        self.assertEqual(match_store._matches_version(), version)
+        self.assertEqual(self.table(), self.rebuilt())
+
+    def test_new_transactions_are_matched(self):
+        Transaction.objects.create(id="n1", createuser="u", updateuser="u", deleted=0, transaction_desc="地铁 美团",
+                                   income_money=30, transaction_date=timezone.now())
+        self.assertTrue(match_store.sync_matches(txn_ids=["n1"]))
+        self.assertTrue(TransactionMatch.objects.filter(transaction_id="n1").exists())
+        self.assertEqual(self.table(), self.rebuilt())
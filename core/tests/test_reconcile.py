@@ -0,0 +1,67 @@
+import random
+
+from django.test import SimpleTestCase
+
+from account.Combiner import AlipayReconciler, combineCCBAndAlipay, iterCombineCCBAndAlipay, reconcile
+
+
+def bank(date, money, desc="支付宝"):
+    return [date, date, "1234", money, "CNY", money, desc]
+
+
+def alipay(date, money, name="商品"):
+    return ["id", "order", date + " 12:00:00", date, date, "web", "即时到账", "商家", name, money]
+
+
+class ReconcileTests(SimpleTestCase):
+
+    def test_exact_pairs_are_one_to_one(self):
+        banks = [bank("2024-01-02", "10.00"), bank("2024-01-02", "10.00"), bank("2024-01-02", "10.00")]
+        alipays = [alipay("2024-01-02", "10.00", "a"), alipay("2024-01-02", "10.00", "b")]
+        self.assertEqual(reconcile(banks, alipays), [(0, 0), (1, 1)])
+
+    def test_tolerance_pairs_nearest_unused(self):
+        banks = [bank("2024-01-05", "20.00"), bank("2024-01-02", "20.00"), bank("2024-01-09", "20.00")]
+        alipays = [alipay("2024-01-01", "20.00"), alipay("2024-01-04", "20.00"), alipay("2024-01-20", "20.00")]
+        self.assertEqual(reconcile(banks, alipays), [])
+        self.assertEqual(reconcile(banks, alipays, toleranceDays=2), [(0, 1), (1, 0)])
+
+    def test_exact_pairs_come_before_tolerance(self):
+        banks = [bank("2024-01-02", "5.00"), bank("2024-01-03", "5.00")]
+        alipays = [alipay("2024-01-03", "5.00"), alipay("2024-01-02", "5.00")]
+        self.assertEqual(reconcile(banks, alipays, toleranceDays=1), [(0, 1), (1, 0)])
+
+    def test_amount_digits(self):
+        banks = [bank("2024-01-02", "10.001")]
+        alipays = [alipay("2024-01-02", "10.00")]
+        self.assertEqual(reconcile(banks, alipays), [])
+        self.assertEqual(reconcile(banks, alipays, amountDigits=2), [(0, 0)])
+        self.assertEqual(reconcile([bank("2024-01-02", "abc")], alipays, amountDigits=2), [])
+
+    def test_random_pairs_are_one_to_one_and_within_tolerance(self):
+        rnd = random.Random(1)
+        days = ["2024-01-%02d" % d for d in range(1, 29)]
+        amounts = ["5.00", "12.50", "30.00"]
+        banks = [bank(rnd.choice(days), rnd.choice(amounts)) for _ in range(200)]
+        alipays = [alipay(rnd.choice(days), rnd.choice(amounts)) for _ in range(150)]
+        pairs = reconcile(banks, alipays, toleranceDays=3)
+        self.assertEqual(len({j for _, j in pairs}), len(pairs))
+        self.assertEqual(len({i for i, _ in pairs}), len(pairs))
+        for i, j in pairs:
+            self.assertEqual(banks[i][3], alipays[j][9])
+            self.assertLessEqual(abs(int(banks[i][0][-2:]) - int(alipays[j][2][8:10])), 3)
+
+    def test_reconciler_keeps_pairs_across_files(self):
+        alipays = [alipay("2024-01-02", "10.00", "a")]
+        reconciler = AlipayReconciler(alipays, toleranceDays=1)
+        header = ["交易日"]
+        first = list(iterCombineCCBAndAlipay([header, bank("2024-01-02", "10.00")], reconciler))
+        second = list(iterCombineCCBAndAlipay([header, bank("2024-01-02", "10.00")], reconciler))
+        self.assertEqual(first[1][6], "支付宝@@商家@@a")
+        self.assertEqual(second[1][6], "支付宝")
+
+    def test_combine_merges_descriptions(self):
+        banks = [bank("2024-01-02", "10.00"), bank("2024-01-03", "7.00")]
+        rows = combineCCBAndAlipay(banks, [alipay("2024-01-02", "10.00", "a")])
+        self.assertEqual([r[6] for r in rows], ["支付宝@@商家@@a", "支付宝"])
+        self.assertEqual(combineCCBAndAlipay(banks, []), banks)
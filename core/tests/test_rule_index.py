@@ -0,0 +1,107 @@
+import random
+import re
+
+from django.test import SimpleTestCase, TestCase
+
+from core.services.rule_index import RuleIndex, _norm, load_rule_index
+from persist.models import ConsumeRule
+
+WORDS = ["美团", "地铁", "滴滴", "超市", "星巴克", "京东", "coffee", "Metro"]
+
+
+def baseline_match(rule, text):
+    """ClassifierAgent's per-rule test before the index existed."""
+    pt = rule.patternType or "contains"
+    pat = _norm(rule.pattern or "")
+    if not pat:
+        return False
+    t = _norm(text or "")
+    if pt == "contains":
+        return pat in t
+    if pt == "equals":
+        return pat == t
+    if pt == "startsWith":
+        return t.startswith(pat)
+    if pt == "endsWith":
+        return t.endswith(pat)
+    if pt == "regex":
+        try:
+            return re.search(rule.pattern or "", text or "") is not None
+        except Exception:
+            return False
+    return False
+
+
+def baseline_first(rules, text):
+    for r in rules:
+        if baseline_match(r, text):
+            return r
+    return None
+
+
+def random_rules(rnd, n):
+    rules = []
+    for i in range(n):
+        pt = rnd.choice(["contains", "contains", "equals", "startsWith", "endsWith", "regex"])
+        word = rnd.choice(WORDS)
+        if pt == "regex":
+            word = rnd.choice([word + ".*" + rnd.choice(WORDS), "^" + word, "(", " "])
+        elif rnd.random() < .1:
+            word = rnd.choice([" ", "  " + word.upper() + " "])
+        rules.append(ConsumeRule(id="r%d" % i, categoryId=rnd.choice("ABC"), pattern=word, patternType=pt,
+                                 priority=rnd.choice([50, 100, 150])))
+    rules.sort(key=lambda r: (-r.priority, r.pattern))
+    return rules
+
+
+def random_texts(rnd, n):
+    texts = ["", " ", None]
+    for _ in range(n):
+        texts.append(rnd.choice(WORDS) + rnd.choice(["", " ", "  ", "-"]) + rnd.choice(WORDS + [""]))
+    texts.extend(WORDS)
+    return texts
+
+
+class RuleIndexTextMatchTests(SimpleTestCase):
+
+    def test_first_text_match_equals_baseline(self):
+        rnd = random.Random(7)
+        for _ in range(20):
+            rules = random_rules(rnd, 40)
+            index = RuleIndex(rules)
+            for text in random_texts(rnd, 60):
+                self.assertIs(index.first_text_match(text), baseline_first(rules, text), text)
+
+    def test_first_text_matches_follows_first_text_match(self):
+        rnd = random.Random(3)
+        rules = random_rules(rnd, 30)
+        index = RuleIndex(rules)
+        texts = random_texts(rnd, 40) * 2
+        self.assertEqual(index.first_text_matches(texts), [baseline_first(rules, t) for t in texts])
+
+    def test_for_category_keeps_order(self):
+        rules = random_rules(random.Random(5), 40)
+        index = RuleIndex(rules).for_category("A")
+        self.assertEqual([r.id for r in index.rules], [r.id for r in rules if r.categoryId == "A"])
+
+
+class LoadRuleIndexTests(TestCase):
+
+    def test_equal_priority_follows_pattern_order(self):
+        ConsumeRule.objects.create(id="r1", categoryId="B", pattern="星巴克", priority=100)
+        ConsumeRule.objects.create(id="r2", categoryId="A", pattern="星巴克 咖啡", priority=100)
+        ConsumeRule.objects.create(id="r3", categoryId="C", pattern="咖啡", priority=50)
+        ConsumeRule.objects.create(id="r4", categoryId="C", pattern="星", priority=100, active=0)
+        index = load_rule_index()
+        self.assertEqual([r.id for r in index.rules], ["r1", "r2", "r3"])
+        self.assertEqual(index.first_text_match("星巴克 咖啡").id, "r1")
+
+    def test_matches_baseline_over_stored_rules(self):
+        rnd = random.Random(11)
+        for r in random_rules(rnd, 60):
+            r.save()
+        rules = list(ConsumeRule.objects.filter(active=1).order_by("-priority", "pattern"))
+        index = load_rule_index()
+        for text in random_texts(rnd, 80):
+            expected = baseline_first(rules, text)
+            self.assertEqual(index.first_text_match(text), expected, text)
@@ -0,0 +1,300 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger("finmind")
+
+DASHSCOPE_URL = "https://dashscope.aliyuncs.com/api/v1/services/aigc/text-generation/generation"
+# throttling and transient server errors worth another attempt
+RETRY_STATUS = frozenset([429, 500, 502, 503, 504])
+
+_lock = threading.Lock()
+_client = None
+_async_client = None
+
+
+class LLMError(Exception):
+    def __init__(self, message, status=None, body=""):
+        super().__init__(message)
+        self.status = status
+        self.body = body
+
+
+class LLMSettings(object):
+    """LLM endpoint settings, read from the environment (and .env) once per process."""
+
+    def __init__(self, api_key="", model="qwen-max", url=DASHSCOPE_URL, connect_timeout=5.0, read_timeout=60.0,
+                 max_retries=3, backoff_base=0.5, backoff_max=8.0, pool_size=10, max_concurrency=8):
+        self.api_key = api_key
+        self.model = model
+        self.url = url
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.pool_size = pool_size
+        self.max_concurrency = max_concurrency
+
+    @classmethod
+    def from_env(cls):
+        try:
+            from dotenv import load_dotenv
+            load_dotenv()
+        except Exception:
+            pass
+        env = os.environ.get
+        return cls(
+            api_key=env("DASHSCOPE_API_KEY", "") or env("QWEN_API_KEY", ""),
+            model=env("QWEN_MODEL", "qwen-max"),
+            url=env("QWEN_API_URL", DASHSCOPE_URL),
+            connect_timeout=float(env("QWEN_CONNECT_TIMEOUT", "5")),
+            read_timeout=float(env("QWEN_READ_TIMEOUT", "60")),
+            max_retries=int(env("QWEN_MAX_RETRIES", "3")),
+            backoff_base=float(env("QWEN_BACKOFF_BASE", "0.5")),
+            backoff_max=float(env("QWEN_BACKOFF_MAX", "8")),
+            pool_size=int(env("QWEN_POOL_SIZE", "10")),
+            max_concurrency=int(env("QWEN_MAX_CONCURRENCY", "8")),
+        )
+
+
+def extract_content(d):
+    """Generated text of a DashScope response body (message or text output formats)."""
+    output = (d or {}).get("output") or {}
+    content = None
+    try:
+        content = (output.get("choices") or [{}])[0].get("message", {}).get("content")
+    except Exception:
+        pass
+    if not content:
+        content = output.get("text")
+    if not content:
+        content = output.get("result")
+    if not content:
+        content = (output.get("message") or {}).get("content")
+    return content
+
+
+def iter_sse(lines):
+    """(event, data) of the server-sent events in an iterable of byte/str lines."""
+    event, data = "message", []
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        if not line:
+            if data:
+                yield event, "\n".join(data)
+            event, data = "message", []
+        elif line.startswith(":"):
+            continue
+        else:
+            field, _, value = line.partition(":")
+            value = value[1:] if value.startswith(" ") else value
+            if field == "event":
+                event = value
+            elif field == "data":
+                data.append(value)
+    if data:
+        yield event, "\n".join(data)
+
+
+class LLMClient(object):
+    """
+    DashScope client over one keep-alive session (connection pool of
+    pool_size) with connect/read timeouts. Throttled (429), 5xx and
+    connection-level failures are retried up to max_retries times with
+    full-jitter exponential backoff, honouring a numeric Retry-After.
+    """
+
+    def __init__(self, settings=None, session=None):
+        self.settings = settings or LLMSettings.from_env()
+        self.session = session or self._session()
+
+    def _session(self):
+        s = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.settings.pool_size, max_retries=0)
+        s.mount("https://", adapter)
+        s.mount("http://", adapter)
+        return s
+
+    def _backoff(self, attempt, retry_after=None):
+        cfg = self.settings
+        delay = random.uniform(0, min(cfg.backoff_max, cfg.backoff_base * (2 ** attempt)))
+        try:
+            if retry_after is not None:
+                delay = max(delay, min(cfg.backoff_max, float(retry_after)))
+        except (TypeError, ValueError):
+            pass
+        return delay
+
+    def payload(self, prompt, model=None):
+        return {"model": model or self.settings.model, "input": {"messages": [{"role": "user", "content": prompt}]}}
+
+    def send(self, payload, api_key=None, stream=False):
+        """One POST of payload to the endpoint (no retries); stream=True asks for server-sent events."""
+        cfg = self.settings
+        headers = {"Authorization": f"Bearer {api_key or cfg.api_key}", "Content-Type": "application/json"}
+        if stream:
+            headers.update({"Accept": "text/event-stream", "X-DashScope-SSE": "enable"})
+        return self.session.post(cfg.url, headers=headers, json=payload, timeout=(cfg.connect_timeout, cfg.read_timeout), stream=stream)
+
+    def retry_delay(self, attempt, response=None, error=None):
+        """Seconds to wait before another attempt after this outcome; None when it is final."""
+        if attempt >= self.settings.max_retries:
+            return None
+        if error is not None:
+            delay = self._backoff(attempt)
+            logger.warning("llm_retry attempt=%s err=%s delay=%.2f", attempt + 1, type(error).__name__, delay)
+            return delay
+        if response.status_code not in RETRY_STATUS:
+            return None
+        delay = self._backoff(attempt, response.headers.get("Retry-After"))
+        logger.warning("llm_retry attempt=%s status=%s delay=%.2f", attempt + 1, response.status_code, delay)
+        return delay
+
+    def post(self, payload, api_key=None, stream=False):
+        """POSTs payload to the endpoint; returns the final response (raises LLMError when none came back)."""
+        attempt = 0
+        while True:
+            r, err = None, None
+            try:
+                r = self.send(payload, api_key, stream=stream)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                err = e
+            delay = self.retry_delay(attempt, r, err)
+            if delay is None:
+                if err is not None:
+                    raise LLMError(f"request failed: {err}")
+                return r
+            if r is not None:
+                r.close()
+            time.sleep(delay)
+            attempt += 1
+
+    def content(self, r):
+        """Generated text of a response; raises LLMError on a failed or empty one."""
+        try:
+            content = extract_content(r.json())
+        except ValueError:
+            content = None
+        if r.status_code != 200 or not content:
+            raise LLMError(f"status={r.status_code}", status=r.status_code, body=(r.text or "")[:200])
+        return content
+
+    def generate(self, prompt, model=None, api_key=None):
+        """Text generated for a single-message prompt; raises LLMError on a failed or empty response."""
+        return self.content(self.post(self.payload(prompt, model), api_key=api_key))
+
+    def stream(self, prompt, model=None, api_key=None):
+        """
+        Yields the text generated for a prompt piece by piece as the endpoint
+        produces it (DashScope SSE with incremental output). Only the request
+        is retried; the read timeout bounds every wait between two pieces.
+        Raises LLMError on a failed request or an error event.
+        """
+        payload = self.payload(prompt, model)
+        payload["parameters"] = {"incremental_output": True, "result_format": "message"}
+        r = self.post(payload, api_key=api_key, stream=True)
+        with closing(r):
+            if r.status_code != 200:
+                raise LLMError(f"status={r.status_code}", status=r.status_code, body=(r.text or "")[:200])
+            try:
+                for event, data in iter_sse(r.iter_lines(chunk_size=None)):
+                    try:
+                        d = json.loads(data)
+                    except ValueError:
+                        continue
+                    if event == "error" or d.get("code"):
+                        raise LLMError(f"stream error code={d.get('code')}", status=r.status_code, body=str(d.get("message") or "")[:200])
+                    piece = extract_content(d)
+                    if piece:
+                        yield piece
+            except (requests.ConnectionError, requests.Timeout) as e:
+                raise LLMError(f"stream interrupted: {e}")
+
+
+class AsyncLLMClient(object):
+    """
+    asyncio front of an LLMClient for async views. Each HTTP attempt runs
+    on the pooled session in a dedicated executor of max_concurrency
+    threads, so slow upstream calls never occupy the threads that serve
+    synchronous views, and holds one of max_concurrency slots of a
+    threading.BoundedSemaphore. The bound is therefore per process, whichever
+    event loop awaits the call (one per async view under WSGI, one for the
+    process under ASGI). Waiting callers queue on the executor without
+    holding a thread, and backoff between retries is awaited without a
+    slot. A call may go through another LLMClient (client=...) and still
+    counts against the same bound.
+    """
+
+    def __init__(self, client=None, max_concurrency=None):
+        self.client = client or get_llm_client()
+        self.max_concurrency = max(1, max_concurrency or self.client.settings.max_concurrency)
+        self.executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="llm")
+        self.slots = threading.BoundedSemaphore(self.max_concurrency)
+
+    def send(self, client, payload, api_key=None):
+        with self.slots:
+            return client.send(payload, api_key)
+
+    async def post(self, payload, api_key=None, client=None):
+        client = client or self.client
+        loop = asyncio.get_running_loop()
+        attempt = 0
+        while True:
+            r, err = None, None
+            try:
+                r = await loop.run_in_executor(self.executor, self.send, client, payload, api_key)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                err = e
+            delay = client.retry_delay(attempt, r, err)
+            if delay is None:
+                if err is not None:
+                    raise LLMError(f"request failed: {err}")
+                return r
+            if r is not None:
+                r.close()
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def generate(self, prompt, model=None, api_key=None, client=None):
+        client = client or self.client
+        return client.content(await self.post(client.payload(prompt, model), api_key=api_key, client=client))
+
+
+def get_llm_client():
+    """Process-wide LLMClient, created with the settings of the first call."""
+    global _client
+    with _lock:
+        if _client is None:
+            _client = LLMClient()
+        return _client
+
+
+def get_async_llm_client():
+    """Process-wide AsyncLLMClient over the process-wide LLMClient."""
+    global _async_client
+    client = get_llm_client()
+    with _lock:
+        if _async_client is None or _async_client.client is not client:
+            _async_client = AsyncLLMClient(client)
+        return _async_client
+
+
+def reset_llm_client(client=None):
+    """Replaces the process-wide client (e.g. after changing settings, or with a stub in tests)."""
+    global _client, _async_client
+    with _lock:
+        old, _client = _client, client
+        _async_client = None
+    if old is not None and old is not client:
+        old.session.close()
@@ -1,3 +1,18 @@
+from core.tools.llm_client import LLMError
+
+
 class LocalQwenTool:
     def call(self, prompt):
         return "OTHER"
+
+    async def acall(self, prompt):
+        return "OTHER"
+
+    def generate(self, prompt):
+        raise LLMError("local model not available")
+
+    async def agenerate(self, prompt):
+        raise LLMError("local model not available")
+
+    def stream(self, prompt):
+        yield "OTHER"
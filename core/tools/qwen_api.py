@@ -1,55 +1,128 @@
-import os
-import json
-import requests
-from dotenv import load_dotenv
+from asgiref.sync import sync_to_async
+
+from core.tools.llm_client import LLMError, get_async_llm_client, get_llm_client
+
 
 class QwenAPITool:
-    def __init__(self, api_key=None, model=None):
+    """
+    Qwen over the process-wide LLMClient (pooled session, timeouts, retries);
+    cheap to construct. With a cache (get/set by model and prompt) successful
+    answers are stored and repeats served from it; refresh=True skips the
+    lookup but still stores the new answer. generate/agenerate skip the
+    cache and raise LLMError instead of answering "OTHER", for callers that
+    act on the failure.
+    """
+
+    def __init__(self, api_key=None, model=None, client=None, cache=None, refresh=False):
+        self.client = client or get_llm_client()
+        self.api_key = api_key or self.client.settings.api_key
+        self.model = model or self.client.settings.model
+        self.cache = cache
+        self.refresh = refresh
+
+    def cached(self, prompt):
+        """Cached answer to prompt, None when there is none (or refresh is set)."""
+        if self.cache is None or self.refresh:
+            return None
+        return self.cache.get(self.model, prompt)
+
+    def cached_many(self, prompts):
+        """{prompt: cached answer} of the prompts answered before."""
+        if self.cache is None or self.refresh:
+            return {}
+        return self.cache.get_many(self.model, prompts)
+
+    def remember(self, prompt, content):
+        if self.cache is not None:
+            self.cache.set(self.model, prompt, content)
+
+    def remember_many(self, answers):
+        if self.cache is not None:
+            self.cache.set_many(self.model, answers)
+
+    async def _agenerate(self, prompt):
+        # the process-wide AsyncLLMClient bounds the calls of every tool, also with a custom client
+        return await get_async_llm_client().generate(prompt, model=self.model, api_key=self.api_key, client=self.client)
+
+    def _skip(self):
+        try:
+            print("[FinMind][LLM] skip: no api key")
+        except Exception:
+            pass
+        return "OTHER"
+
+    def _failed(self, e):
+        try:
+            print(f"[FinMind][LLM] error status={e.status} err={e}")
+            print(f"[FinMind][LLM] body={str(e.body)[:200]}")
+        except Exception:
+            pass
+        return "OTHER"
+
+    def _answered(self, prompt, content):
         try:
-            load_dotenv()
+            print(f"[FinMind][LLM] model={self.model}")
+            print(f"[FinMind][LLM] prompt={str(prompt)[:200]}")
+            print(f"[FinMind][LLM] response={str(content)[:200]}")
         except Exception:
             pass
-        self.api_key = api_key or os.environ.get("DASHSCOPE_API_KEY", "") or os.environ.get("QWEN_API_KEY", "")
-        self.model = model or os.environ.get("QWEN_MODEL", "qwen-max")
+        return content
+
     def call(self, prompt):
         if not self.api_key:
-            try:
-                print("[FinMind][LLM] skip: no api key")
-            except Exception:
-                pass
-            return "OTHER"
-        url = "https://dashscope.aliyuncs.com/api/v1/services/aigc/text-generation/generation"
-        headers = {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
-        data = {"model": self.model, "input": {"messages": [{"role": "user", "content": prompt}]}}
-        r = requests.post(url, headers=headers, json=data)
+            return self._skip()
+        content = self.cached(prompt)
+        if content is not None:
+            return content
         try:
-            d = r.json()
-            content = None
-            try:
-                content = d.get("output", {}).get("choices", [{}])[0].get("message", {}).get("content")
-            except Exception:
-                pass
-            if not content:
-                content = d.get("output", {}).get("text")
-            if not content:
-                content = d.get("output", {}).get("result")
-            if not content:
-                content = d.get("output", {}).get("message", {}).get("content")
-            if not content:
-                raise ValueError("empty content")
-            try:
-                print(f"[FinMind][LLM] status={r.status_code} model={self.model}")
-                print(f"[FinMind][LLM] prompt={str(prompt)[:200]}")
-                print(f"[FinMind][LLM] response={str(content)[:200]}")
-            except Exception:
-                pass
+            content = self.client.generate(prompt, model=self.model, api_key=self.api_key)
+        except LLMError as e:
+            return self._failed(e)
+        self.remember(prompt, content)
+        return self._answered(prompt, content)
+
+    async def acall(self, prompt):
+        """call() for async views, through the process-wide AsyncLLMClient."""
+        if not self.api_key:
+            return self._skip()
+        use_cache = self.cache is not None
+        content = await sync_to_async(self.cached)(prompt) if use_cache else None
+        if content is not None:
             return content
-        except Exception:
-            try:
-                sc = getattr(r, "status_code", None)
-                body = r.text if hasattr(r, "text") else ""
-                print(f"[FinMind][LLM] error status={sc}")
-                print(f"[FinMind][LLM] body={str(body)[:200]}")
-            except Exception:
-                pass
-            return "OTHER"
+        try:
+            content = await self._agenerate(prompt)
+        except LLMError as e:
+            return self._failed(e)
+        if use_cache:
+            await sync_to_async(self.remember)(prompt, content)
+        return self._answered(prompt, content)
+
+    def generate(self, prompt):
+        """Uncached answer to prompt; raises LLMError on any failure."""
+        if not self.api_key:
+            raise LLMError("no api key")
+        return self.client.generate(prompt, model=self.model, api_key=self.api_key)
+
+    async def agenerate(self, prompt):
+        if not self.api_key:
+            raise LLMError("no api key")
+        return await self._agenerate(prompt)
+
+    def stream(self, prompt):
+        """
+        Yields the answer to prompt piece by piece (not cached). Without an
+        api key yields "OTHER" like call(); raises LLMError when the model
+        fails, also after some pieces have been yielded.
+        """
+        if not self.api_key:
+            yield self._skip()
+            return
+        pieces = []
+        try:
+            for piece in self.client.stream(prompt, model=self.model, api_key=self.api_key):
+                pieces.append(piece)
+                yield piece
+        except LLMError as e:
+            self._failed(e)
+            raise
+        self._answered(prompt, "".join(pieces))
@@ -1,9 +1,11 @@
 from django.urls import path
-from .views import classify, chat
+from .views import classify, classify_batch, chat, chat_stream
 
 app_name = "core"
 
 urlpatterns = [
     path("classify", classify),
+    path("classify/batch", classify_batch),
     path("chat", chat),
+    path("chat/stream", chat_stream),
 ]
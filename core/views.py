@@ -1,39 +1,127 @@
+import functools
 import json
-from django.http import JsonResponse, HttpResponseBadRequest
+import logging
+from django.http import JsonResponse, HttpResponseBadRequest, HttpResponseNotAllowed, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
-from core.services.classification_service import classify_text
-from core.services.analysis_service import analyze_query
+from core.services.classification_service import aclassify_text, aclassify_many
+from core.services.analysis_service import aanalyze_query, stream_query
+
+logger = logging.getLogger("finmind")
 
 def _parse_json(request):
+    """The JSON object in the request body; None when the body is missing, malformed or not an object."""
     if not request.body:
         return None
     try:
-        return json.loads(request.body.decode("utf-8"))
+        payload = json.loads(request.body.decode("utf-8"))
     except Exception:
         return None
+    return payload if isinstance(payload, dict) else None
 
 
-@csrf_exempt
-@require_POST
-def classify(request):
+def _async_post(view):
+    """csrf_exempt + require_POST for async views (the Django 3.2 decorators only wrap sync ones)."""
+    @functools.wraps(view)
+    async def wrapped(request, *args, **kwargs):
+        if request.method != "POST":
+            return HttpResponseNotAllowed(["POST"])
+        return await view(request, *args, **kwargs)
+    wrapped.csrf_exempt = True
+    return wrapped
+
+
+@_async_post
+async def classify(request):
     payload = _parse_json(request)
     if payload is None:
         return HttpResponseBadRequest("invalid json")
     description = payload.get("description")
     if description is None:
         return HttpResponseBadRequest("missing description")
-    category = classify_text(description)
+    if not isinstance(description, str):
+        return HttpResponseBadRequest("invalid description")
+    category = await aclassify_text(description, refresh=bool(payload.get("refresh")))
     return JsonResponse({"category": category})
 
+# items per classify_batch request; unresolved ones cost LLM calls
+MAX_BATCH_ITEMS = 1000
+
+@_async_post
+async def classify_batch(request):
+    payload = _parse_json(request)
+    if payload is None:
+        return HttpResponseBadRequest("invalid json")
+    items = payload.get("items")
+    if not isinstance(items, list):
+        return HttpResponseBadRequest("invalid items")
+    if len(items) > MAX_BATCH_ITEMS:
+        return HttpResponseBadRequest("too many items")
+    descriptions = []
+    for i, item in enumerate(items):
+        description = item.get("description") if isinstance(item, dict) else None
+        if description is None:
+            return HttpResponseBadRequest(f"missing description in item {i}")
+        if not isinstance(description, str):
+            return HttpResponseBadRequest(f"invalid description in item {i}")
+        descriptions.append(description)
+    categories = await aclassify_many(descriptions, refresh=bool(payload.get("refresh")))
+    return JsonResponse({"categories": categories})
+
+@_async_post
+async def chat(request):
+    payload = _parse_json(request)
+    if payload is None:
+        return HttpResponseBadRequest("invalid json")
+    query = payload.get("query")
+    if query is None:
+        return HttpResponseBadRequest("missing query")
+    if not isinstance(query, str):
+        return HttpResponseBadRequest("invalid query")
+    response = await aanalyze_query(query)
+    return JsonResponse({"response": response})
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def _ndjson(event, data):
+    return json.dumps(dict(data, event=event), ensure_ascii=False) + "\n"
+
+def _relay(pieces, encode):
+    """Encodes every answer piece as a delta event as soon as it arrives, then done (or error)."""
+    answer = []
+    try:
+        for piece in pieces:
+            answer.append(piece)
+            yield encode("delta", {"delta": piece})
+    except Exception as e:
+        logger.warning("chat_stream_failed err=%s", e)
+        yield encode("error", {"error": str(e)[:200], "response": "".join(answer)})
+        return
+    yield encode("done", {"response": "".join(answer)})
+
 @csrf_exempt
 @require_POST
-def chat(request):
+def chat_stream(request):
+    """
+    chat answered incrementally: server-sent events (delta/done/error) by
+    default, one JSON object per line with format=ndjson. Django 3.2 only
+    relays synchronous streaming bodies, so this view stays a sync one;
+    under ASGI finmind_site.asgi pulls the body on worker threads so the
+    event loop never waits on the model.
+    """
     payload = _parse_json(request)
     if payload is None:
         return HttpResponseBadRequest("invalid json")
     query = payload.get("query")
     if query is None:
         return HttpResponseBadRequest("missing query")
-    response = analyze_query(query)
-    return JsonResponse({"response": response})
+    if not isinstance(query, str):
+        return HttpResponseBadRequest("invalid query")
+    ndjson = (payload.get("format") or request.GET.get("format")) == "ndjson"
+    encode, content_type = (_ndjson, "application/x-ndjson") if ndjson else (_sse, "text/event-stream")
+    response = StreamingHttpResponse(_relay(stream_query(query), encode), content_type=content_type)
+    response["Cache-Control"] = "no-cache"
+    # keep reverse proxies from buffering the stream
+    response["X-Accel-Buffering"] = "no"
+    return response
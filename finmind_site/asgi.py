@@ -1,6 +1,52 @@
+import asyncio
 import os
-from django.core.asgi import get_asgi_application
+from concurrent.futures import ThreadPoolExecutor
+
+import django
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIHandler
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "finmind_site.settings")
-application = get_asgi_application()
 
+_END = object()
+# threads reading streaming bodies (e.g. /api/agents/chat/stream) for the event loop
+_stream_executor = ThreadPoolExecutor(max_workers=int(os.environ.get("ASGI_STREAM_THREADS", "32")), thread_name_prefix="stream")
+
+
+class StreamingASGIHandler(ASGIHandler):
+    """
+    Django 3.2 sends a streaming body with a plain for loop on the event
+    loop, so a body that waits on a socket (a relayed LLM stream) would
+    freeze every other request. Here each part is pulled on a worker thread
+    and awaited; other responses are sent as usual.
+    """
+
+    async def send_response(self, response, send):
+        if not response.streaming:
+            return await super().send_response(response, send)
+        headers = []
+        for header, value in response.items():
+            if isinstance(header, str):
+                header = header.encode("ascii")
+            if isinstance(value, str):
+                value = value.encode("latin1")
+            headers.append((bytes(header), bytes(value)))
+        for c in response.cookies.values():
+            headers.append((b"Set-Cookie", c.output(header="").encode("ascii").strip()))
+        await send({"type": "http.response.start", "status": response.status_code, "headers": headers})
+        loop = asyncio.get_running_loop()
+        parts = iter(response)
+        try:
+            while True:
+                part = await loop.run_in_executor(_stream_executor, next, parts, _END)
+                if part is _END:
+                    break
+                for chunk, _ in self.chunk_bytes(part):
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            await send({"type": "http.response.body"})
+        finally:
+            await sync_to_async(response.close, thread_sensitive=True)()
+
+
+django.setup(set_prefix=False)
+application = StreamingASGIHandler()
@@ -88,6 +88,7 @@ STATICFILES_DIRS = [
     str(BASE_DIR / "system" / "static"),
 ]
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+TEST_RUNNER = "finmind_site.test_runner.UnmanagedModelTestRunner"
 
 LOGGING = {
     "version": 1,
@@ -0,0 +1,23 @@
+from django.apps import apps
+from django.db import connections
+from django.test.runner import DiscoverRunner
+
+
+class UnmanagedModelTestRunner(DiscoverRunner):
+    """
+    DiscoverRunner that also creates the tables of the unmanaged models
+    (transaction, consume_rule, ...), which FinSight owns and migrations
+    therefore leave out of the test database.
+    """
+
+    def setup_databases(self, **kwargs):
+        old_config = super().setup_databases(**kwargs)
+        models = [m for m in apps.get_models() if not m._meta.managed]
+        for alias in connections:
+            connection = connections[alias]
+            existing = set(connection.introspection.table_names())
+            with connection.schema_editor() as editor:
+                for model in models:
+                    if model._meta.db_table not in existing:
+                        editor.create_model(model)
+        return old_config
@@ -0,0 +1,22 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('persist', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RuleVersion',
+            fields=[
+                ('id', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('version', models.BigIntegerField(default=0)),
+                ('updateTime', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'consume_rule_version',
+            },
+        ),
+    ]
@@ -0,0 +1,147 @@
+# Generated by Django 3.2.25 on 2026-10-18 18:03
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('persist', '0002_ruleversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AppUser',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('username', models.CharField(max_length=64)),
+                ('password', models.CharField(max_length=128)),
+                ('display_name', models.CharField(blank=True, max_length=128, null=True)),
+                ('enabled', models.IntegerField(default=1)),
+                ('version', models.IntegerField(default=0)),
+                ('createUser', models.CharField(blank=True, max_length=64, null=True)),
+                ('createTime', models.DateTimeField(blank=True, null=True)),
+                ('updateUser', models.CharField(blank=True, max_length=64, null=True)),
+                ('updateTime', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'app_user',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='ConsumeCategory',
+            fields=[
+                ('id', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('parentId', models.CharField(blank=True, max_length=64, null=True)),
+                ('code', models.CharField(blank=True, max_length=64, null=True)),
+                ('name', models.CharField(max_length=128)),
+                ('level', models.IntegerField(default=0)),
+                ('txn_types', models.CharField(default='expense', max_length=256)),
+                ('sortNo', models.IntegerField(default=0)),
+                ('deleted', models.IntegerField(default=0)),
+                ('version', models.IntegerField(default=0)),
+                ('createUser', models.CharField(blank=True, max_length=64, null=True)),
+                ('createTime', models.DateTimeField(blank=True, null=True)),
+                ('updateUser', models.CharField(blank=True, max_length=64, null=True)),
+                ('updateTime', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'consume_category',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='ConsumeRule',
+            fields=[
+                ('id', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('categoryId', models.CharField(max_length=64)),
+                ('pattern', models.CharField(max_length=256)),
+                ('patternType', models.CharField(default='contains', max_length=32)),
+                ('priority', models.IntegerField(default=100)),
+                ('active', models.IntegerField(default=1)),
+                ('bankCode', models.CharField(blank=True, max_length=32, null=True)),
+                ('cardTypeCode', models.CharField(blank=True, max_length=32, null=True)),
+                ('remark', models.CharField(blank=True, max_length=256, null=True)),
+                ('version', models.IntegerField(default=0)),
+                ('createUser', models.CharField(blank=True, max_length=64, null=True)),
+                ('createTime', models.DateTimeField(blank=True, null=True)),
+                ('updateUser', models.CharField(blank=True, max_length=64, null=True)),
+                ('updateTime', models.DateTimeField(blank=True, null=True)),
+                ('minAmount', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('maxAmount', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('startDate', models.DateField(blank=True, null=True)),
+                ('endDate', models.DateField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'consume_rule',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='ConsumeRuleTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rule_id', models.CharField(max_length=64)),
+                ('tag', models.CharField(max_length=255)),
+            ],
+            options={
+                'db_table': 'consume_rule_tag',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='Transaction',
+            fields=[
+                ('id', models.CharField(db_column='ID', max_length=255, primary_key=True, serialize=False)),
+                ('version', models.DecimalField(db_column='VERSION', decimal_places=0, default=0, max_digits=8)),
+                ('createuser', models.CharField(db_column='CREATEUSER', max_length=255)),
+                ('createtime', models.DateTimeField(auto_now_add=True, db_column='CREATETIME')),
+                ('updateuser', models.CharField(db_column='UPDATEUSER', max_length=255)),
+                ('updatetime', models.DateTimeField(auto_now=True, db_column='UPDATETIME')),
+                ('card_id', models.CharField(blank=True, db_column='CARD_ID', max_length=255, null=True)),
+                ('transaction_date', models.DateTimeField(blank=True, db_column='TRANSACTION_DATE', null=True)),
+                ('bookkeeping_date', models.DateTimeField(blank=True, db_column='BOOKKEEPING_DATE', null=True)),
+                ('transaction_desc', models.TextField(blank=True, db_column='TRANSACTION_DESC', null=True)),
+                ('balance_currency', models.CharField(blank=True, db_column='BALANCE_CURRENCY', max_length=20, null=True)),
+                ('balance_money', models.DecimalField(blank=True, db_column='BALANCE_MONEY', decimal_places=2, max_digits=10, null=True)),
+                ('card_type_id', models.DecimalField(blank=True, db_column='CARD_TYPE_ID', decimal_places=0, max_digits=3, null=True)),
+                ('card_type_name', models.CharField(blank=True, db_column='CARD_TYPE_NAME', max_length=255, null=True)),
+                ('bank_card_id', models.CharField(blank=True, max_length=64, null=True)),
+                ('bank_card_name', models.CharField(blank=True, max_length=128, null=True)),
+                ('deleted', models.DecimalField(blank=True, db_column='DELETED', decimal_places=0, max_digits=1, null=True)),
+                ('consumption_type', models.DecimalField(blank=True, db_column='CONSUMPTION_TYPE', decimal_places=0, max_digits=2, null=True)),
+                ('consume_id', models.CharField(blank=True, db_column='CONSUME_ID', max_length=255, null=True)),
+                ('consume_code', models.CharField(blank=True, max_length=64, null=True)),
+                ('consume_name', models.CharField(blank=True, db_column='CONSUME_NAME', max_length=255, null=True)),
+                ('demoarea', models.TextField(blank=True, db_column='DEMOAREA', null=True)),
+                ('recordid', models.CharField(blank=True, db_column='RECORDID', max_length=255, null=True)),
+                ('payment_type_id', models.CharField(blank=True, db_column='PAYMENT_TYPE_ID', max_length=20, null=True)),
+                ('income_money', models.DecimalField(db_column='income_money', decimal_places=2, default=0, max_digits=10)),
+                ('opponent_account', models.CharField(db_column='opponent_account', default='', max_length=64)),
+                ('opponent_name', models.CharField(db_column='opponent_name', default='', max_length=128)),
+                ('transaction_time', models.CharField(db_column='transaction_time', default='', max_length=32)),
+                ('account_balance', models.DecimalField(db_column='account_balance', decimal_places=2, default=0, max_digits=10)),
+            ],
+            options={
+                'db_table': 'transaction',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='TransactionMatch',
+            fields=[
+                ('transaction', models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='match', serialize=False, to='persist.transaction')),
+                ('rule_id', models.CharField(blank=True, db_index=True, max_length=64, null=True)),
+                ('category_code', models.CharField(blank=True, db_index=True, max_length=64, null=True)),
+                ('score', models.IntegerField(blank=True, null=True)),
+                ('rules_version', models.BigIntegerField(default=0)),
+                ('txn_updatetime', models.DateTimeField(blank=True, null=True)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'transaction_match',
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.2.25 on 2026-10-18 18:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('persist', '0003_transactionmatch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transactionmatch',
+            name='desc_key',
+            field=models.CharField(blank=True, db_index=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='transactionmatch',
+            name='search_text',
+            field=models.TextField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-18 18:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('persist', '0004_transactionmatch_search_text'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='transactionmatch',
+            name='computed_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 3.2.25 on 2026-10-18 18:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('persist', '0005_transactionmatch_computed_at_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransactionFingerprint',
+            fields=[
+                ('transaction', models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='fingerprint', serialize=False, to='persist.transaction')),
+                ('fingerprint', models.CharField(max_length=64, unique=True)),
+                ('content_hash', models.CharField(db_index=True, max_length=40)),
+                ('occurrence', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'transaction_fingerprint',
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 3.2.25 on 2026-10-18 19:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('persist', '0007_llmresponse'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RuleChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField(db_index=True)),
+                ('rule_id', models.CharField(max_length=64)),
+            ],
+            options={
+                'db_table': 'consume_rule_change',
+            },
+        ),
+    ]
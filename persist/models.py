@@ -96,6 +96,22 @@ class ConsumeRuleTag(models.Model):
         db_table = "consume_rule_tag"
         managed = False
 
+class RuleVersion(models.Model):
+    id = models.CharField(primary_key=True, max_length=64)
+    version = models.BigIntegerField(default=0)
+    updateTime = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "consume_rule_version"
+
+class RuleChange(models.Model):
+    # rules version a rule edit bumped consume_rule_version to, and the rule it touched
+    version = models.BigIntegerField(db_index=True)
+    rule_id = models.CharField(max_length=64)
+
+    class Meta:
+        db_table = "consume_rule_change"
+
 class Transaction(models.Model):
     id = models.CharField(primary_key=True, max_length=255, db_column='ID')
     version = models.DecimalField(max_digits=8, decimal_places=0, default=0, db_column='VERSION')
@@ -130,3 +146,42 @@ class Transaction(models.Model):
     class Meta:
         db_table = 'transaction'
         managed = False
+
+class TransactionMatch(models.Model):
+    transaction = models.OneToOneField(Transaction, primary_key=True, on_delete=models.DO_NOTHING, db_constraint=False, related_name="match")
+    rule_id = models.CharField(max_length=64, null=True, blank=True, db_index=True)
+    category_code = models.CharField(max_length=64, null=True, blank=True, db_index=True)
+    score = models.IntegerField(null=True, blank=True)
+    rules_version = models.BigIntegerField(default=0)
+    txn_updatetime = models.DateTimeField(null=True, blank=True)
+    computed_at = models.DateTimeField(auto_now=True, db_index=True)
+    search_text = models.TextField(null=True, blank=True)
+    desc_key = models.CharField(max_length=255, null=True, blank=True, db_index=True)
+
+    class Meta:
+        db_table = "transaction_match"
+
+class TransactionFingerprint(models.Model):
+    transaction = models.OneToOneField(Transaction, primary_key=True, on_delete=models.DO_NOTHING, db_constraint=False, related_name="fingerprint")
+    # content_hash of card, timestamp, amount and normalized description,
+    # numbered among identical rows of the same statement ("<hash>#<n>")
+    fingerprint = models.CharField(max_length=64, unique=True)
+    content_hash = models.CharField(max_length=40, db_index=True)
+    occurrence = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "transaction_fingerprint"
+
+class LLMResponse(models.Model):
+    # sha1 of model and normalized prompt
+    key = models.CharField(primary_key=True, max_length=40)
+    model = models.CharField(max_length=64)
+    prompt = models.TextField()
+    response = models.TextField()
+    hits = models.IntegerField(default=0)
+    created_at = models.DateTimeField(db_index=True)
+    last_used_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        db_table = "llm_response_cache"
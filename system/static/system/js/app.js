@@ -1218,23 +1218,63 @@
         this.chatError = '';
         
         try {
-          const r = await fetch('/api/agents/chat', {
+          const r = await fetch('/api/agents/chat/stream', {
             method: 'POST',
             headers: {'Content-Type':'application/json'},
-            body: JSON.stringify({ query: text })
+            body: JSON.stringify({ query: text, format: 'ndjson' })
           });
           try { console.log('[FinMind] chat resp status:', r.status); } catch(e){}
           this.chatRespStatus = r.status;
-          if (r.ok) {
-            const d = await r.json();
-            const msg = d.response || 'No response.';
-            if (msg === 'OTHER' || /^Error/i.test(msg)) {
-              this.chatMessages.push({ role: 'assistant', content: 'AI服务不可用或密钥无效，请检查 QWEN_API_KEY。' });
+          if (r.ok && r.body) {
+            // one JSON event per line: delta pieces, then done or error
+            let idx = -1;
+            const reader = r.body.getReader();
+            const decoder = new TextDecoder();
+            let buf = '';
+            let final = null;
+            let failed = '';
+            const handle = (line) => {
+              if (!line.trim()) return;
+              let ev = null;
+              try { ev = JSON.parse(line); } catch(e) { return; }
+              if (ev.event === 'delta') {
+                if (idx < 0) {
+                  this.chatMessages.push({ role: 'assistant', content: '' });
+                  idx = this.chatMessages.length - 1;
+                }
+                this.chatMessages[idx].content += ev.delta || '';
+                this.chatStatus = 'receiving';
+                this.$nextTick(() => {
+                  const box = document.querySelector('.chat-box');
+                  if (box) box.scrollTop = box.scrollHeight;
+                });
+              } else if (ev.event === 'done') {
+                final = ev.response || '';
+              } else if (ev.event === 'error') {
+                failed = ev.error || 'stream error';
+              }
+            };
+            while (true) {
+              const { value, done } = await reader.read();
+              if (done) break;
+              buf += decoder.decode(value, { stream: true });
+              const lines = buf.split('\n');
+              buf = lines.pop();
+              lines.forEach(handle);
+            }
+            handle(buf);
+            if (idx < 0) {
+              this.chatMessages.push({ role: 'assistant', content: '' });
+              idx = this.chatMessages.length - 1;
+            }
+            const msg = final !== null ? final : this.chatMessages[idx].content;
+            if (failed || !msg || msg === 'OTHER' || /^Error/i.test(msg)) {
+              this.chatMessages[idx].content = 'AI服务不可用或密钥无效，请检查 QWEN_API_KEY。';
               this.chatStatus = 'error';
-              this.chatError = 'LLM unavailable';
-              try { console.warn('[FinMind] chat LLM unavailable, response=', msg); } catch(e){}
+              this.chatError = failed || 'LLM unavailable';
+              try { console.warn('[FinMind] chat LLM unavailable, response=', msg, failed); } catch(e){}
             } else {
-              this.chatMessages.push({ role: 'assistant', content: msg });
+              this.chatMessages[idx].content = msg;
               this.chatStatus = 'received';
               this.chatTimestamp = new Date().toLocaleTimeString();
             }
@@ -1,17 +1,18 @@
 from django.urls import path
 from .views import (
-    classify_transaction, insights,
+    classify_transaction, classify_batch, insights,
     rule_categories, rule_list, rule_save, rule_delete, rule_counts,
     dashboard_coverage, dashboard_unmatched_tops, dashboard_unmatched_dimensions, dashboard_model_metrics,
     dashboard_lifestyle,
     rule_recommend, rule_unmatched_details,
-    rule_batch_assign
+    rule_batch_assign, rule_preview
 )
 
 app_name = "system"
 
 urlpatterns = [
     path("classify", classify_transaction),
+    path("classify/batch", classify_batch),
     path("insights", insights),
     path("rule/categories", rule_categories),
     path("rule/list", rule_list),
@@ -21,6 +22,7 @@ urlpatterns = [
     path("rule/recommend", rule_recommend),
     path("rule/unmatched-details", rule_unmatched_details),
     path("rule/batch-assign", rule_batch_assign),
+    path("rule/preview", rule_preview),
     path("dashboard/coverage", dashboard_coverage),
     path("dashboard/unmatched-tops", dashboard_unmatched_tops),
     path("dashboard/unmatched-dimensions", dashboard_unmatched_dimensions),
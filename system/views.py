@@ -15,10 +15,21 @@ from django.contrib.auth import logout
 from django.contrib.auth.hashers import check_password
 from account.analyzer.ConsumptionAnalyzer import ConsumptionAnalyzer
 from account.analyzer.LifestyleAnalyzer import LifestyleAnalyzer
+from core.services.rule_cache import get_rule_index, bump_rules_version, other_category_codes
+from core.services.match_store import (
+    DESC_KEY_LEN, STORED_FIELDS, TEXT_FIELDS, desc_key_of, ensure_matches, match_many, match_stored, match_transaction, sync_matches
+)
+from core.services.ngram_index import search_ngram_index
+from core.services.rule_index import RuleIndex
 
 
 logger = logging.getLogger("finmind.auth")
 
+# Stateless wrappers over the shared, read-only dictionaries; safe to use
+# from every request thread.
+_consumption_analyzer = ConsumptionAnalyzer()
+_business_analyzer = BusinessAnalyzer()
+
 
 def _parse_json(request, allow_empty=False):
     if not request.body:
@@ -102,10 +113,39 @@ def classify_transaction(request):
     money = payload.get("money")
     if description is None or money is None:
         return HttpResponseBadRequest("missing fields")
-    analyzer = ConsumptionAnalyzer()
-    ct = analyzer.getConsumptionType(description, money)
+    ct = _consumption_analyzer.getConsumptionType(description, money)
     return JsonResponse({"consumption": ct})
 
+# upper bound on items per batch request
+MAX_BATCH_ITEMS = 50000
+
+@csrf_exempt
+@require_POST
+def classify_batch(request):
+    payload = _parse_json(request)
+    if payload is None:
+        return HttpResponseBadRequest("invalid json")
+    items = payload.get("items")
+    if not isinstance(items, list):
+        return HttpResponseBadRequest("invalid items")
+    if len(items) > MAX_BATCH_ITEMS:
+        return HttpResponseBadRequest("too many items")
+    pairs = []
+    for i, item in enumerate(items):
+        if not isinstance(item, dict):
+            return HttpResponseBadRequest(f"invalid item {i}")
+        description = item.get("description")
+        money = item.get("money")
+        if description is None or money is None:
+            return HttpResponseBadRequest(f"missing fields in item {i}")
+        try:
+            float(money)
+        except (TypeError, ValueError):
+            return HttpResponseBadRequest(f"invalid money in item {i}")
+        pairs.append((description, money))
+    results = _consumption_analyzer.classify_many(pairs)
+    return JsonResponse({"results": [{"consumption": ct} for ct in results]})
+
 @csrf_exempt
 @require_POST
 def insights(request):
@@ -115,8 +155,7 @@ def insights(request):
     lines = payload.get("lines")
     if not lines or not isinstance(lines, list):
         return HttpResponseBadRequest("invalid lines")
-    analyzer = BusinessAnalyzer(lines)
-    result = analyzer.calculate(lines)
+    result = _business_analyzer.calculate(lines)
     
     # Calculate distribution
     # Just a mock for now or use result if applicable
@@ -289,6 +328,9 @@ def rule_save(request):
                 tags = [t.strip() for t in tags if t and t.strip()]
                 for t in tags:
                     ConsumeRuleTag.objects.create(rule_id=obj.id, tag=t)
+        if created_ids:
+            bump_rules_version(created_ids)
+            sync_matches(rule_ids=created_ids)
         return JsonResponse({"ids": created_ids, "created": True})
     if rid:
         try:
@@ -304,6 +346,8 @@ def rule_save(request):
             tags = [t.strip() for t in tags if t and t.strip()]
             for t in tags:
                 ConsumeRuleTag.objects.create(rule_id=obj.id, tag=t)
+        bump_rules_version([obj.id])
+        sync_matches(rule_ids=[obj.id])
         return JsonResponse({"id": obj.id, "updated": True})
     else:
         if not data.get("pattern"):
@@ -314,6 +358,8 @@ def rule_save(request):
             tags = [t.strip() for t in tags if t and t.strip()]
             for t in tags:
                 ConsumeRuleTag.objects.create(rule_id=obj.id, tag=t)
+        bump_rules_version([obj.id])
+        sync_matches(rule_ids=[obj.id])
     return JsonResponse({"id": obj.id, "created": True})
 
 @csrf_exempt
@@ -330,6 +376,8 @@ def rule_delete(request):
     except ConsumeRule.DoesNotExist:
         return HttpResponseBadRequest("not found")
     obj.delete()
+    bump_rules_version([rid])
+    sync_matches(rule_ids=[rid])
     return JsonResponse({"ok": True})
 
 @csrf_exempt
@@ -343,7 +391,7 @@ def rule_recommend(request):
         return HttpResponseBadRequest("missing desc")
     try:
         from core.services.classification_service import classify_text
-        cid = classify_text(desc) or ""
+        cid = classify_text(desc, refresh=bool(payload.get("refresh"))) or ""
     except Exception:
         cid = ""
     # map LLM output to category (code/id/name contains)
@@ -356,60 +404,8 @@ def rule_recommend(request):
     except Exception:
         cat = None
     # build candidates from rule-based matching
-    def _norm_text(s):
-        try:
-            import unicodedata, re as _re
-            s = unicodedata.normalize("NFKC", s or "")
-        except Exception:
-            s = s or ""
-        s = s.strip().lower()
-        import re
-        s = re.sub(r"\s+", " ", s)
-        return s
-    def _match_text(rule, text):
-        pt = rule.patternType or "contains"
-        pat = _norm_text(rule.pattern or "")
-        if not pat:
-            return False
-        t = _norm_text(text or "")
-        if pt == "contains":
-            return pat in t
-        if pt == "equals":
-            return pat == t
-        if pt == "startsWith":
-            return t.startswith(pat)
-        if pt == "endsWith":
-            return t.endswith(pat)
-        if pt == "regex":
-            try:
-                import re
-                return re.search(rule.pattern or "", text or "") is not None
-            except Exception:
-                return False
-        return False
-    rules = list(ConsumeRule.objects.filter(active=1).only("categoryId","pattern","patternType","priority"))
-    score_map = {}
-    count_map = {}
-    for r in rules:
-        try:
-            ok = _match_text(r, desc)
-        except Exception:
-            ok = False
-        if ok:
-            cid_key = r.categoryId or ""
-            if not cid_key:
-                continue
-            base = int(r.priority or 100)
-            bonus = 60
-            pt = (r.patternType or "contains").lower()
-            if pt == "equals":
-                bonus = 100
-            elif pt == "regex":
-                bonus = 90
-            elif pt in ("startswith","endswith"):
-                bonus = 80
-            score_map[cid_key] = score_map.get(cid_key, 0) + base + bonus
-            count_map[cid_key] = count_map.get(cid_key, 0) + 1
+    index = get_rule_index()
+    score_map, count_map = index.category_scores(desc)
     # include LLM candidate
     llm_key = None
     if cat and (cat.code or cat.id):
@@ -417,7 +413,7 @@ def rule_recommend(request):
         score_map[llm_key] = score_map.get(llm_key, 0) + 120  # boost
         count_map[llm_key] = count_map.get(llm_key, 0)
     # remove "Other" codes
-    others = set(list(ConsumeCategory.objects.filter(name__icontains="其他").values_list('code', flat=True)) + list(ConsumeCategory.objects.filter(name__icontains="Other").values_list('code', flat=True)))
+    others = _other_category_codes()
     for k in list(score_map.keys()):
         if k in others:
             score_map.pop(k, None)
@@ -464,112 +460,35 @@ def _norm(s):
     s = re.sub(r"\s+", " ", s)
     return s
 
-def _amount_of(txn):
-    try:
-        vals = []
-        if txn.income_money is not None:
-            vals.append(float(txn.income_money))
-        if txn.balance_money is not None:
-            vals.append(float(txn.balance_money))
-        vals = [abs(v) for v in vals if not (v is None)]
-        if not vals:
-            return None
-        return max(vals)
-    except Exception:
-        return None
-
-
 def _other_category_codes():
-    others = ConsumeCategory.objects.filter(name__icontains="其他").values_list("code", flat=True)
-    others_en = ConsumeCategory.objects.filter(name__icontains="Other").values_list("code", flat=True)
-    return set(list(others) + list(others_en))
-
-def _matches(rule, txn, tags=None):
-    desc = _norm(txn.transaction_desc or "")
-    opp = _norm(getattr(txn, "opponent_name", "") or "") + " " + _norm(getattr(txn, "opponent_account", "") or "")
-    extra = " ".join([
-        _norm(getattr(txn, "consume_name", "") or ""),
-        _norm(getattr(txn, "consume_code", "") or ""),
-        _norm(getattr(txn, "card_type_name", "") or ""),
-        _norm(getattr(txn, "bank_card_name", "") or "")
-    ]).strip()
-    text = " ".join([desc, opp, extra]).strip()
-    pt = rule.patternType or "contains"
-    pat = rule.pattern or ""
-    
-    match = False
-    if pt == "contains":
-        if pat and _norm(pat) in text: match = True
-    elif pt == "equals":
-        if pat and _norm(pat) == desc: match = True
-    elif pt == "startsWith":
-        if pat and desc.startswith(_norm(pat)): match = True
-    elif pt == "endsWith":
-        if pat and desc.endswith(_norm(pat)): match = True
-    elif pt == "regex":
-        try:
-            if pat and re.search(pat, text): match = True
-        except:
-            pass
-    if not match and tags:
-        try:
-            for t in tags:
-                tt = _norm(str(t or ""))
-                if tt and tt in text:
-                    match = True
-                    break
-        except Exception:
-            pass
-    
-    if not match: return False
+    return other_category_codes()
 
-    has_amount_rule = (rule.minAmount is not None) or (rule.maxAmount is not None)
-    if has_amount_rule:
-        amt = _amount_of(txn)
-        
-        if amt is not None:
-            if rule.minAmount is not None and amt < float(rule.minAmount): return False
-            if rule.maxAmount is not None and amt > float(rule.maxAmount): return False
-        # If amount is unavailable, skip amount constraints to avoid false negatives
-        
-    if rule.startDate or rule.endDate:
-        tdate = txn.transaction_date 
-        if tdate:
-            d = tdate.date()
-            if rule.startDate and d < rule.startDate: return False
-            if rule.endDate and d > rule.endDate: return False
-            
-    return True
+def _unmatched_q(other_codes):
+    """Stored matches that leave a transaction uncovered (no rule, blank or "other" category)."""
+    return models.Q(match__category_code__isnull=True) | models.Q(match__category_code="") | models.Q(match__category_code__in=other_codes)
 
 @csrf_exempt
 def dashboard_coverage(request):
-    rules = list(ConsumeRule.objects.filter(active=1).order_by('-priority', 'pattern'))
-    txns = Transaction.objects.exclude(deleted=1).only('transaction_desc', 'income_money', 'balance_money', 'transaction_date')
-    ids = [x.id for x in rules]
-    tags_map = {}
-    if ids:
-        for t in ConsumeRuleTag.objects.filter(rule_id__in=ids).values("rule_id", "tag"):
-            tags_map.setdefault(t["rule_id"], []).append(t["tag"])
+    txns = Transaction.objects.exclude(deleted=1)
     
     other_codes = _other_category_codes()
     
-    txn_list = list(txns)
-    total = len(txn_list)
+    total = txns.count()
     
     if total == 0:
          return JsonResponse({"rate": 0, "total": 0, "covered": 0})
 
-    covered = 0
-    for t in txn_list:
-        matched_cat = None
-        for r in rules:
-            if _matches(r, t, tags_map.get(r.id, [])):
-                matched_cat = r.categoryId
-                break
-        
-        if matched_cat:
-            if matched_cat not in other_codes:
-                covered += 1
+    if ensure_matches():
+        covered = txns.filter(match__category_code__gt="").exclude(match__category_code__in=other_codes).count()
+    else:
+        index = get_rule_index()
+        covered = 0
+        for t, r in match_many(index, txns.only(*TEXT_FIELDS)):
+            matched_cat = r.categoryId if r else None
+            
+            if matched_cat:
+                if matched_cat not in other_codes:
+                    covered += 1
             
     rate = (covered / total) * 100 if total > 0 else 0
     return JsonResponse({"rate": round(rate, 1), "total": total, "covered": covered})
@@ -602,39 +521,8 @@ def dashboard_model_metrics(request):
     top3 = None
     try:
         eval_qs = Transaction.objects.exclude(deleted=1).exclude(consume_code__isnull=True).exclude(consume_code="").only("transaction_desc", "consume_code")
-        rules = list(ConsumeRule.objects.filter(active=1).only("categoryId", "pattern", "patternType", "priority"))
+        index = get_rule_index()
         other_codes = _other_category_codes()
-        def _norm_text(s):
-            try:
-                import unicodedata, re as _re
-                s = unicodedata.normalize("NFKC", s or "")
-            except Exception:
-                s = s or ""
-            s = s.strip().lower()
-            import re
-            s = re.sub(r"\s+", " ", s)
-            return s
-        def _match_text(rule, text):
-            pt = rule.patternType or "contains"
-            pat = _norm_text(rule.pattern or "")
-            if not pat:
-                return False
-            t = _norm_text(text or "")
-            if pt == "contains":
-                return pat in t
-            if pt == "equals":
-                return pat == t
-            if pt == "startsWith":
-                return t.startswith(pat)
-            if pt == "endsWith":
-                return t.endswith(pat)
-            if pt == "regex":
-                try:
-                    import re
-                    return re.search(rule.pattern or "", text or "") is not None
-                except Exception:
-                    return False
-            return False
         total_eval = 0
         hit1 = 0
         hit3 = 0
@@ -642,29 +530,7 @@ def dashboard_model_metrics(request):
             truth = t.consume_code or ""
             if (not truth) or (truth in other_codes):
                 continue
-            score_map = {}
-            count_map = {}
-            desc = t.transaction_desc or ""
-            for r in rules:
-                try:
-                    ok = _match_text(r, desc)
-                except Exception:
-                    ok = False
-                if ok:
-                    k = r.categoryId or ""
-                    if not k:
-                        continue
-                    base = int(r.priority or 100)
-                    bonus = 60
-                    pt = (r.patternType or "contains").lower()
-                    if pt == "equals":
-                        bonus = 100
-                    elif pt == "regex":
-                        bonus = 90
-                    elif pt in ("startswith", "endswith"):
-                        bonus = 80
-                    score_map[k] = score_map.get(k, 0) + base + bonus
-                    count_map[k] = count_map.get(k, 0) + 1
+            score_map, count_map = index.category_scores(t.transaction_desc or "")
             for k in list(score_map.keys()):
                 if k in other_codes:
                     score_map.pop(k, None)
@@ -719,14 +585,7 @@ def dashboard_unmatched_tops(request):
     if payload is None:
         return HttpResponseBadRequest("invalid json")
     cid = payload.get("categoryId")
-    base_qs = ConsumeRule.objects.filter(active=1)
-    if cid:
-        try:
-            base_qs = base_qs.filter(categoryId=cid)
-        except Exception:
-            pass
-    rules = list(base_qs.order_by('-priority', 'pattern'))
-    txns = Transaction.objects.exclude(deleted=1).only('transaction_desc', 'income_money', 'balance_money', 'transaction_date', 'bank_card_name', 'card_type_name')
+    txns = Transaction.objects.exclude(deleted=1).only(*TEXT_FIELDS)
     sd = payload.get("startDate")
     ed = payload.get("endDate")
     bank = payload.get("bank")
@@ -749,32 +608,47 @@ def dashboard_unmatched_tops(request):
         txns = txns.filter(bank_card_name__icontains=bank)
     if card:
         txns = txns.filter(card_type_name__icontains=card)
-    ids = [x.id for x in rules]
-    tags_map = {}
-    if ids:
-        for t in ConsumeRuleTag.objects.filter(rule_id__in=ids).values("rule_id", "tag"):
-            tags_map.setdefault(t["rule_id"], []).append(t["tag"])
     other_codes = _other_category_codes()
-    txn_list = list(txns)
+    stored = ensure_matches()
+    # (desc_key, transaction_desc) of every unmatched transaction; desc_key is
+    # None when it has to be derived from the description here
+    unmatched_descs = []
+    if stored and not cid:
+        # stored matches are computed against all rules, so only usable unfiltered
+        total = txns.count()
+        unmatched_descs = txns.filter(_unmatched_q(other_codes)).values_list("match__desc_key", "transaction_desc")
+    elif stored:
+        index = get_rule_index(cid)
+        total = 0
+        for row, r in match_stored(index, txns.values_list(*STORED_FIELDS).iterator()):
+            total += 1
+            matched_cat = r.categoryId if r else None
+            if (not matched_cat) or (matched_cat in other_codes):
+                unmatched_descs.append((row[1], row[2]))
+    else:
+        index = get_rule_index(cid)
+        txn_list = list(txns)
+        total = len(txn_list)
+        for t, r in match_many(index, txn_list):
+            matched_cat = r.categoryId if r else None
+            if (not matched_cat) or (matched_cat in other_codes):
+                unmatched_descs.append((None, t.transaction_desc))
     freq = {}
     samples = {}
-    for t in txn_list:
-        matched_cat = None
-        for r in rules:
-            if _matches(r, t, tags_map.get(r.id, [])):
-                matched_cat = r.categoryId
-                break
-        if (not matched_cat) or (matched_cat in other_codes):
-            key = _norm(t.transaction_desc or "")
-            if not key:
-                key = "(empty)"
-            freq[key] = freq.get(key, 0) + 1
-            if key not in samples:
-                samples[key] = t.transaction_desc or ""
+    keys = {}
+    for dk, d in unmatched_descs:
+        if dk is not None and len(dk) < DESC_KEY_LEN:
+            key = dk or "(empty)"
+        else:
+            key = keys.get(d)
+            if key is None:
+                key = keys[d] = _norm(d or "") or "(empty)"
+        freq[key] = freq.get(key, 0) + 1
+        if key not in samples:
+            samples[key] = d or ""
     tops = sorted(freq.items(), key=lambda kv: kv[1], reverse=True)
     tops = tops[:50]
     rows = [{"desc": samples[k], "count": v} for k, v in tops]
-    total = len(txn_list)
     unmatched = sum(freq.values())
     elapsed_ms = int((time.time() - t0) * 1000)
     return JsonResponse({"rows": rows, "total": total, "unmatched": unmatched, "elapsedMs": elapsed_ms})
@@ -816,13 +690,6 @@ def rule_unmatched_details(request):
     
     # Common filtering logic
     cid = payload.get("categoryId")
-    base_qs = ConsumeRule.objects.filter(active=1)
-    if cid:
-        try:
-            base_qs = base_qs.filter(categoryId=cid)
-        except Exception:
-            pass
-    rules = list(base_qs.order_by('-priority', 'pattern'))
     
     # Need more fields for details
     txns = Transaction.objects.exclude(deleted=1)
@@ -851,54 +718,131 @@ def rule_unmatched_details(request):
     if card:
         txns = txns.filter(card_type_name__icontains=card)
         
-    ids = [x.id for x in rules]
-    tags_map = {}
-    if ids:
-        for t in ConsumeRuleTag.objects.filter(rule_id__in=ids).values("rule_id", "tag"):
-            tags_map.setdefault(t["rule_id"], []).append(t["tag"])
-            
-    others = ConsumeCategory.objects.filter(name__icontains="其他").values_list('code', flat=True)
-    others_en = ConsumeCategory.objects.filter(name__icontains="Other").values_list('code', flat=True)
-    other_codes = set(list(others) + list(others_en))
+    other_codes = _other_category_codes()
     
     rows = []
-    # We iterate over the queryset directly to avoid loading all fields into memory if possible, 
-    # but we need model instances for _matches.
-    # To optimize, we first filter by description in memory (since _norm is not db-level)
-    # Ideally we would do a db-level contains query first, but _norm removes spaces etc.
-    # Let's stick to list(txns) as in previous method for consistency.
-    txn_list = list(txns)
+    # Stored matches are computed against all rules, so they only answer the
+    # unfiltered case; a category filter re-runs that category's rules.
+    # desc_key narrows to the description group with an indexed lookup; the
+    # in-memory comparison below still settles truncated keys.
+    index = None
+    if ensure_matches():
+        txns = txns.filter(match__desc_key=desc_key_of(target_key))
+        if cid:
+            index = get_rule_index(cid)
+        else:
+            txns = txns.filter(_unmatched_q(other_codes))
+    else:
+        index = get_rule_index(cid)
     
-    for t in txn_list:
+    for t in txns:
         # 1. Description check
         if _norm(t.transaction_desc or "") != target_key:
             continue
             
         # 2. Rule check (verify it is unmatched)
-        matched_cat = None
-        for r in rules:
-            if _matches(r, t, tags_map.get(r.id, [])):
-                matched_cat = r.categoryId
-                break
+        if index is not None:
+            r = match_transaction(index, t)
+            matched_cat = r.categoryId if r else None
+            if matched_cat and (matched_cat not in other_codes):
+                continue
                 
-        if (not matched_cat) or (matched_cat in other_codes):
-            rows.append({
+        rows.append({
+            "id": t.id,
+            "cardName": t.bank_card_name,
+            "postingDate": t.transaction_date,
+            "txnDate": t.transaction_time, 
+            "desc": t.transaction_desc,
+            "currency": t.balance_currency,
+            "amount": t.income_money, # We pass raw amount, frontend handles display
+            "balance": t.account_balance,
+            "category": t.consume_name,
+            "remarks": t.demoarea
+        })
+        
+    # Sort by date desc
+    rows.sort(key=lambda x: x["postingDate"] if x["postingDate"] else "", reverse=True)
+    
+    return JsonResponse({"rows": rows})
+
+def _preview_hits(probe, pattern, pattern_type):
+    """(transaction id, current category, current rule id) of every transaction the pattern matches."""
+    if ensure_matches():
+        return sorted(search_ngram_index(pattern, pattern_type))
+    # no stored matches: full scan with the live rules
+    hits = []
+    txns = Transaction.objects.exclude(deleted=1).only(*TEXT_FIELDS)
+    for t, r in match_many(get_rule_index(), txns):
+        if match_transaction(probe, t) is not None:
+            hits.append((t.id, r.categoryId if r else None, r.id if r else None))
+    return sorted(hits)
+
+@csrf_exempt
+@require_POST
+def rule_preview(request):
+    payload = _parse_json(request)
+    if payload is None:
+        return HttpResponseBadRequest("invalid json")
+    pattern = payload.get("pattern") or ""
+    if not pattern:
+        return HttpResponseBadRequest("missing pattern")
+    pattern_type = payload.get("patternType") or "contains"
+    if pattern_type not in ("contains", "equals", "startsWith", "endsWith", "regex"):
+        return HttpResponseBadRequest("invalid patternType")
+    if pattern_type == "regex":
+        try:
+            re.compile(pattern)
+        except re.error:
+            return HttpResponseBadRequest("invalid regex")
+    try:
+        priority = int(payload.get("priority") if payload.get("priority") is not None else 100)
+        limit = max(0, min(int(payload.get("limit") or 20), 200))
+    except (TypeError, ValueError):
+        return HttpResponseBadRequest("invalid number")
+    code = payload.get("categoryId") or ""
+    cat = ConsumeCategory.objects.filter(id=code).first() if code else None
+    if cat:
+        code = cat.code
+    probe = ConsumeRule(id="", categoryId=code, pattern=pattern, patternType=pattern_type, priority=priority)
+    import time
+    t0 = time.time()
+    hits = _preview_hits(RuleIndex([probe]), pattern, pattern_type)
+    # the candidate rule takes a transaction when it would rank ahead of the
+    # current winner (rules are ordered by -priority, pattern)
+    rules = {r.id: r for r in get_rule_index().rules}
+    key = (-priority, pattern)
+    taken = {}
+    for tid, cur_code, cur_rule in hits:
+        cur = rules.get(cur_rule) if cur_rule else None
+        if cur is not None and (-int(cur.priority or 0), cur.pattern or "") <= key:
+            continue
+        if code and cur_code == code:
+            continue
+        taken[cur_code or ""] = taken.get(cur_code or "", 0) + 1
+    names = dict(ConsumeCategory.objects.filter(code__in=[k for k in taken if k]).values_list("code", "name"))
+    delta = [{"categoryId": k, "categoryName": names.get(k, k) if k else "", "count": n}
+             for k, n in sorted(taken.items(), key=lambda kv: kv[1], reverse=True)]
+    samples = []
+    if limit and hits:
+        current = {tid: cur_code for tid, cur_code, _ in hits[:limit]}
+        for t in Transaction.objects.filter(id__in=list(current)).order_by("-transaction_date"):
+            samples.append({
                 "id": t.id,
                 "cardName": t.bank_card_name,
                 "postingDate": t.transaction_date,
-                "txnDate": t.transaction_time, 
                 "desc": t.transaction_desc,
-                "currency": t.balance_currency,
-                "amount": t.income_money, # We pass raw amount, frontend handles display
-                "balance": t.account_balance,
-                "category": t.consume_name,
-                "remarks": t.demoarea
+                "amount": t.income_money,
+                "categoryId": current.get(t.id) or "",
             })
-            
-    # Sort by date desc
-    rows.sort(key=lambda x: x["postingDate"] if x["postingDate"] else "", reverse=True)
-    
-    return JsonResponse({"rows": rows})
+    elapsed = int((time.time() - t0) * 1000)
+    logger.info("rule_preview type=%s hits=%s taken=%s elapsed_ms=%s", pattern_type, len(hits), sum(taken.values()), elapsed)
+    return JsonResponse({
+        "hits": len(hits),
+        "taken": sum(taken.values()),
+        "delta": delta,
+        "samples": samples,
+        "elapsedMs": elapsed,
+    })
 
 @csrf_exempt
 @require_POST
@@ -937,6 +881,7 @@ def rule_batch_assign(request):
     
     # 2. Create/Update Rule (to ensure persistence)
     rule_created = False
+    rule_id = None
     if desc_str:
         norm_desc = (desc_str or "").strip()
         if norm_desc:
@@ -948,10 +893,12 @@ def rule_batch_assign(request):
                     exist.active = 1
                     exist.save()
                     rule_created = True
+                    rule_id = exist.id
             else:
                 import uuid
+                rule_id = str(uuid.uuid4())
                 ConsumeRule.objects.create(
-                    id=str(uuid.uuid4()),
+                    id=rule_id,
                     categoryId=target_code,
                     pattern=norm_desc,
                     patternType="equals",
@@ -959,6 +906,11 @@ def rule_batch_assign(request):
                     active=1
                 )
                 rule_created = True
+    if rule_created:
+        bump_rules_version([rule_id])
+    if rule_created or updated_count:
+        # consume_code/consume_name are part of the matched text
+        sync_matches(rule_ids=[rule_id] if rule_id else (), txn_ids=txn_ids if updated_count else ())
                 
     return JsonResponse({"updated": updated_count, "ruleCreated": rule_created})
 